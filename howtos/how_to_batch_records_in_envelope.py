@@ -0,0 +1,214 @@
+""" Run this file to pack many small records into one message with length prefixed framing, and to unpack them
+on the receiving side as memoryview slices"""
+import struct
+import threading
+import time
+from typing import TypeVar
+
+from solace.messaging.config import _sol_constants
+from solace.messaging.messaging_service import MessagingService
+from solace.messaging.publisher.direct_message_publisher import DirectMessagePublisher
+from solace.messaging.publisher.outbound_message import OutboundMessageBuilder
+from solace.messaging.receiver.inbound_message import InboundMessage
+from solace.messaging.receiver.message_receiver import MessageHandler
+from solace.messaging.resources.topic import Topic
+from solace.messaging.resources.topic_subscription import TopicSubscription
+from sampler_boot import SamplerBoot, SolaceConstants, SamplerUtil
+
+X = TypeVar('X')
+constants = SolaceConstants
+boot = SamplerBoot()
+util = SamplerUtil()
+
+RECORD_BATCH_PROPERTY = 'sample_record_batch'
+"""message property holding the number of records of an envelope, absent for a plain single record message"""
+
+RECORD_LENGTH = struct.Struct('>I')
+
+
+def iter_records(payload):
+    """yield the records of an envelope payload as memoryview slices of it, nothing is copied"""
+    view = memoryview(payload)
+    offset = 0
+    while offset < len(view):
+        if offset + RECORD_LENGTH.size > len(view):
+            raise ValueError(f'Truncated record batch, record length of {len(view) - offset} byte(s) at offset '
+                             f'{offset}')
+        record_length, = RECORD_LENGTH.unpack_from(view, offset)
+        offset += RECORD_LENGTH.size
+        if offset + record_length > len(view):
+            raise ValueError(f'Truncated record batch, record of {record_length} byte(s) at offset {offset}')
+        yield view[offset:offset + record_length]
+        offset += record_length
+
+
+class RecordBatcher:
+    """packs records into envelope messages, flushing when max_records or max_bytes is reached or when the
+    oldest record of the batch has waited linger_ms
+
+    Each record is framed with a 4 bytes big endian length. The envelope is built in a bytearray which the
+    message builder takes with no copy. One long lived flusher thread waits for the linger deadline of the current
+    batch, close() flushes the last batch and stops it.
+    """
+
+    def __init__(self, publisher: DirectMessagePublisher, message_builder: OutboundMessageBuilder,
+                 destination: Topic, max_records=100, max_bytes=64 * 1024, linger_ms=5):
+        self._publisher = publisher
+        self._message_builder = message_builder
+        self._destination = destination
+        self._max_records = max_records
+        self._max_bytes = max_bytes
+        self._linger = linger_ms / 1000
+        self._condition = threading.Condition()
+        self._envelope = bytearray()
+        self._record_count = 0
+        self._batch_start = None
+        self._is_closed = False
+        self._envelope_count = 0
+        self._flusher = threading.Thread(target=self._flush_on_linger, daemon=True, name='record-batch-flusher')
+        self._flusher.start()
+
+    @property
+    def envelope_count(self):
+        return self._envelope_count
+
+    def add(self, record):
+        """add a str or bytes like record to the current batch"""
+        if isinstance(record, str):
+            record = record.encode(_sol_constants.ENCODING_TYPE)
+        with self._condition:
+            self._envelope += RECORD_LENGTH.pack(len(record))
+            self._envelope += record
+            self._record_count += 1
+            if self._record_count >= self._max_records or len(self._envelope) >= self._max_bytes:
+                self._flush_locked()
+            elif self._record_count == 1:
+                self._batch_start = time.perf_counter()
+                self._condition.notify()
+
+    def _flush_on_linger(self):
+        with self._condition:
+            while not self._is_closed:
+                if self._batch_start is None:
+                    self._condition.wait()
+                    continue
+                # the deadline is read from the current batch, a batch flushed early by size is not waited for
+                remaining = self._batch_start + self._linger - time.perf_counter()
+                if remaining > 0:
+                    self._condition.wait(remaining)
+                    continue
+                try:
+                    self._flush_locked()
+                except Exception as exception:  # a failed publish must not stop flushing on linger
+                    print(f'Flushing record batch of {self._record_count} record(s) failed, retrying after '
+                          f'{self._linger * 1000:.0f} ms: {exception}')
+
+    def _flush_locked(self):
+        """publish the current batch, which is kept, to be retried one linger later, when publishing fails"""
+        if not self._record_count:
+            self._batch_start = None
+            return
+        envelope, record_count = self._envelope, self._record_count
+        try:
+            message = self._message_builder.build(envelope, additional_message_properties={
+                RECORD_BATCH_PROPERTY: record_count})
+            self._publisher.publish(destination=self._destination, message=message)
+        except Exception:
+            # a copy, the builder may still hold a buffer export on the envelope which would prevent growing it
+            self._envelope = bytearray(envelope)
+            self._batch_start = time.perf_counter()
+            raise
+        # a new bytearray, the builder may still hold a buffer export on the previous one
+        self._envelope, self._record_count, self._batch_start = bytearray(), 0, None
+        self._envelope_count += 1
+
+    def flush(self):
+        with self._condition:
+            self._flush_locked()
+
+    def close(self):
+        """flush the current batch and stop the flusher thread"""
+        with self._condition:
+            try:
+                self._flush_locked()
+            finally:
+                self._is_closed = True
+                self._condition.notify()
+        self._flusher.join()
+
+
+class RecordBatchMessageHandler(MessageHandler):
+    """MessageHandler adapter unpacking envelopes and calling on_record(message, record) of the wrapped handler
+    once per record, with the record as a memoryview slice of the payload"""
+
+    def __init__(self, record_handler):
+        self._record_handler = record_handler
+
+    def on_message(self, message: 'InboundMessage'):
+        payload = message.get_payload_as_bytes() or bytearray()
+        if not message.has_property(RECORD_BATCH_PROPERTY):
+            self._record_handler.on_record(message, memoryview(payload))
+            return
+        for record in iter_records(payload):
+            self._record_handler.on_record(message, record)
+
+
+class CountingRecordHandler:
+    """sample record handler counting the records and bytes received"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.record_count = 0
+        self.record_bytes = 0
+
+    def on_record(self, message: 'InboundMessage', record: memoryview):
+        with self._lock:
+            self.record_count += 1
+            self.record_bytes += record.nbytes
+
+
+class HowToBatchRecordsInEnvelope:
+    """class contains methods to publish and consume batches of small records"""
+
+    @staticmethod
+    def publish_and_consume_record_batches(messaging_service: MessagingService, destination: Topic, record_count,
+                                           max_records, linger_ms):
+        """ to publish small records in envelopes and receive them one by one"""
+        try:
+            receiver = messaging_service.create_direct_message_receiver_builder() \
+                .with_subscriptions([TopicSubscription.of(destination.get_name())]).build()
+            receiver.start()
+            record_handler = CountingRecordHandler()
+            receiver.receive_async(RecordBatchMessageHandler(record_handler))
+
+            publisher = messaging_service.create_direct_message_publisher_builder().build()
+            publisher.start()
+            batcher = RecordBatcher(publisher, messaging_service.message_builder(), destination,
+                                    max_records=max_records, linger_ms=linger_ms)
+            for e in range(record_count):
+                batcher.add(f'{constants.MESSAGE_TO_SEND} record {e}')
+            batcher.close()
+            time.sleep(2)
+            print(f'Published {record_count} record(s) in {batcher.envelope_count} message(s), '
+                  f'received {record_handler.record_count} record(s), {record_handler.record_bytes} byte(s)')
+        finally:
+            util.publisher_terminate(publisher)
+            receiver.terminate(0)
+
+    @staticmethod
+    def run():
+        try:
+            service = MessagingService.builder().from_properties(boot.broker_properties()).build()
+            service.connect()
+            destination_name = Topic.of(constants.TOPIC_ENDPOINT_DEFAULT)
+
+            print("Execute Direct Publish and Consume - records batched in envelopes")
+            HowToBatchRecordsInEnvelope \
+                .publish_and_consume_record_batches(service, destination_name, record_count=10000, max_records=100,
+                                                    linger_ms=5)
+        finally:
+            service.disconnect()
+
+
+if __name__ == '__main__':
+    HowToBatchRecordsInEnvelope().run()
@@ -0,0 +1,209 @@
+""" Run this file to benchmark the reject, elastic and wait back pressure strategies of the direct publisher
+against the local broker and write a JSON report"""
+import itertools
+import json
+import multiprocessing
+import queue
+import sys
+import threading
+import time
+from typing import TypeVar
+
+from solace.messaging.errors.pubsubplus_client_error import PublisherOverflowError
+from solace.messaging.messaging_service import MessagingService
+from solace.messaging.resources.topic import Topic
+from how_to_use_publish_with_back_pressure import HowToDirectPublishWithBackPressureSampler
+from sampler_boot import SamplerBoot, SolaceConstants, SamplerUtil
+
+try:
+    import resource
+except ImportError:  # resource module is not available on Windows
+    resource = None
+
+X = TypeVar('X')
+constants = SolaceConstants
+boot = SamplerBoot()
+util = SamplerUtil()
+sampler = HowToDirectPublishWithBackPressureSampler
+
+
+def percentile(sorted_values, fraction):
+    """nearest rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+def peak_rss_bytes():
+    """peak resident set size of this process, None where it cannot be read"""
+    if resource is None:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and in kilobytes on Linux
+    return max_rss if sys.platform == 'darwin' else max_rss * 1024
+
+
+class BackPressureBenchmarkRun:
+    """one benchmark run: a strategy, payload size, buffer capacity and publisher thread count"""
+
+    def __init__(self, strategy, payload_size, buffer_capacity, thread_count, message_count):
+        self.strategy = strategy
+        self.payload_size = payload_size
+        self.buffer_capacity = buffer_capacity
+        self.thread_count = thread_count
+        self.message_count = message_count
+        self._lock = threading.Lock()
+        self._latencies_ns = []
+        self._published_count = 0
+        self._overflow_count = 0
+
+    def _publish_loop(self, publisher, destination, outbound_msg, count):
+        latencies_ns = []
+        overflow_count = 0
+        for _ in range(count):
+            start = time.perf_counter_ns()
+            try:
+                publisher.publish(destination=destination, message=outbound_msg)
+            except PublisherOverflowError:
+                # reject strategy, the message is dropped and only the overflow is accounted
+                overflow_count += 1
+                continue
+            latencies_ns.append(time.perf_counter_ns() - start)
+        with self._lock:
+            self._latencies_ns.extend(latencies_ns)
+            self._published_count += len(latencies_ns)
+            self._overflow_count += overflow_count
+
+    def execute(self, messaging_service: MessagingService, destination: Topic):
+        """run the benchmark and return its result as a dictionary"""
+        baseline_rss = peak_rss_bytes()
+        publisher = sampler.create_direct_message_publisher_on_backpressure(messaging_service, self.strategy,
+                                                                            self.buffer_capacity)
+        try:
+            outbound_msg = sampler.build_outbound_message_with_all_props(messaging_service,
+                                                                        bytearray(self.payload_size))
+            per_thread_count = self.message_count // self.thread_count
+            threads = [threading.Thread(target=self._publish_loop,
+                                        args=(publisher, destination, outbound_msg, per_thread_count))
+                       for _ in range(self.thread_count)]
+            start = time.perf_counter()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            elapsed = time.perf_counter() - start
+        finally:
+            util.publisher_terminate(publisher)
+
+        latencies_ns = sorted(self._latencies_ns)
+        return {
+            'strategy': self.strategy,
+            'payload_size': self.payload_size,
+            'buffer_capacity': self.buffer_capacity,
+            'thread_count': self.thread_count,
+            'message_count': per_thread_count * self.thread_count,
+            'published_count': self._published_count,
+            'overflow_count': self._overflow_count,
+            'elapsed_s': elapsed,
+            'throughput_msg_per_s': self._published_count / elapsed if elapsed else None,
+            'latency_p50_us': _ns_to_us(percentile(latencies_ns, 0.50)),
+            'latency_p99_us': _ns_to_us(percentile(latencies_ns, 0.99)),
+            'latency_p999_us': _ns_to_us(percentile(latencies_ns, 0.999)),
+            'peak_rss_bytes': peak_rss_bytes(),
+            'rss_growth_bytes': None if baseline_rss is None else peak_rss_bytes() - baseline_rss,
+        }
+
+
+def _execute_run_in_child(result_queue, broker_properties, destination_name, strategy, payload_size,
+                          buffer_capacity, thread_count, message_count):
+    """child process entry point, runs one benchmark on its own connection"""
+    service = MessagingService.builder().from_properties(broker_properties).build()
+    service.connect()
+    try:
+        benchmark_run = BackPressureBenchmarkRun(strategy, payload_size, buffer_capacity, thread_count,
+                                                 message_count)
+        result_queue.put(benchmark_run.execute(service, Topic.of(destination_name)))
+    finally:
+        service.disconnect()
+
+
+def execute_in_child_process(broker_properties, destination_name, strategy, payload_size, buffer_capacity,
+                             thread_count, message_count, timeout_s=600):
+    """run one benchmark in a freshly spawned process so that its peak RSS is not inflated by earlier runs"""
+    context = multiprocessing.get_context('spawn')
+    result_queue = context.Queue()
+    process = context.Process(target=_execute_run_in_child,
+                              args=(result_queue, broker_properties, destination_name, strategy, payload_size,
+                                    buffer_capacity, thread_count, message_count))
+    process.start()
+    # the result is read before joining, a child blocks on exit until what it queued has been read
+    deadline = time.monotonic() + timeout_s
+    result = None
+    while result is None:
+        try:
+            result = result_queue.get(timeout=1)
+        except queue.Empty:
+            if not process.is_alive() and result_queue.empty():
+                break
+            if time.monotonic() > deadline:
+                process.terminate()
+                break
+    process.join()
+    if result is None:
+        raise RuntimeError(f'Benchmark run of strategy [{strategy}] failed, exit code: {process.exitcode}')
+    return result
+
+
+def _ns_to_us(value_ns):
+    return None if value_ns is None else value_ns / 1000
+
+
+class HowToBenchmarkBackPressureStrategies:
+    """class contains methods to compare the back pressure strategies quantitatively"""
+
+    STRATEGIES = (sampler.BACK_PRESSURE_REJECT, sampler.BACK_PRESSURE_ELASTIC, sampler.BACK_PRESSURE_WAIT)
+
+    @staticmethod
+    def run_benchmark_matrix(broker_properties, destination_name, payload_sizes, buffer_capacities,
+                             thread_counts, message_count, strategies=STRATEGIES):
+        """run every combination of strategy, payload size, buffer capacity and thread count
+
+        The elastic strategy has no buffer capacity, it is run once per payload size and thread count.
+        Every run connects from its own child process, so its peak RSS, and its growth over the RSS of the
+        connected process before publishing, belong to that run alone.
+        """
+        results = []
+        for strategy, payload_size, thread_count in itertools.product(strategies, payload_sizes, thread_counts):
+            capacities = [None] if strategy == sampler.BACK_PRESSURE_ELASTIC else buffer_capacities
+            for buffer_capacity in capacities:
+                result = execute_in_child_process(broker_properties, destination_name, strategy, payload_size,
+                                                  buffer_capacity, thread_count, message_count)
+                print(f'[BENCHMARK] {json.dumps(result)}')
+                results.append(result)
+        return {
+            'benchmark': 'direct_publisher_back_pressure',
+            'time_stamp': time.time(),
+            'python_version': sys.version.split()[0],
+            'results': results,
+        }
+
+    @staticmethod
+    def write_report(report, report_file_path):
+        with open(report_file_path, 'w') as report_file:
+            json.dump(report, report_file, indent=2)
+        print(f'Benchmark report written to: {report_file_path}')
+
+    @staticmethod
+    def run(report_file_path='back_pressure_benchmark_report.json'):
+        print("Execute Direct Publish - back pressure strategies benchmark")
+        report = HowToBenchmarkBackPressureStrategies \
+            .run_benchmark_matrix(boot.broker_properties(), constants.TOPIC_ENDPOINT_DEFAULT,
+                                  payload_sizes=[100, 1024, 16 * 1024],
+                                  buffer_capacities=[100, 1000, 10000],
+                                  thread_counts=[1, 4],
+                                  message_count=100000)
+        HowToBenchmarkBackPressureStrategies.write_report(report, report_file_path)
+
+
+if __name__ == '__main__':
+    HowToBenchmarkBackPressureStrategies().run(*sys.argv[1:2])
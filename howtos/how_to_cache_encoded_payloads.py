@@ -0,0 +1,192 @@
+""" Run this file to publish reference data objects repeatedly while serialising each unchanged object only once,
+through an LRU cache of encoded payloads in front of the converter"""
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import TypeVar
+
+from solace.messaging.messaging_service import MessagingService
+from solace.messaging.publisher.outbound_message import OutboundMessageBuilder
+from solace.messaging.resources.topic import Topic
+from solace.messaging.utils.converter import ObjectToBytes
+from how_to_direct_publish_message import PopoConverter
+from sampler_boot import SamplerBoot, SolaceConstants, SamplerUtil
+
+X = TypeVar('X')
+constants = SolaceConstants
+boot = SamplerBoot()
+util = SamplerUtil()
+
+
+class EncodedPayloadCacheStats:
+    """hits, misses, evictions and the memory held by an EncodedPayloadCache"""
+
+    def __init__(self, hits=0, misses=0, evictions=0, entry_count=0, cached_bytes=0):
+        self.hits = hits
+        self.misses = misses
+        self.evictions = evictions
+        self.entry_count = entry_count
+        self.cached_bytes = cached_bytes
+
+    def to_dict(self):
+        lookups = self.hits + self.misses
+        return {'hits': self.hits, 'misses': self.misses, 'hit_ratio': self.hits / lookups if lookups else None,
+                'evictions': self.evictions, 'entry_count': self.entry_count, 'cached_bytes': self.cached_bytes}
+
+
+class EncodedPayloadCache(ObjectToBytes):
+    """ObjectToBytes converter caching the payloads encoded by the wrapped converter, evicting the least recently
+    used ones beyond max_entries entries or max_bytes bytes of payload
+
+    Objects are keyed by content when key is given, key(obj) returning e.g. a content hash or a primary key and
+    version, else by identity and, when version is given, by version(obj) too. An identity keyed object must not
+    be mutated without changing its version, the cache keeps it alive while its payload is cached so that its id
+    cannot be reused by another object.
+    """
+
+    def __init__(self, converter: ObjectToBytes, key=None, version=None, max_entries=1024,
+                 max_bytes=16 * 1024 * 1024):
+        self._converter = converter
+        self._key = key
+        self._version = version
+        self._max_entries = max_entries
+        self._max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._cached_bytes = 0
+        self._hits = self._misses = self._evictions = 0
+
+    def _cache_key(self, obj):
+        if self._key is not None:
+            return self._key(obj)
+        return id(obj), self._version(obj) if self._version is not None else None
+
+    def encode(self, obj) -> bytearray:
+        """the payload of obj, from the cache when the object is unchanged, never mutate it"""
+        cache_key = self._cache_key(obj)
+        with self._lock:
+            entry = self._entries.get(cache_key)
+            if entry is not None:
+                self._entries.move_to_end(cache_key)
+                self._hits += 1
+                return entry[1]
+            self._misses += 1
+        payload = bytearray(self._converter.to_bytes(obj))
+        if len(payload) > self._max_bytes:
+            return payload
+        with self._lock:
+            previous = self._entries.pop(cache_key, None)
+            if previous is not None:
+                self._cached_bytes -= len(previous[1])
+            # the object is pinned by identity keyed entries only, a content key does not depend on it
+            self._entries[cache_key] = (obj if self._key is None else None, payload)
+            self._cached_bytes += len(payload)
+            while len(self._entries) > self._max_entries or self._cached_bytes > self._max_bytes:
+                _, (_, evicted_payload) = self._entries.popitem(last=False)
+                self._cached_bytes -= len(evicted_payload)
+                self._evictions += 1
+        return payload
+
+    def to_bytes(self, src) -> bytes:
+        return self.encode(src)
+
+    def build(self, message_builder: OutboundMessageBuilder, obj, additional_message_properties=None):
+        """build an outbound message from the cached payload, the builder takes the bytearray with no copy
+        where the converter path would copy it again"""
+        return message_builder.build(self.encode(obj), additional_message_properties=additional_message_properties)
+
+    def invalidate(self, obj=None):
+        """drop the payload of obj, or every payload"""
+        with self._lock:
+            if obj is None:
+                self._entries.clear()
+                self._cached_bytes = 0
+                return
+            entry = self._entries.pop(self._cache_key(obj), None)
+            if entry is not None:
+                self._cached_bytes -= len(entry[1])
+
+    @property
+    def stats(self) -> EncodedPayloadCacheStats:
+        with self._lock:
+            return EncodedPayloadCacheStats(self._hits, self._misses, self._evictions, len(self._entries),
+                                            self._cached_bytes)
+
+
+class ReferenceData:
+    """sample reference data business object, version is bumped on every change"""
+
+    def __init__(self, instrument_id, attributes):
+        self.instrument_id = instrument_id
+        self.attributes = attributes
+        self.version = 0
+
+    def update(self, **attributes):
+        self.attributes.update(attributes)
+        self.version += 1
+
+
+class HowToCacheEncodedPayloads:
+    """class contains methods to publish repeatedly sent objects with cached encoded payloads"""
+
+    @staticmethod
+    def benchmark_encoding_cache(objects, rounds=100):
+        """encode the objects rounds times with the pickle converter alone and behind the cache
+
+        No broker connection is needed.
+        """
+        converter = PopoConverter()
+        cache = EncodedPayloadCache(converter, version=lambda obj: obj.version)
+        results = []
+        for path_name, encode in (('pickle_converter', converter.to_bytes), ('encoded_payload_cache', cache.encode)):
+            start = time.perf_counter()
+            for _ in range(rounds):
+                for obj in objects:
+                    encode(obj)
+            elapsed = time.perf_counter() - start
+            results.append({'path': path_name, 'encode_us': elapsed / (rounds * len(objects)) * 1_000_000})
+        results[-1].update(cache.stats.to_dict())
+        return results
+
+    @staticmethod
+    def direct_message_publish_reference_data(messaging_service: MessagingService, destination, objects, rounds,
+                                              cache: EncodedPayloadCache):
+        """ to publish every reference data object rounds times, updating one object between rounds"""
+        try:
+            direct_publisher = messaging_service.create_direct_message_publisher_builder().build()
+            direct_publisher.start()
+            message_builder = messaging_service.message_builder() \
+                .with_application_message_id(constants.APPLICATION_MESSAGE_ID)
+            for round_number in range(rounds):
+                for obj in objects:
+                    direct_publisher.publish(destination=destination, message=cache.build(message_builder, obj))
+                objects[round_number % len(objects)].update(last_round=round_number)
+            print(f'Encoded payload cache: {cache.stats.to_dict()}')
+        finally:
+            util.publisher_terminate(direct_publisher)
+
+    @staticmethod
+    def run():
+        objects = [ReferenceData(f'instrument-{e}', {'name': f'{constants.MESSAGE_TO_SEND} {e}',
+                                                     'properties': constants.CUSTOM_PROPS, 'tick_size': 0.01})
+                   for e in range(100)]
+        print("Execute encoded payload cache benchmark")
+        for result in HowToCacheEncodedPayloads.benchmark_encoding_cache(objects):
+            print(f'[BENCHMARK] {json.dumps(result)}')
+
+        try:
+            service = MessagingService.builder().from_properties(boot.broker_properties()).build()
+            service.connect()
+            destination_name = Topic.of(constants.TOPIC_ENDPOINT_DEFAULT)
+
+            print("Execute Direct Publish - reference data through the encoded payload cache")
+            cache = EncodedPayloadCache(PopoConverter(), version=lambda obj: obj.version, max_entries=1000)
+            HowToCacheEncodedPayloads \
+                .direct_message_publish_reference_data(service, destination_name, objects, rounds=10, cache=cache)
+        finally:
+            service.disconnect()
+
+
+if __name__ == '__main__':
+    HowToCacheEncodedPayloads().run()
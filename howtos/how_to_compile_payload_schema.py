@@ -0,0 +1,195 @@
+""" Run this file to declare the schema of a business object once and encode and decode it with a precompiled
+struct.Struct instead of pickle"""
+import json
+import keyword
+import operator
+import struct
+from typing import TypeVar
+
+from solace.messaging.config import _sol_constants
+from solace.messaging.messaging_service import MessagingService
+from solace.messaging.resources.topic import Topic
+from how_to_use_payload_codec_registry import CodecRegistry, HowToUsePayloadCodecRegistry, PayloadCodec, \
+    PickleCodec
+from sampler_boot import SamplerBoot, SolaceConstants, SamplerUtil, MyData
+
+X = TypeVar('X')
+constants = SolaceConstants
+boot = SamplerBoot()
+util = SamplerUtil()
+
+FIELD_TYPES = {'int8': 'b', 'uint8': 'B', 'int16': 'h', 'uint16': 'H', 'int32': 'i', 'uint32': 'I', 'int64': 'q',
+               'uint64': 'Q', 'float32': 'f', 'float64': 'd', 'bool': '?', 'str': 's', 'bytes': 's'}
+"""schema field type: struct format character"""
+
+VARIABLE_LENGTH_FORMAT = 'I'
+"""struct format of the length written in the fixed part for every variable length field"""
+
+
+class SchemaField:
+    """field of a payload schema, str and bytes fields are fixed length when length is given and variable length
+    otherwise
+
+    Shorter fixed length values are padded with NUL bytes, stripped again from str fields only: a fixed bytes field
+    decodes to all of its length bytes, as its data may end with NULs.
+    """
+    __slots__ = ('name', 'type', 'length')
+
+    def __init__(self, name: str, type: str, length: int = None):
+        if not name.isidentifier() or keyword.iskeyword(name):
+            raise ValueError(f'Invalid schema field name: [{name}]')
+        if type not in FIELD_TYPES:
+            raise ValueError(f'Unknown schema field type: [{type}], expected one of {list(FIELD_TYPES)}')
+        if length is not None and type not in ('str', 'bytes'):
+            raise ValueError(f'Schema field [{name}] of type [{type}] cannot have a length')
+        self.name = name
+        self.type = type
+        self.length = length
+
+    @property
+    def is_variable_length(self):
+        return self.type in ('str', 'bytes') and self.length is None
+
+
+def make_record_class(name: str, field_names, methods=None):
+    """generate a __slots__ record class with a positional __init__ over field_names, as namedtuple does, and the
+    given extra methods"""
+    arguments = ', '.join(field_names)
+    assignments = ''.join(f'\n    self.{field_name} = {field_name}' for field_name in field_names) or '\n    pass'
+    namespace = {}
+    exec(f'def __init__(self, {arguments}):{assignments}', namespace)
+
+    def __repr__(self):
+        return f'{name}({", ".join(f"{field_name}={getattr(self, field_name)!r}" for field_name in field_names)})'
+
+    def __eq__(self, other):
+        return type(other) is type(self) and all(getattr(self, field_name) == getattr(other, field_name)
+                                                 for field_name in field_names)
+
+    return type(name, (), {'__slots__': tuple(field_names), '__init__': namespace['__init__'],
+                           '__repr__': __repr__, '__eq__': __eq__, '__hash__': None, **(methods or {})})
+
+
+class SchemaCodec(PayloadCodec):
+    """codec compiled from a list of SchemaFields
+
+    All fixed size fields and the lengths of the variable length ones are packed by one precompiled struct.Struct,
+    the variable length values follow it in field order. Encoding reads the fields from any object having them as
+    attributes, decoding returns an instance of the generated record_class, which can borrow methods of the
+    business object class such as getters.
+    """
+
+    def __init__(self, name: str, fields, byte_order='<', methods=None):
+        self.codec_id = f'schema:{name}'
+        self._fields = list(fields)
+        field_names = [field.name for field in self._fields]
+        if len(set(field_names)) != len(field_names):
+            raise ValueError(f'Duplicate field name in schema [{name}]: {field_names}')
+        fixed_format = ''.join(
+            VARIABLE_LENGTH_FORMAT if field.is_variable_length else f'{field.length or ""}{FIELD_TYPES[field.type]}'
+            for field in self._fields)
+        self._struct = struct.Struct(byte_order + fixed_format)
+        self._get_fields = operator.attrgetter(*field_names) if len(field_names) > 1 \
+            else (lambda obj, get=operator.attrgetter(*field_names): (get(obj),))
+        self._str_indexes = [index for index, field in enumerate(self._fields) if field.type == 'str']
+        self._variable_indexes = [index for index, field in enumerate(self._fields) if field.is_variable_length]
+        self._fixed_str_indexes = [index for index in self._str_indexes if index not in self._variable_indexes]
+        self._fixed_length_fields = [(index, field) for index, field in enumerate(self._fields)
+                                     if field.length is not None]
+        self.record_class = make_record_class(name, field_names, methods)
+
+    @property
+    def fixed_size(self):
+        """size of the packed fixed part, the whole payload when the schema has no variable length field"""
+        return self._struct.size
+
+    def encode(self, obj) -> bytes:
+        values = list(self._get_fields(obj))
+        for index in self._str_indexes:
+            values[index] = values[index].encode(_sol_constants.ENCODING_TYPE)
+        for index, field in self._fixed_length_fields:
+            # struct would silently truncate the value, possibly in the middle of a UTF-8 character
+            if len(values[index]) > field.length:
+                raise ValueError(f'Field [{field.name}] of schema [{self.codec_id}] is {len(values[index])} '
+                                 f'byte(s) long, expected at most {field.length}')
+        if not self._variable_indexes:
+            return self._struct.pack(*values)
+        variable_values = [values[index] for index in self._variable_indexes]
+        for index, value in zip(self._variable_indexes, variable_values):
+            values[index] = len(value)
+        return b''.join([self._struct.pack(*values), *variable_values])
+
+    def decode(self, payload) -> X:
+        values = list(self._struct.unpack_from(payload))
+        offset = self._struct.size
+        for index in self._variable_indexes:
+            length = values[index]
+            values[index] = bytes(payload[offset:offset + length])
+            offset += length
+        if offset != len(payload):
+            raise ValueError(f'Payload of {len(payload)} byte(s) does not match schema [{self.codec_id}], '
+                             f'expected {offset} byte(s)')
+        for index in self._fixed_str_indexes:
+            values[index] = values[index].rstrip(b'\0')
+        for index in self._str_indexes:
+            values[index] = values[index].decode(_sol_constants.ENCODING_TYPE)
+        return self.record_class(*values)
+
+
+def compile_schema(name: str, fields, byte_order='<', methods=None) -> SchemaCodec:
+    """compile the schema declared as SchemaFields or (name, type[, length]) tuples into a SchemaCodec"""
+    return SchemaCodec(name, [field if isinstance(field, SchemaField) else SchemaField(*field) for field in fields],
+                       byte_order, methods)
+
+
+class Tick:
+    """sample market data business object"""
+
+    def __init__(self, symbol, price, size, time_stamp):
+        self.symbol = symbol
+        self.price = price
+        self.size = size
+        self.time_stamp = time_stamp
+
+
+class HowToCompilePayloadSchema:
+    """class contains methods to encode business objects with schema compiled codecs"""
+
+    @staticmethod
+    def compile_sample_schemas(registry: CodecRegistry):
+        """compile and register the schemas of MyData and Tick, returning their codecs"""
+        my_data_codec = registry.register(compile_schema('MyDataRecord', [('name', 'str')],
+                                                         methods={'get_name': MyData.get_name}))
+        tick_codec = registry.register(compile_schema('TickRecord', [('symbol', 'str', 8), ('price', 'float64'),
+                                                                     ('size', 'uint32'), ('time_stamp', 'int64')]))
+        return my_data_codec, tick_codec
+
+    @staticmethod
+    def run():
+        registry = CodecRegistry()
+        my_data_codec, tick_codec = HowToCompilePayloadSchema.compile_sample_schemas(registry)
+        print(f'Decoded record: {my_data_codec.decode(my_data_codec.encode(MyData(constants.MESSAGE_TO_SEND)))}')
+
+        print("Execute schema codec benchmark")
+        for samples, codec in (([MyData(f'{constants.MESSAGE_TO_SEND} {e}') for e in range(100)], my_data_codec),
+                               ([Tick('SOL', 100.0 + e / 100, e, 1_600_000_000_000 + e) for e in range(100)],
+                                tick_codec)):
+            for result in HowToUsePayloadCodecRegistry \
+                    .benchmark_codecs(registry, samples, [PickleCodec.codec_id, codec.codec_id]):
+                print(f'[CODEC] {json.dumps(result)}')
+
+        try:
+            service = MessagingService.builder().from_properties(boot.broker_properties()).build()
+            service.connect()
+            destination_name = Topic.of(constants.TOPIC_ENDPOINT_DEFAULT)
+
+            print("Execute Direct Publish and Consume - business object through a schema compiled codec")
+            HowToUsePayloadCodecRegistry \
+                .publish_and_consume_with_codecs(service, destination_name, registry, [my_data_codec.codec_id],
+                                                 MyData(constants.MESSAGE_TO_SEND))
+        finally:
+            service.disconnect()
+
+
+if __name__ == '__main__':
+    HowToCompilePayloadSchema().run()
@@ -0,0 +1,245 @@
+""" Run this file to compress message payloads per message with a standard library codec advertised in a message
+property, and to decompress them automatically on the receiving side"""
+import bz2
+import json
+import lzma
+import threading
+import time
+import zlib
+from typing import TypeVar
+
+from solace.messaging.config import _sol_constants
+from solace.messaging.messaging_service import MessagingService
+from solace.messaging.publisher.outbound_message import OutboundMessageBuilder
+from solace.messaging.receiver.inbound_message import InboundMessage
+from solace.messaging.receiver.message_receiver import MessageHandler
+from solace.messaging.resources.topic import Topic
+from solace.messaging.resources.topic_subscription import TopicSubscription
+from sampler_boot import SamplerBoot, SolaceConstants, SamplerUtil
+
+X = TypeVar('X')
+constants = SolaceConstants
+boot = SamplerBoot()
+util = SamplerUtil()
+
+PAYLOAD_CODEC_PROPERTY = 'sample_payload_codec'
+"""message property advertising the codec the payload is compressed with, absent for a raw payload"""
+
+PAYLOAD_CODECS = {
+    'zlib': (lambda data, level: zlib.compress(data, level), zlib.decompressobj),
+    'lzma': (lambda data, level: lzma.compress(data, preset=level), lzma.LZMADecompressor),
+    'bz2': (lambda data, level: bz2.compress(data, compresslevel=level), bz2.BZ2Decompressor),
+}
+"""codec name: (compress(data, level), decompressor factory), decompressors take a max_length to bound their output"""
+
+
+def decompress_bounded(codec, payload, max_size=None):
+    """decompress a payload of the codec, raising ValueError rather than producing more than max_size bytes"""
+    decompressor = PAYLOAD_CODECS[codec][1]()
+    if max_size is None:
+        decompressed_payload = decompressor.decompress(payload)
+    else:
+        # one byte over the limit is enough to tell a payload exceeding it, however much it would expand
+        decompressed_payload = decompressor.decompress(payload, max_length=max_size + 1)
+        if len(decompressed_payload) > max_size:
+            raise ValueError(f'Payload compressed with [{codec}] decompresses to more than {max_size} byte(s)')
+    if not decompressor.eof:
+        raise ValueError(f'Truncated payload compressed with [{codec}]')
+    return decompressed_payload
+
+
+class CompressionStats:
+    """bytes in and out and CPU time spent by a PayloadCompressor or, with is_decompression, a PayloadDecompressor"""
+
+    def __init__(self, is_decompression=False):
+        self._is_decompression = is_decompression
+        self._lock = threading.Lock()
+        self.message_count = 0
+        self.compressed_count = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.cpu_time_ns = 0
+
+    def record(self, bytes_in, bytes_out, cpu_time_ns, is_compressed):
+        with self._lock:
+            self.message_count += 1
+            self.compressed_count += int(is_compressed)
+            self.bytes_in += bytes_in
+            self.bytes_out += bytes_out
+            self.cpu_time_ns += cpu_time_ns
+
+    def to_dict(self):
+        with self._lock:
+            # negative bytes_saved means compression grew the payloads
+            size_change = {'bytes_expanded': self.bytes_out - self.bytes_in} if self._is_decompression \
+                else {'bytes_saved': self.bytes_in - self.bytes_out}
+            return {'message_count': self.message_count, 'compressed_count': self.compressed_count,
+                    'bytes_in': self.bytes_in, 'bytes_out': self.bytes_out, **size_change,
+                    'cpu_ns_per_byte': self.cpu_time_ns / self.bytes_in if self.bytes_in else None}
+
+
+class PayloadCompressor:
+    """compresses payloads of at least min_size bytes with the codec at the given level
+
+    A compressed payload that is not at most max_ratio of the original size, i.e. incompressible data, is sent
+    raw so the receiver does not pay for decompressing it either.
+    """
+
+    def __init__(self, codec='zlib', level=6, min_size=512, max_ratio=0.9):
+        if codec not in PAYLOAD_CODECS:
+            raise ValueError(f'Unknown payload codec: [{codec}], expected one of {list(PAYLOAD_CODECS)}')
+        self._codec = codec
+        self._compress = PAYLOAD_CODECS[codec][0]
+        self._level = level
+        self._min_size = min_size
+        self._max_ratio = max_ratio
+        self._stats = CompressionStats()
+
+    @property
+    def stats(self) -> CompressionStats:
+        return self._stats
+
+    def compress(self, payload):
+        """return the payload to send and the message properties advertising its codec"""
+        if isinstance(payload, str):
+            payload = payload.encode(_sol_constants.ENCODING_TYPE)
+        if len(payload) < self._min_size:
+            self._stats.record(len(payload), len(payload), 0, False)
+            return payload, {}
+        start = time.process_time_ns()
+        compressed_payload = self._compress(payload, self._level)
+        cpu_time_ns = time.process_time_ns() - start
+        if len(compressed_payload) > len(payload) * self._max_ratio:
+            self._stats.record(len(payload), len(payload), cpu_time_ns, False)
+            return payload, {}
+        self._stats.record(len(payload), len(compressed_payload), cpu_time_ns, True)
+        return compressed_payload, {PAYLOAD_CODEC_PROPERTY: self._codec}
+
+    def build(self, message_builder: OutboundMessageBuilder, payload, additional_message_properties=None):
+        """build an outbound message with the compressed payload and its codec property"""
+        compressed_payload, codec_properties = self.compress(payload)
+        properties = dict(additional_message_properties or {}, **codec_properties)
+        return message_builder.build(bytearray(compressed_payload), additional_message_properties=properties)
+
+
+class PayloadDecompressor:
+    """decompresses payloads according to their codec property, payloads without it are returned as is
+
+    Any publisher on the topic can send a payload expanding many thousand times, decompressing stops with a
+    ValueError at max_decompressed_size bytes, None removes the limit.
+    """
+
+    def __init__(self, max_decompressed_size=64 * 1024 * 1024):
+        self._max_decompressed_size = max_decompressed_size
+        self._stats = CompressionStats(is_decompression=True)
+
+    @property
+    def stats(self) -> CompressionStats:
+        return self._stats
+
+    def decompress(self, message: InboundMessage) -> bytes:
+        payload = message.get_payload_as_bytes() or b''
+        codec = message.get_property(PAYLOAD_CODEC_PROPERTY) if message.has_property(PAYLOAD_CODEC_PROPERTY) \
+            else None
+        if codec is None:
+            self._stats.record(len(payload), len(payload), 0, False)
+            return payload
+        if codec not in PAYLOAD_CODECS:
+            raise ValueError(f'Message on [{message.get_destination_name()}] uses unknown payload codec: [{codec}]')
+        start = time.process_time_ns()
+        decompressed_payload = decompress_bounded(codec, payload, self._max_decompressed_size)
+        self._stats.record(len(payload), len(decompressed_payload), time.process_time_ns() - start, True)
+        return decompressed_payload
+
+
+class DecompressingMessageHandler(MessageHandler):
+    """MessageHandler adapter decompressing the payload before calling on_payload(message, payload) of the
+    wrapped handler"""
+
+    def __init__(self, payload_handler, decompressor: PayloadDecompressor = None):
+        self._payload_handler = payload_handler
+        self._decompressor = decompressor or PayloadDecompressor()
+
+    @property
+    def decompressor(self) -> PayloadDecompressor:
+        return self._decompressor
+
+    def on_message(self, message: 'InboundMessage'):
+        self._payload_handler.on_payload(message, self._decompressor.decompress(message))
+
+
+class PrintingPayloadHandler:
+    """sample payload handler printing the decompressed payload"""
+
+    def on_payload(self, message: 'InboundMessage', payload: bytes):
+        print(f"CALLBACK: Message Received on Topic: {message.get_destination_name()}, "
+              f"decompressed payload size: {len(payload)}")
+
+
+class HowToCompressMessagePayload:
+    """class contains methods to compress and decompress message payloads per message"""
+
+    @staticmethod
+    def compare_codecs(payloads, codec_levels, min_size=0):
+        """compress the sample payloads with every (codec, level) and return the CPU cost and bytes saved of each
+
+        No broker connection is needed.
+        """
+        results = []
+        for codec, level in codec_levels:
+            compressor = PayloadCompressor(codec, level, min_size=min_size, max_ratio=float('inf'))
+            for payload in payloads:
+                compressor.compress(payload)
+            results.append(dict(codec=codec, level=level, **compressor.stats.to_dict()))
+        return results
+
+    @staticmethod
+    def publish_and_consume_compressed_payloads(messaging_service: MessagingService, destination: Topic, payloads,
+                                                compressor: PayloadCompressor):
+        """ to publish compressed payloads and receive them decompressed"""
+        try:
+            receiver = messaging_service.create_direct_message_receiver_builder() \
+                .with_subscriptions([TopicSubscription.of(destination.get_name())]).build()
+            receiver.start()
+            message_handler = DecompressingMessageHandler(PrintingPayloadHandler())
+            receiver.receive_async(message_handler)
+
+            publisher = messaging_service.create_direct_message_publisher_builder().build()
+            publisher.start()
+            message_builder = messaging_service.message_builder() \
+                .with_application_message_id(constants.APPLICATION_MESSAGE_ID)
+            for payload in payloads:
+                publisher.publish(destination=destination, message=compressor.build(message_builder, payload))
+            time.sleep(2)
+            print(f'Publisher compression: {compressor.stats.to_dict()}')
+            print(f'Receiver decompression: {message_handler.decompressor.stats.to_dict()}')
+        finally:
+            util.publisher_terminate(publisher)
+            receiver.terminate(0)
+
+    @staticmethod
+    def run():
+        payloads = [json.dumps({'sequence': e, 'message': constants.MESSAGE_TO_SEND,
+                                'properties': constants.CUSTOM_PROPS, 'values': list(range(e % 200))})
+                    for e in range(100)]
+        print("Execute payload codec comparison")
+        for result in HowToCompressMessagePayload \
+                .compare_codecs(payloads, [('zlib', 1), ('zlib', 6), ('zlib', 9), ('lzma', 0), ('lzma', 6),
+                                           ('bz2', 9)]):
+            print(f'[CODEC] {json.dumps(result)}')
+
+        try:
+            service = MessagingService.builder().from_properties(boot.broker_properties()).build()
+            service.connect()
+            destination_name = Topic.of(constants.TOPIC_ENDPOINT_DEFAULT)
+
+            print("Execute Direct Publish and Consume - zlib compressed payloads")
+            HowToCompressMessagePayload \
+                .publish_and_consume_compressed_payloads(service, destination_name, payloads,
+                                                         PayloadCompressor('zlib', level=6, min_size=256))
+        finally:
+            service.disconnect()
+
+
+if __name__ == '__main__':
+    HowToCompressMessagePayload().run()
@@ -0,0 +1,215 @@
+""" Run this file to process persistent messages on a pool of worker threads, in order within a partition key taken
+from a message property or a topic level, acknowledging each message only once its handler has completed"""
+import threading
+import time
+from typing import TypeVar
+
+from solace.messaging.messaging_service import MessagingService
+from solace.messaging.receiver.inbound_message import InboundMessage
+from solace.messaging.resources.queue import Queue
+from solace.messaging.resources.topic import Topic
+from solace.messaging.resources.topic_subscription import TopicSubscription
+from how_to_dispatch_messages_to_worker_pool import DispatchingMessageHandler, OverflowPolicy
+from how_to_publish_persistent_message import HowToPublishPersistentMessage
+from sampler_boot import SamplerBoot, SolaceConstants, SamplerUtil
+
+X = TypeVar('X')
+constants = SolaceConstants
+boot = SamplerBoot()
+util = SamplerUtil()
+
+PARTITION_KEY_PROPERTY = 'sample_partition_key'
+
+
+def property_key(property_name: str = PARTITION_KEY_PROPERTY):
+    """partition key function reading a message property, messages without it share the None partition"""
+    return lambda message: message.get_property(property_name)
+
+
+def topic_level_key(level: int):
+    """partition key function reading one level of the topic, e.g. 2 for the account of orders/new/<account>"""
+    return lambda message: message.get_destination_name().split('/')[level]
+
+
+class AcknowledgingMessageHandler(DispatchingMessageHandler):
+    """DispatchingMessageHandler for a persistent receiver acknowledging each message once on_message of the wrapped
+    handler has returned, instead of acknowledging inline on the receiver dispatch thread
+
+    Messages with the same partition key are handled and acknowledged in order by one worker, different keys in
+    parallel. Overflow always blocks the receiver dispatch thread, so no message is dropped unacknowledged. A
+    handler failure is retried in place up to max_attempts times. A message still failing then goes to
+    dead_letter(message, exception) when given, e.g. to republish it to a dead letter topic, and is acknowledged.
+    Without dead_letter its partition key is blocked: neither it nor any later message of that key is
+    acknowledged, and with terminate_on_block the receiver is terminated, so that the broker redelivers the failed
+    message and its successors in order to the next receiver bound to the queue, at least once delivery. Messages
+    of other keys still in flight are then left unacknowledged too, to be redelivered.
+    """
+
+    def __init__(self, receiver, handler, key=None, worker_count=4, queue_capacity=1000, max_attempts=3,
+                 retry_delay_ms=100, dead_letter=None, terminate_on_block=True):
+        super().__init__(handler, worker_count=worker_count, queue_capacity=queue_capacity,
+                         overflow_policy=OverflowPolicy.BLOCK, key=key)
+        if max_attempts < 1:
+            raise ValueError(f'Invalid max_attempts[{max_attempts}], expected >= 1')
+        self._receiver = receiver
+        self._max_attempts = max_attempts
+        self._retry_delay = retry_delay_ms / 1000
+        self._dead_letter = dead_letter
+        self._terminate_on_block = terminate_on_block
+        self._ack_lock = threading.Lock()
+        self._blocked_keys = set()
+        self._is_terminated = False
+        self.acked_count = 0
+        self.retried_count = 0
+        self.dead_lettered_count = 0
+        self.unacked_count = 0
+
+    @property
+    def blocked_keys(self):
+        with self._ack_lock:
+            return set(self._blocked_keys)
+
+    def _is_blocked(self, partition):
+        with self._ack_lock:
+            if self._is_terminated or partition in self._blocked_keys:
+                self.unacked_count += 1
+                return True
+            return False
+
+    def _handle_with_retries(self, message: InboundMessage):
+        for attempt in range(1, self._max_attempts + 1):
+            try:
+                self._handler.on_message(message)
+                return
+            except Exception:
+                if attempt == self._max_attempts:
+                    raise
+                with self._ack_lock:
+                    self.retried_count += 1
+                time.sleep(self._retry_delay)
+
+    def _process(self, message: InboundMessage):
+        # without a key all messages share the None partition, one failure then holds back the whole stream
+        partition = self._key(message) if self._key is not None else None
+        if self._is_blocked(partition):
+            return False
+        try:
+            self._handle_with_retries(message)
+        except Exception as exception:
+            if self._dead_letter is None:
+                self._block(partition)
+                raise
+            self._dead_letter(message, exception)
+            with self._ack_lock:
+                self.dead_lettered_count += 1
+        with self._ack_lock:
+            # acked under the lock _block() terminates the receiver under, never on a terminating receiver
+            if self._is_terminated:
+                self.unacked_count += 1
+                return False
+            self._receiver.ack(message)
+            self.acked_count += 1
+        return True
+
+    def _block(self, partition):
+        with self._ack_lock:
+            self._blocked_keys.add(partition)
+            self.unacked_count += 1
+            terminate = self._terminate_on_block and not self._is_terminated
+            self._is_terminated = self._is_terminated or self._terminate_on_block
+        print(f'Partition [{partition}] blocked, its messages are left unacknowledged for redelivery')
+        if terminate:
+            # asynchronously, the receiver dispatch thread may be blocked on a full worker queue
+            self._receiver.terminate_async(0)
+
+    def metrics(self, reset=False):
+        with self._ack_lock:
+            ack_counts = {'acked': self.acked_count, 'retried': self.retried_count,
+                          'dead_lettered': self.dead_lettered_count, 'unacked': self.unacked_count,
+                          'blocked_keys': sorted(map(str, self._blocked_keys))}
+        return dict(super().metrics(reset), **ack_counts)
+
+
+def print_dead_letter(message: InboundMessage, exception: Exception):
+    """sample dead letter callback, a real one would republish the message to a dead letter topic or queue"""
+    print(f'Dead letter on [{message.get_destination_name()}]: {message.get_payload_as_string()}, {exception}')
+
+
+class PartitionOrderCheckingHandler:
+    """sample handler taking handler_time_ms per message and counting messages of a partition handled out of
+    their publish order"""
+
+    def __init__(self, key, handler_time_ms=5):
+        self._key = key
+        self._handler_time = handler_time_ms / 1000
+        self._lock = threading.Lock()
+        self._last_sequence = {}
+        self.out_of_order_count = 0
+
+    def on_message(self, message: 'InboundMessage'):
+        time.sleep(self._handler_time)
+        partition = self._key(message)
+        sequence = int(message.get_payload_as_string().rsplit(' ', 1)[-1])
+        with self._lock:
+            if sequence < self._last_sequence.get(partition, -1):
+                self.out_of_order_count += 1
+            self._last_sequence[partition] = sequence
+
+
+class HowToConsumePersistentMessagesInParallel:
+    """class contains methods to consume persistent messages in parallel with acknowledgement after processing"""
+
+    @staticmethod
+    def consume_in_parallel_with_deferred_ack(messaging_service: MessagingService, topic: Topic, message_count,
+                                              partition_count, worker_count):
+        """ to publish messages over partition_count partition keys and process them on worker_count workers,
+        acknowledging each one after its handler has completed"""
+        key = property_key()
+        handler = PartitionOrderCheckingHandler(key)
+        try:
+            receiver = messaging_service.create_persistent_message_receiver_builder() \
+                .build(Queue.non_durable_exclusive_queue())
+            receiver.start()
+            receiver.add_subscription(TopicSubscription.of(topic.get_name()))
+            message_handler = AcknowledgingMessageHandler(receiver, handler, key=key, worker_count=worker_count,
+                                                          queue_capacity=100, dead_letter=print_dead_letter)
+            receiver.receive_async(message_handler)
+
+            publisher = HowToPublishPersistentMessage.create_persistent_message_publisher(messaging_service)
+            start = time.perf_counter()
+            for e in range(message_count):
+                outbound_msg = messaging_service.message_builder() \
+                    .with_property(PARTITION_KEY_PROPERTY, f'account-{e % partition_count}') \
+                    .build(f'{constants.MESSAGE_TO_SEND} {e}')
+                publisher.publish(outbound_msg, topic)
+            while message_handler.acked_count + message_handler.unacked_count < message_count \
+                    and time.perf_counter() - start < 30:
+                time.sleep(0.1)
+            elapsed = time.perf_counter() - start
+            print(f'{worker_count} worker(s): {message_handler.acked_count} message(s) acknowledged in '
+                  f'{elapsed:.2f}s, out of order: {handler.out_of_order_count}, '
+                  f'metrics: {message_handler.metrics()}')
+        finally:
+            message_handler.shutdown(timeout=10)
+            publisher.terminate(0)
+            receiver.terminate(0)
+
+    @staticmethod
+    def run():
+        try:
+            service = MessagingService.builder().from_properties(boot.broker_properties()).build()
+            service.connect()
+            topic = Topic.of(constants.TOPIC_ENDPOINT_DEFAULT)
+
+            for worker_count in (1, 4, 16):
+                print(f"Execute Persistent Consume - {worker_count} worker(s), partition key ordering, ack after "
+                      f"processing")
+                HowToConsumePersistentMessagesInParallel \
+                    .consume_in_parallel_with_deferred_ack(service, topic, message_count=500, partition_count=32,
+                                                           worker_count=worker_count)
+        finally:
+            service.disconnect()
+
+
+if __name__ == '__main__':
+    HowToConsumePersistentMessagesInParallel().run()
@@ -0,0 +1,176 @@
+""" Run this file to route and filter received messages on their topic and properties through a lazy message view,
+which decodes the payload at most once and only when the handler reads it"""
+import threading
+import time
+from typing import TypeVar
+
+from solace.messaging.messaging_service import MessagingService
+from solace.messaging.receiver.inbound_message import InboundMessage
+from solace.messaging.receiver.message_receiver import MessageHandler
+from solace.messaging.resources.topic import Topic
+from solace.messaging.resources.topic_subscription import TopicSubscription
+from solace.messaging.utils.converter import BytesToObject
+from how_to_direct_publish_consume_business_obj import ByteToObjectConverter
+from how_to_direct_publish_message import PopoConverter
+from how_to_use_payload_codec_registry import CodecRegistry
+from sampler_boot import SamplerBoot, SolaceConstants, SamplerUtil, MyData
+
+X = TypeVar('X')
+constants = SolaceConstants
+boot = SamplerBoot()
+util = SamplerUtil()
+
+_UNSET = object()
+
+
+class LazyInboundMessage:
+    """view of an InboundMessage fetching the raw payload, its string form and its decoded object each at most once
+    and only on first access
+
+    The decoded object comes from the converter, or from the codec the registry picks for the message, applied to
+    the cached raw payload. Anything else, e.g. get_property or get_correlation_id, is read from the message.
+    """
+    __slots__ = ('_message', '_converter', '_registry', '_destination_name', '_payload_as_bytes',
+                 '_payload_as_string', '_payload')
+
+    def __init__(self, message: InboundMessage, converter: BytesToObject = None, registry: CodecRegistry = None):
+        self._message = message
+        self._converter = converter
+        self._registry = registry
+        self._destination_name = _UNSET
+        self._payload_as_bytes = _UNSET
+        self._payload_as_string = _UNSET
+        self._payload = _UNSET
+
+    @property
+    def message(self) -> InboundMessage:
+        return self._message
+
+    @property
+    def destination_name(self) -> str:
+        if self._destination_name is _UNSET:
+            self._destination_name = self._message.get_destination_name()
+        return self._destination_name
+
+    @property
+    def payload_as_bytes(self):
+        if self._payload_as_bytes is _UNSET:
+            self._payload_as_bytes = self._message.get_payload_as_bytes()
+        return self._payload_as_bytes
+
+    @property
+    def payload_as_string(self):
+        if self._payload_as_string is _UNSET:
+            self._payload_as_string = self._message.get_payload_as_string()
+        return self._payload_as_string
+
+    @property
+    def payload(self) -> X:
+        """the payload decoded on first access"""
+        if self._payload is _UNSET:
+            payload_as_bytes = self.payload_as_bytes
+            if payload_as_bytes is None:
+                self._payload = None
+            elif self._converter is not None:
+                self._payload = self._converter.convert(payload_as_bytes)
+            elif self._registry is not None:
+                self._payload = self._registry.codec_of(self._message).decode(payload_as_bytes)
+            else:
+                raise ValueError('Lazy message view has neither a converter nor a codec registry to decode with')
+        return self._payload
+
+    @property
+    def is_decoded(self):
+        return self._payload is not _UNSET
+
+    def __getattr__(self, name):
+        return getattr(self._message, name)
+
+
+class LazyMessageHandler(MessageHandler):
+    """MessageHandler adapter wrapping each message in a LazyInboundMessage, calling on_message(view) of the wrapped
+    handler for the views message_filter accepts
+
+    The filter runs on the topic and properties only, so rejected messages are never decoded. Received, filtered
+    and decoded messages are counted.
+    """
+
+    def __init__(self, handler, converter: BytesToObject = None, registry: CodecRegistry = None,
+                 message_filter=None):
+        self._handler = handler
+        self._converter = converter
+        self._registry = registry
+        self._message_filter = message_filter
+        self._lock = threading.Lock()
+        self.received_count = 0
+        self.filtered_count = 0
+        self.decoded_count = 0
+
+    def on_message(self, message: 'InboundMessage'):
+        view = LazyInboundMessage(message, self._converter, self._registry)
+        is_accepted = self._message_filter is None or self._message_filter(view)
+        if is_accepted:
+            self._handler.on_message(view)
+        with self._lock:
+            self.received_count += 1
+            self.filtered_count += int(not is_accepted)
+            self.decoded_count += int(view.is_decoded)
+
+
+class TopicRoutingHandler:
+    """sample handler routing on the last topic level, only order messages have their payload decoded"""
+
+    def on_message(self, view: LazyInboundMessage):
+        if view.destination_name.endswith('/orders'):
+            print(f"CALLBACK: Order received on Topic: {view.destination_name}, name: {view.payload.get_name()}, "
+                  f"name again, not decoded again: {view.payload.get_name()}")
+        else:
+            print(f"CALLBACK: Heartbeat received on Topic: {view.destination_name}, "
+                  f"correlation id: {view.get_correlation_id()}")
+
+
+class HowToConsumeWithLazyPayload:
+    """class contains methods to consume messages decoding their payload lazily"""
+
+    @staticmethod
+    def direct_message_consume_lazily(messaging_service: MessagingService, topic_prefix):
+        """ to route orders, heartbeats and filtered out audit messages without decoding the latter two"""
+        try:
+            receiver = messaging_service.create_direct_message_receiver_builder() \
+                .with_subscriptions([TopicSubscription.of(f'{topic_prefix}/>')]).build()
+            receiver.start()
+            message_handler = LazyMessageHandler(TopicRoutingHandler(), converter=ByteToObjectConverter(),
+                                                 message_filter=lambda view: not view.destination_name.endswith(
+                                                     '/audit'))
+            receiver.receive_async(message_handler)
+
+            publisher = messaging_service.create_direct_message_publisher_builder().build()
+            publisher.start()
+            message_builder = messaging_service.message_builder() \
+                .with_application_message_id(constants.APPLICATION_MESSAGE_ID)
+            for e in range(10):
+                for topic_level in ('orders', 'heartbeats', 'audit'):
+                    outbound_msg = message_builder.build(MyData(f'{constants.MESSAGE_TO_SEND} {e}'),
+                                                         converter=PopoConverter())
+                    publisher.publish(destination=Topic.of(f'{topic_prefix}/{topic_level}'), message=outbound_msg)
+            time.sleep(2)
+            print(f'Received {message_handler.received_count} message(s), filtered out '
+                  f'{message_handler.filtered_count}, decoded {message_handler.decoded_count}')
+        finally:
+            util.publisher_terminate(publisher)
+            receiver.terminate(0)
+
+    @staticmethod
+    def run():
+        try:
+            service = MessagingService.builder().from_properties(boot.broker_properties()).build()
+            service.connect()
+
+            print("Execute Direct Publish and Consume - lazy payload decoding")
+            HowToConsumeWithLazyPayload.direct_message_consume_lazily(service, constants.TOPIC_ENDPOINT_DEFAULT)
+        finally:
+            service.disconnect()
+
+
+if __name__ == '__main__':
+    HowToConsumeWithLazyPayload().run()
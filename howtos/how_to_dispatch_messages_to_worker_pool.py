@@ -0,0 +1,257 @@
+""" Run this file to run a slow message handler on a pool of worker threads fed through bounded queues, so that the
+receiver dispatch thread is never stalled by it, keeping messages of the same topic or key in order"""
+import threading
+import time
+import zlib
+from collections import deque
+from enum import Enum
+from typing import TypeVar
+
+from solace.messaging.config import _sol_constants
+from solace.messaging.errors.pubsubplus_client_error import IllegalStateError
+from solace.messaging.messaging_service import MessagingService
+from solace.messaging.receiver.inbound_message import InboundMessage
+from solace.messaging.receiver.message_receiver import MessageHandler
+from solace.messaging.resources.topic import Topic
+from solace.messaging.resources.topic_subscription import TopicSubscription
+from how_to_measure_persistent_publish_latency import LatencyHistogram
+from sampler_boot import SamplerBoot, SolaceConstants, SamplerUtil
+
+X = TypeVar('X')
+constants = SolaceConstants
+boot = SamplerBoot()
+util = SamplerUtil()
+
+
+class OverflowPolicy(Enum):
+    """what dispatching does when the queue of the target worker is full"""
+    BLOCK = 'block'
+    DROP_OLDEST = 'drop_oldest'
+    REJECT = 'reject'
+
+
+def topic_key(message: InboundMessage):
+    """ordering key keeping the messages of a topic in order"""
+    return message.get_destination_name()
+
+
+def key_to_worker(key, worker_count: int) -> int:
+    """stable worker index of an ordering key, the same in every process unlike hash() of a str"""
+    if isinstance(key, str):
+        key = key.encode(_sol_constants.ENCODING_TYPE)
+    return zlib.crc32(key if isinstance(key, bytes) else repr(key).encode()) % worker_count
+
+
+class _WorkerQueue:
+    """bounded FIFO of (message, enqueue time) of one worker, a deque so DROP_OLDEST can evict its head"""
+
+    def __init__(self, capacity: int):
+        self._capacity = capacity
+        self._items = deque()
+        self._condition = threading.Condition()
+        self._is_closed = False
+        self.max_depth = 0
+
+    def __len__(self):
+        return len(self._items)
+
+    def put(self, item, overflow_policy: OverflowPolicy):
+        """enqueue item, return the item evicted or rejected, if any, raise IllegalStateError once closed"""
+        with self._condition:
+            if self._is_closed:
+                raise IllegalStateError('Worker queue is closed, the dispatcher has been shut down')
+            if len(self._items) >= self._capacity:
+                if overflow_policy is OverflowPolicy.REJECT:
+                    return item
+                if overflow_policy is OverflowPolicy.DROP_OLDEST:
+                    evicted = self._items.popleft()
+                    self._items.append(item)
+                    return evicted
+                while len(self._items) >= self._capacity and not self._is_closed:
+                    self._condition.wait()
+                if self._is_closed:
+                    # the workers may have exited already, the item would never be handled
+                    raise IllegalStateError('Worker queue closed while waiting for room, the dispatcher has been '
+                                            'shut down')
+            self._items.append(item)
+            self.max_depth = max(self.max_depth, len(self._items))
+            self._condition.notify_all()
+            return None
+
+    def get(self):
+        """dequeue the oldest item, None once closed and empty"""
+        with self._condition:
+            while not self._items and not self._is_closed:
+                self._condition.wait()
+            if not self._items:
+                return None
+            item = self._items.popleft()
+            self._condition.notify_all()
+            return item
+
+    def close(self):
+        with self._condition:
+            self._is_closed = True
+            self._condition.notify_all()
+
+
+class DispatchingMessageHandler(MessageHandler):
+    """MessageHandler handing each message to one of worker_count worker threads, which call on_message of the
+    wrapped handler
+
+    Every worker has its own queue of queue_capacity messages. With an ordering key, e.g. topic_key, messages with
+    the same key always go to the same worker and are handled in order, without one they are spread round robin.
+    When the target queue is full the overflow policy blocks the receiver dispatch thread, which pushes back on the
+    receiver buffer, drops the oldest queued message or rejects the new one; dropped and rejected messages are
+    passed to on_overflow(message, policy) of the handler when it has one. Once shutdown() has been called,
+    on_message raises IllegalStateError, including for a dispatch thread that was blocked on a full queue.
+    """
+
+    def __init__(self, handler, worker_count=4, queue_capacity=1000, overflow_policy=OverflowPolicy.BLOCK,
+                 key=None):
+        if worker_count < 1 or queue_capacity < 1:
+            raise ValueError(f'Invalid dispatcher, expected worker_count[{worker_count}] >= 1 and '
+                             f'queue_capacity[{queue_capacity}] >= 1')
+        self._handler = handler
+        self._overflow_policy = overflow_policy
+        self._key = key
+        self._queues = [_WorkerQueue(queue_capacity) for _ in range(worker_count)]
+        self._next_worker = 0
+        self._lock = threading.Lock()
+        self._counts = dict.fromkeys(('received', 'processed', 'skipped', 'failed', 'dropped', 'rejected'), 0)
+        self._queue_time = LatencyHistogram()
+        self._handler_time = LatencyHistogram()
+        self._workers = [threading.Thread(target=self._work, args=(worker_queue,), daemon=True,
+                                          name=f'message-dispatch-worker-{index}')
+                         for index, worker_queue in enumerate(self._queues)]
+        for worker in self._workers:
+            worker.start()
+
+    def _count(self, name, count=1):
+        with self._lock:
+            self._counts[name] += count
+
+    def on_message(self, message: 'InboundMessage'):
+        if self._key is not None:
+            worker_index = key_to_worker(self._key(message), len(self._queues))
+        else:
+            worker_index = self._next_worker
+            self._next_worker = (worker_index + 1) % len(self._queues)
+        overflow = self._queues[worker_index].put((message, time.perf_counter_ns()), self._overflow_policy)
+        self._count('received')
+        if overflow is not None:
+            self._count('rejected' if self._overflow_policy is OverflowPolicy.REJECT else 'dropped')
+            on_overflow = getattr(self._handler, 'on_overflow', None)
+            if on_overflow is not None:
+                on_overflow(overflow[0], self._overflow_policy)
+
+    def _work(self, worker_queue: _WorkerQueue):
+        while True:
+            item = worker_queue.get()
+            if item is None:
+                return
+            message, enqueue_time = item
+            start = time.perf_counter_ns()
+            self._queue_time.record((start - enqueue_time) // 1000)
+            try:
+                self._count('skipped' if self._process(message) is False else 'processed')
+            except Exception as exception:  # a failing message must not kill the worker
+                self._count('failed')
+                print(f'Message handler failed on [{message.get_destination_name()}]: {exception}')
+            self._handler_time.record((time.perf_counter_ns() - start) // 1000)
+
+    def _process(self, message: InboundMessage):
+        """handle one message on a worker thread, return False when it was skipped rather than handled"""
+        self._handler.on_message(message)
+
+    def metrics(self, reset=False):
+        """message counts, current and max queue depth per worker, and queue wait and handler time in
+        microseconds"""
+        with self._lock:
+            counts = dict(self._counts)
+        return dict(counts, queue_depths=[len(worker_queue) for worker_queue in self._queues],
+                    max_queue_depths=[worker_queue.max_depth for worker_queue in self._queues],
+                    queue_time_us=self._queue_time.snapshot(reset).to_dict(),
+                    handler_time_us=self._handler_time.snapshot(reset).to_dict())
+
+    def shutdown(self, timeout=None):
+        """stop the workers once they have handled the messages already queued"""
+        for worker_queue in self._queues:
+            worker_queue.close()
+        for worker in self._workers:
+            worker.join(timeout)
+
+
+class SlowPrintingHandler:
+    """sample handler taking handler_time_ms per message and checking messages of a topic arrive in order"""
+
+    def __init__(self, handler_time_ms=5):
+        self._handler_time = handler_time_ms / 1000
+        self._lock = threading.Lock()
+        self._last_sequence = {}
+        self.out_of_order_count = 0
+
+    def on_message(self, message: 'InboundMessage'):
+        time.sleep(self._handler_time)
+        topic = message.get_destination_name()
+        sequence = int(message.get_payload_as_string().rsplit(' ', 1)[-1])
+        with self._lock:
+            if sequence < self._last_sequence.get(topic, -1):
+                self.out_of_order_count += 1
+            self._last_sequence[topic] = sequence
+
+    def on_overflow(self, message: 'InboundMessage', policy: OverflowPolicy):
+        print(f'Message on [{message.get_destination_name()}] not handled, worker queue full, policy: '
+              f'{policy.value}')
+
+
+class HowToDispatchMessagesToWorkerPool:
+    """class contains methods to handle received messages on a worker pool"""
+
+    @staticmethod
+    def direct_message_consume_on_worker_pool(messaging_service: MessagingService, topic_prefix, topic_count,
+                                              message_count, dispatcher_factory):
+        """ to receive messages on topic_count topics and handle them on the worker pool of the dispatcher"""
+        handler = SlowPrintingHandler()
+        dispatcher = dispatcher_factory(handler)
+        try:
+            receiver = messaging_service.create_direct_message_receiver_builder() \
+                .with_subscriptions([TopicSubscription.of(f'{topic_prefix}/>')]).build()
+            receiver.start()
+            receiver.receive_async(dispatcher)
+
+            publisher = messaging_service.create_direct_message_publisher_builder().build()
+            publisher.start()
+            for e in range(message_count):
+                publisher.publish(destination=Topic.of(f'{topic_prefix}/{e % topic_count}'),
+                                  message=f'{constants.MESSAGE_TO_SEND} {e}')
+            time.sleep(2)
+        finally:
+            util.publisher_terminate(publisher)
+            receiver.terminate(0)
+            dispatcher.shutdown(timeout=10)
+        print(f'Dispatcher metrics: {dispatcher.metrics()}, out of order: {handler.out_of_order_count}')
+
+    @staticmethod
+    def run():
+        try:
+            service = MessagingService.builder().from_properties(boot.broker_properties()).build()
+            service.connect()
+
+            print("Execute Direct Consume - worker pool, per topic ordering, block on overflow")
+            HowToDispatchMessagesToWorkerPool.direct_message_consume_on_worker_pool(
+                service, constants.TOPIC_ENDPOINT_DEFAULT, topic_count=8, message_count=1000,
+                dispatcher_factory=lambda handler: DispatchingMessageHandler(handler, worker_count=8,
+                                                                             queue_capacity=100, key=topic_key))
+
+            print("Execute Direct Consume - worker pool, drop oldest on overflow")
+            HowToDispatchMessagesToWorkerPool.direct_message_consume_on_worker_pool(
+                service, constants.TOPIC_ENDPOINT_DEFAULT, topic_count=8, message_count=1000,
+                dispatcher_factory=lambda handler: DispatchingMessageHandler(
+                    handler, worker_count=4, queue_capacity=10, overflow_policy=OverflowPolicy.DROP_OLDEST))
+        finally:
+            service.disconnect()
+
+
+if __name__ == '__main__':
+    HowToDispatchMessagesToWorkerPool().run()
@@ -0,0 +1,210 @@
+"""sampler for measuring the publish to receipt latency of persistent messages with HDR style histograms"""
+import threading
+import time
+from typing import TypeVar
+
+from solace.messaging.messaging_service import MessagingService
+from solace.messaging.publisher.persistent_message_publisher import PersistentMessagePublisher, \
+    MessagePublishReceiptListener
+from solace.messaging.resources.topic import Topic
+from how_to_publish_persistent_message import HowToPublishPersistentMessage
+from sampler_boot import SolaceConstants, SamplerBoot
+
+X = TypeVar('X')
+constants = SolaceConstants
+boot = SamplerBoot()
+
+
+class HistogramSnapshot:
+    """immutable copy of the bucket counts of a LatencyHistogram"""
+
+    def __init__(self, histogram: 'LatencyHistogram', counts, total_count, min_value, max_value, value_sum):
+        self._histogram = histogram
+        self._counts = counts
+        self.total_count = total_count
+        self.min = min_value
+        self.max = max_value
+        self._value_sum = value_sum
+
+    @property
+    def mean(self):
+        return self._value_sum / self.total_count if self.total_count else None
+
+    def percentile(self, percent: float):
+        """value at the given percentile, reported as the highest value of its bucket"""
+        if not self.total_count:
+            return None
+        rank = max(1, int(self.total_count * percent / 100 + 0.5))
+        running_count = 0
+        for index, count in enumerate(self._counts):
+            running_count += count
+            if running_count >= rank:
+                return min(self._histogram.highest_equivalent_value(index), self.max)
+        return self.max
+
+    def to_dict(self):
+        return {'count': self.total_count, 'min': self.min, 'max': self.max, 'mean': self.mean,
+                'p50': self.percentile(50), 'p90': self.percentile(90), 'p99': self.percentile(99),
+                'p99.9': self.percentile(99.9)}
+
+
+class LatencyHistogram:
+    """thread safe histogram with HDR style log-linear buckets
+
+    Values are non negative integers, e.g. microseconds. Values below 2^sub_bucket_bits are counted exactly,
+    above that every power of two range is split into 2^(sub_bucket_bits - 1) buckets, so a recorded value is
+    off by less than 1/2^(sub_bucket_bits - 1) of itself. Values above highest_trackable_value are clamped.
+    Recording is a bit shift and a list increment, a snapshot copies the bucket list.
+    """
+
+    def __init__(self, highest_trackable_value=60_000_000, sub_bucket_bits=7):
+        self._sub_bucket_bits = sub_bucket_bits
+        self._sub_bucket_count = 1 << sub_bucket_bits
+        self._sub_bucket_half_count = self._sub_bucket_count >> 1
+        self._highest_trackable_value = highest_trackable_value
+        self._lock = threading.Lock()
+        self._counts = [0] * (self._bucket_index(highest_trackable_value) + 1)
+        self._total_count = 0
+        self._min = None
+        self._max = None
+        self._value_sum = 0
+
+    def _bucket_index(self, value: int) -> int:
+        if value < self._sub_bucket_count:
+            return value
+        shift = value.bit_length() - self._sub_bucket_bits
+        return self._sub_bucket_count + (shift - 1) * self._sub_bucket_half_count + \
+            (value >> shift) - self._sub_bucket_half_count
+
+    def highest_equivalent_value(self, index: int) -> int:
+        """highest value counted in the bucket at the given index"""
+        if index < self._sub_bucket_count:
+            return index
+        shift = (index - self._sub_bucket_count) // self._sub_bucket_half_count + 1
+        sub_bucket = (index - self._sub_bucket_count) % self._sub_bucket_half_count + self._sub_bucket_half_count
+        return ((sub_bucket + 1) << shift) - 1
+
+    def record(self, value: int):
+        value = min(max(0, int(value)), self._highest_trackable_value)
+        index = self._bucket_index(value)
+        with self._lock:
+            self._counts[index] += 1
+            self._total_count += 1
+            self._value_sum += value
+            if self._min is None or value < self._min:
+                self._min = value
+            if self._max is None or value > self._max:
+                self._max = value
+
+    def snapshot(self, reset=False) -> HistogramSnapshot:
+        with self._lock:
+            snapshot = HistogramSnapshot(self, list(self._counts), self._total_count, self._min, self._max,
+                                         self._value_sum)
+            if reset:
+                self._counts = [0] * len(self._counts)
+                self._total_count, self._min, self._max, self._value_sum = 0, None, None, 0
+        return snapshot
+
+
+class PublishTimeStamp:
+    """user context stamped at publish time, carries the caller's own user context"""
+    __slots__ = ('publish_time_ns', 'topic_name', 'user_context')
+
+    def __init__(self, topic_name: str, user_context):
+        self.publish_time_ns = time.monotonic_ns()
+        self.topic_name = topic_name
+        self.user_context = user_context
+
+
+class PublishLatencyReceiptListener(MessagePublishReceiptListener):
+    """receipt listener recording publish to receipt latency, in microseconds, overall and per topic"""
+
+    def __init__(self, delegate: MessagePublishReceiptListener = None, highest_trackable_value_us=60_000_000):
+        self._delegate = delegate
+        self._highest_trackable_value_us = highest_trackable_value_us
+        self._overall_histogram = LatencyHistogram(highest_trackable_value_us)
+        self._topic_histograms = {}
+        self._lock = threading.Lock()
+
+    def _topic_histogram(self, topic_name) -> LatencyHistogram:
+        histogram = self._topic_histograms.get(topic_name)
+        if histogram is None:
+            with self._lock:
+                histogram = self._topic_histograms.setdefault(topic_name,
+                                                              LatencyHistogram(self._highest_trackable_value_us))
+        return histogram
+
+    def on_publish_receipt(self, publish_receipt: 'PublishReceipt'):
+        time_stamp = publish_receipt.user_context
+        if isinstance(time_stamp, PublishTimeStamp):
+            latency_us = (time.monotonic_ns() - time_stamp.publish_time_ns) // 1000
+            self._overall_histogram.record(latency_us)
+            self._topic_histogram(time_stamp.topic_name).record(latency_us)
+        if self._delegate:
+            self._delegate.on_publish_receipt(publish_receipt)
+
+    def snapshot(self, reset=False):
+        """latency snapshots as {'overall': HistogramSnapshot, 'topics': {topic name: HistogramSnapshot}}"""
+        with self._lock:
+            topic_histograms = dict(self._topic_histograms)
+        return {'overall': self._overall_histogram.snapshot(reset),
+                'topics': {topic_name: histogram.snapshot(reset)
+                           for topic_name, histogram in topic_histograms.items()}}
+
+
+class LatencyInstrumentedPersistentPublisher:
+    """persistent publisher stamping every message with a monotonic publish time
+
+    The caller's user context is available in the receipt as publish_receipt.user_context.user_context.
+    """
+
+    def __init__(self, publisher: PersistentMessagePublisher, receipt_listener: MessagePublishReceiptListener = None):
+        self._publisher = publisher
+        self._latency_listener = PublishLatencyReceiptListener(receipt_listener)
+        self._publisher.set_message_publish_receipt_listener(self._latency_listener)
+
+    def publish(self, message, destination: Topic, user_context=None, additional_message_properties=None):
+        self._publisher.publish(message, destination, user_context=PublishTimeStamp(destination.get_name(),
+                                                                                    user_context),
+                                additional_message_properties=additional_message_properties)
+
+    def latency_snapshot(self, reset=False):
+        return self._latency_listener.snapshot(reset)
+
+
+class HowToMeasurePersistentPublishLatency:
+    """class contains methods to measure the broker acknowledgement latency of persistent messages"""
+
+    @staticmethod
+    def publish_and_print_receipt_latency(message_publisher: PersistentMessagePublisher, destinations,
+                                          message, message_count):
+        """method to publish messages round robin on the destinations and print the latency histograms"""
+        instrumented_publisher = LatencyInstrumentedPersistentPublisher(message_publisher)
+        for e in range(message_count):
+            instrumented_publisher.publish(message, destinations[e % len(destinations)])
+        time.sleep(2)
+        snapshot = instrumented_publisher.latency_snapshot()
+        print(f"Publish to receipt latency (us), overall: {snapshot['overall'].to_dict()}")
+        for topic_name, topic_snapshot in snapshot['topics'].items():
+            print(f"Publish to receipt latency (us), topic [{topic_name}]: {topic_snapshot.to_dict()}")
+
+    @staticmethod
+    def run():
+        try:
+            messaging_service = MessagingService.builder().from_properties(boot.broker_properties()).build()
+            messaging_service.connect()
+            print(f'Message service is connected? {messaging_service.is_connected}')
+            destinations = [Topic.of(constants.TOPIC_ENDPOINT_1), Topic.of(constants.TOPIC_ENDPOINT_2)]
+
+            publisher = HowToPublishPersistentMessage.create_persistent_message_publisher(messaging_service)
+
+            HowToMeasurePersistentPublishLatency \
+                .publish_and_print_receipt_latency(message_publisher=publisher, destinations=destinations,
+                                                   message=constants.MESSAGE_TO_SEND, message_count=1000)
+        finally:
+            messaging_service.disconnect()
+            publisher.terminate(0)
+
+
+if __name__ == '__main__':
+    HowToMeasurePersistentPublishLatency().run()
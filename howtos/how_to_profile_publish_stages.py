@@ -0,0 +1,181 @@
+""" Run this file to profile where publish time goes: topic resolution, message building, converter to_bytes and
+the publish call itself, on a sampled fraction of the messages"""
+import random
+import threading
+import time
+from typing import TypeVar
+
+from solace.messaging.messaging_service import MessagingService
+from solace.messaging.publisher.direct_message_publisher import DirectMessagePublisher
+from solace.messaging.resources.topic import Topic
+from solace.messaging.utils.converter import ObjectToBytes
+from how_to_direct_publish_message import PopoConverter, MyData
+from how_to_measure_persistent_publish_latency import LatencyHistogram
+from sampler_boot import SamplerBoot, SolaceConstants, SamplerUtil
+
+X = TypeVar('X')
+constants = SolaceConstants
+boot = SamplerBoot()
+util = SamplerUtil()
+
+STAGE_TOPIC_RESOLUTION = 'topic_resolution'
+STAGE_TO_BYTES = 'converter_to_bytes'
+STAGE_MESSAGE_BUILD = 'message_build'
+STAGE_PUBLISH = 'publish'
+
+
+class StageTimer:
+    """times the stages of one sampled publish, each mark() records the time since the previous mark"""
+    __slots__ = ('_profiler', '_last_mark_ns')
+
+    def __init__(self, profiler: 'PublishStageProfiler'):
+        self._profiler = profiler
+        self._last_mark_ns = time.perf_counter_ns()
+
+    def mark(self, stage: str):
+        now = time.perf_counter_ns()
+        self._profiler.record(stage, now - self._last_mark_ns)
+        self._last_mark_ns = now
+
+
+class PublishStageProfiler:
+    """sampling profiler aggregating per stage durations, in nanoseconds, into LatencyHistograms
+
+    Each publish is timed with probability sample_rate, the others only pay for drawing a random number. Sampling
+    at random rather than every n-th publish keeps a periodic workload, e.g. alternating string and object
+    publishes, from being sampled on one of its paths only. The sample rate can be changed at runtime, 0 disables
+    profiling.
+    """
+
+    def __init__(self, sample_rate=0.01):
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._sample_rate = 0
+        self._active = threading.local()
+        self.set_sample_rate(sample_rate)
+
+    def set_sample_rate(self, sample_rate: float):
+        if not 0 <= sample_rate <= 1:
+            raise ValueError(f'Invalid sample rate[{sample_rate}], expected 0 <= sample rate <= 1')
+        self._sample_rate = sample_rate
+
+    def sample(self):
+        """return a StageTimer if this publish is sampled, else None"""
+        if random.random() >= self._sample_rate:
+            return None
+        return StageTimer(self)
+
+    @property
+    def active_timer(self):
+        """StageTimer of the sampled publish in progress on this thread, if any"""
+        return getattr(self._active, 'timer', None)
+
+    @active_timer.setter
+    def active_timer(self, timer: StageTimer):
+        self._active.timer = timer
+
+    def record(self, stage: str, duration_ns: int):
+        histogram = self._histograms.get(stage)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(stage, LatencyHistogram(highest_trackable_value=10 ** 10))
+        histogram.record(duration_ns)
+
+    def report(self, reset=False):
+        """per stage histogram snapshot as dictionaries, durations in nanoseconds"""
+        with self._lock:
+            histograms = dict(self._histograms)
+        return {stage: histogram.snapshot(reset).to_dict() for stage, histogram in histograms.items()}
+
+
+class ProfilingConverter(ObjectToBytes):
+    """converter wrapper timing to_bytes of the delegate converter on sampled publishes"""
+
+    def __init__(self, converter: ObjectToBytes, profiler: PublishStageProfiler):
+        self._converter = converter
+        self._profiler = profiler
+
+    def to_bytes(self, src) -> bytes:
+        timer = self._profiler.active_timer
+        if timer is None:
+            return self._converter.to_bytes(src)
+        start = time.perf_counter_ns()
+        object_to_byte = self._converter.to_bytes(src)
+        self._profiler.record(STAGE_TO_BYTES, time.perf_counter_ns() - start)
+        return object_to_byte
+
+
+class ProfiledDirectPublisher:
+    """direct publisher helper timing each publish stage on the messages sampled by the profiler
+
+    The message_build stage includes the converter_to_bytes stage when a converter is given.
+    """
+
+    def __init__(self, messaging_service: MessagingService, publisher: DirectMessagePublisher,
+                 profiler: PublishStageProfiler):
+        self._message_builder = messaging_service.message_builder() \
+            .with_application_message_id(constants.APPLICATION_MESSAGE_ID)
+        self._publisher = publisher
+        self._profiler = profiler
+
+    def publish(self, topic_name: str, message, converter: ObjectToBytes = None):
+        timer = self._profiler.sample()
+        if timer is None:
+            outbound_msg = self._message_builder.build(message, converter=converter)
+            self._publisher.publish(destination=Topic.of(topic_name), message=outbound_msg)
+            return
+        destination = Topic.of(topic_name)
+        timer.mark(STAGE_TOPIC_RESOLUTION)
+        self._profiler.active_timer = timer
+        try:
+            outbound_msg = self._message_builder.build(message, converter=converter and ProfilingConverter(
+                converter, self._profiler))
+        finally:
+            self._profiler.active_timer = None
+        timer.mark(STAGE_MESSAGE_BUILD)
+        self._publisher.publish(destination=destination, message=outbound_msg)
+        timer.mark(STAGE_PUBLISH)
+
+
+class HowToProfilePublishStages:
+    """class contains methods to profile the stages of the publish path"""
+
+    @staticmethod
+    def direct_message_publish_profiled(messaging_service: MessagingService, topic_name, message_count,
+                                        profiler: PublishStageProfiler):
+        """ to publish string and business object messages with stage profiling"""
+        try:
+            direct_publisher = messaging_service.create_direct_message_publisher_builder().build()
+            direct_publisher.start()
+            profiled_publisher = ProfiledDirectPublisher(messaging_service, direct_publisher, profiler)
+            for e in range(message_count):
+                profiled_publisher.publish(topic_name, f'{constants.MESSAGE_TO_SEND} {e}')
+                profiled_publisher.publish(topic_name, MyData(f'some value {e}'), converter=PopoConverter())
+        finally:
+            util.publisher_terminate(direct_publisher)
+
+    @staticmethod
+    def run():
+        try:
+            service = MessagingService.builder().from_properties(boot.broker_properties()).build()
+            service.connect()
+            profiler = PublishStageProfiler(sample_rate=0.01)
+
+            print("Execute Direct Publish - stage profiling sampling 1% of the messages")
+            HowToProfilePublishStages.direct_message_publish_profiled(service, constants.TOPIC_ENDPOINT_DEFAULT,
+                                                                      100000, profiler)
+            for stage, stage_report in profiler.report(reset=True).items():
+                print(f'Stage [{stage}] duration (ns): {stage_report}')
+
+            profiler.set_sample_rate(0.1)
+            print("Execute Direct Publish - stage profiling sampling 10% of the messages")
+            HowToProfilePublishStages.direct_message_publish_profiled(service, constants.TOPIC_ENDPOINT_DEFAULT,
+                                                                      10000, profiler)
+            for stage, stage_report in profiler.report().items():
+                print(f'Stage [{stage}] duration (ns): {stage_report}')
+        finally:
+            service.disconnect()
+
+
+if __name__ == '__main__':
+    HowToProfilePublishStages().run()
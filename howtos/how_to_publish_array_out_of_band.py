@@ -0,0 +1,224 @@
+""" Run this file to publish large NumPy arrays with pickle protocol 5 out-of-band buffers, the array data is laid
+out raw after the pickle stream instead of being copied into it, and received as a view of the payload"""
+import json
+import pickle
+import struct
+import time
+from typing import TypeVar
+
+import numpy
+
+from solace.messaging.messaging_service import MessagingService
+from solace.messaging.receiver.inbound_message import InboundMessage
+from solace.messaging.resources.topic import Topic
+from solace.messaging.resources.topic_subscription import TopicSubscription
+from solace.messaging.utils.converter import BytesToObject, ObjectToBytes
+from how_to_use_payload_codec_registry import CodecRegistry, CodecMessageHandler, PayloadCodec, PickleCodec, \
+    PAYLOAD_CODEC_ID_PROPERTY
+from sampler_boot import SamplerBoot, SolaceConstants, SamplerUtil
+
+X = TypeVar('X')
+constants = SolaceConstants
+boot = SamplerBoot()
+util = SamplerUtil()
+
+OUT_OF_BAND_MAGIC = b'PKL5'
+OUT_OF_BAND_HEADER = struct.Struct('<4sHI')
+"""magic, out-of-band buffer count, pickle stream length, followed by one BUFFER_LENGTH per buffer"""
+BUFFER_LENGTH = struct.Struct('<Q')
+BUFFER_ALIGNMENT = 64
+"""buffers start on a 64 bytes boundary of the payload so the arrays viewing them are aligned"""
+
+
+def _aligned(offset):
+    return -(-offset // BUFFER_ALIGNMENT) * BUFFER_ALIGNMENT
+
+
+class OutOfBandFrame:
+    """layout of an out-of-band payload: header, buffer lengths, pickle stream, then each buffer aligned"""
+
+    def __init__(self, stream: bytes, buffer_lengths):
+        self.stream = stream
+        self.buffer_lengths = list(buffer_lengths)
+        offset = OUT_OF_BAND_HEADER.size + BUFFER_LENGTH.size * len(self.buffer_lengths) + len(stream)
+        self.buffer_offsets = []
+        for buffer_length in self.buffer_lengths:
+            offset = _aligned(offset)
+            self.buffer_offsets.append(offset)
+            offset += buffer_length
+        self.size = offset
+
+    def allocate(self) -> bytearray:
+        """return the payload bytearray with the header and the pickle stream written, buffers left to fill"""
+        payload = bytearray(self.size)
+        OUT_OF_BAND_HEADER.pack_into(payload, 0, OUT_OF_BAND_MAGIC, len(self.buffer_lengths), len(self.stream))
+        offset = OUT_OF_BAND_HEADER.size
+        for buffer_length in self.buffer_lengths:
+            BUFFER_LENGTH.pack_into(payload, offset, buffer_length)
+            offset += BUFFER_LENGTH.size
+        payload[offset:offset + len(self.stream)] = self.stream
+        return payload
+
+
+def encode_out_of_band(obj) -> bytearray:
+    """pickle obj with protocol 5, its out-of-band buffers are copied once, straight into the payload"""
+    buffers = []
+    stream = pickle.dumps(obj, protocol=5, buffer_callback=buffers.append)
+    raw_buffers = [buffer.raw() for buffer in buffers]
+    frame = OutOfBandFrame(stream, [raw_buffer.nbytes for raw_buffer in raw_buffers])
+    payload = frame.allocate()
+    for offset, raw_buffer in zip(frame.buffer_offsets, raw_buffers):
+        payload[offset:offset + raw_buffer.nbytes] = raw_buffer
+    return payload
+
+
+def allocate_out_of_band_array(shape, dtype):
+    """allocate the payload of an array of the given shape and dtype, and return it with the array viewing it
+
+    The array is filled in place and the payload published as is, the array data is never copied on the
+    publishing side. Its pickle stream does not depend on the values, it is computed from an empty array.
+    """
+    buffers = []
+    stream = pickle.dumps(numpy.empty(shape, dtype), protocol=5, buffer_callback=buffers.append)
+    if len(buffers) != 1:
+        raise ValueError(f'Array of dtype [{numpy.dtype(dtype)}] and shape {shape} is pickled in-band, it cannot be '
+                         f'filled in place in the payload, publish it with encode_out_of_band')
+    frame = OutOfBandFrame(stream, [buffer.raw().nbytes for buffer in buffers])
+    payload = frame.allocate()
+    array = numpy.frombuffer(payload, dtype, count=int(numpy.prod(shape)), offset=frame.buffer_offsets[0])
+    return payload, array.reshape(shape)
+
+
+def decode_out_of_band(payload, read_only=True) -> X:
+    """unpickle an out-of-band payload, NumPy arrays come back as views of the payload, not as new arrays"""
+    view = memoryview(payload)
+    if read_only:
+        view = view.toreadonly()
+    magic, buffer_count, stream_length = OUT_OF_BAND_HEADER.unpack_from(view)
+    if magic != OUT_OF_BAND_MAGIC:
+        raise ValueError(f'Not an out-of-band pickle payload, magic: {bytes(magic)}')
+    offset = OUT_OF_BAND_HEADER.size
+    buffer_lengths = [BUFFER_LENGTH.unpack_from(view, offset + index * BUFFER_LENGTH.size)[0]
+                      for index in range(buffer_count)]
+    offset += BUFFER_LENGTH.size * buffer_count
+    stream = view[offset:offset + stream_length]
+    offset += stream_length
+    buffers = []
+    for buffer_length in buffer_lengths:
+        offset = _aligned(offset)
+        buffers.append(view[offset:offset + buffer_length])
+        offset += buffer_length
+    if offset > len(view):
+        raise ValueError(f'Truncated out-of-band pickle payload, {len(view)} byte(s), expected {offset}')
+    return pickle.loads(stream, buffers=buffers)
+
+
+class OutOfBandPickleCodec(PayloadCodec):
+    """payload codec for the CodecRegistry, its bytearray payloads go to the message builder with no copy"""
+    codec_id = 'pickle:out_of_band'
+
+    def encode(self, obj) -> bytearray:
+        return encode_out_of_band(obj)
+
+    def decode(self, payload) -> X:
+        return decode_out_of_band(payload)
+
+
+class OutOfBandPickleConverter(ObjectToBytes):
+    """drop-in for the pickle PopoConverter, prefer OutOfBandPickleCodec with CodecRegistry.build since the
+    converter path of the message builder copies the payload again"""
+
+    def to_bytes(self, src) -> bytes:
+        return encode_out_of_band(src)
+
+
+class OutOfBandByteToObjectConverter(BytesToObject):
+    """drop-in for the pickle ByteToObjectConverter, for message.get_and_convert_payload(converter=...)"""
+
+    def convert(self, src: bytearray) -> X:
+        return decode_out_of_band(src)
+
+
+class ArrayStatsHandler:
+    """sample object handler printing the shape of the array received and whether it views the payload"""
+
+    def on_object(self, message: 'InboundMessage', array):
+        print(f"CALLBACK: Message Received on Topic: {message.get_destination_name()}, array shape: {array.shape}, "
+              f"dtype: {array.dtype}, mean: {array.mean():.3f}, view of the payload: {array.base is not None}, "
+              f"writeable: {array.flags.writeable}")
+
+
+class HowToPublishArrayOutOfBand:
+    """class contains methods to publish NumPy arrays with out-of-band pickle buffers"""
+
+    @staticmethod
+    def benchmark_array_encoding(array_sizes, iterations=20):
+        """time encoding and decoding float64 arrays of each size with in-band pickle and out-of-band buffers
+
+        No broker connection is needed.
+        """
+        results = []
+        for array_size in array_sizes:
+            array = numpy.random.default_rng(0).random(array_size)
+            paths = {'pickle_in_band': (PickleCodec().encode, pickle.loads),
+                     'pickle_out_of_band': (encode_out_of_band, decode_out_of_band)}
+            for path_name, (encode, decode) in paths.items():
+                start = time.perf_counter()
+                for _ in range(iterations):
+                    payload = encode(array)
+                encode_elapsed = time.perf_counter() - start
+                payload = bytearray(payload)
+                start = time.perf_counter()
+                for _ in range(iterations):
+                    decode(payload)
+                decode_elapsed = time.perf_counter() - start
+                results.append({'array_bytes': array.nbytes, 'path': path_name, 'payload_bytes': len(payload),
+                                'encode_us': encode_elapsed / iterations * 1_000_000,
+                                'decode_us': decode_elapsed / iterations * 1_000_000})
+        return results
+
+    @staticmethod
+    def publish_and_consume_array(messaging_service: MessagingService, destination: Topic, shape):
+        """ to fill an array in place in its payload, publish it with no copy and receive it as a payload view"""
+        registry = CodecRegistry()
+        registry.register(OutOfBandPickleCodec())
+        try:
+            receiver = messaging_service.create_direct_message_receiver_builder() \
+                .with_subscriptions([TopicSubscription.of(destination.get_name())]).build()
+            receiver.start()
+            receiver.receive_async(CodecMessageHandler(ArrayStatsHandler(), registry))
+
+            publisher = messaging_service.create_direct_message_publisher_builder().build()
+            publisher.start()
+            payload, array = allocate_out_of_band_array(shape, numpy.float64)
+            array[...] = numpy.random.default_rng(0).random(shape)
+            outbound_msg = messaging_service.message_builder() \
+                .with_application_message_id(constants.APPLICATION_MESSAGE_ID) \
+                .with_property(PAYLOAD_CODEC_ID_PROPERTY, OutOfBandPickleCodec.codec_id) \
+                .build(payload)
+            publisher.publish(destination=destination, message=outbound_msg)
+            time.sleep(2)
+        finally:
+            util.publisher_terminate(publisher)
+            receiver.terminate(0)
+
+    @staticmethod
+    def run():
+        print("Execute array encoding benchmark")
+        for result in HowToPublishArrayOutOfBand \
+                .benchmark_array_encoding([1024, 128 * 1024, 2 * 1024 * 1024]):
+            print(f'[BENCHMARK] {json.dumps(result)}')
+
+        try:
+            service = MessagingService.builder().from_properties(boot.broker_properties()).build()
+            service.connect()
+            destination_name = Topic.of(constants.TOPIC_ENDPOINT_DEFAULT)
+
+            print("Execute Direct Publish and Consume - array with out-of-band pickle buffers")
+            HowToPublishArrayOutOfBand.publish_and_consume_array(service, destination_name, (1024, 128))
+        finally:
+            service.disconnect()
+
+
+if __name__ == '__main__':
+    HowToPublishArrayOutOfBand().run()
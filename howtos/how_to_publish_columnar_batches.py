@@ -0,0 +1,255 @@
+""" Run this file to publish streams of homogeneous records as column batches, NumPy arrays for numeric fields and
+offsets plus data buffers for strings, which the consumer decodes straight into arrays"""
+import json
+import struct
+import time
+from typing import TypeVar
+
+import numpy
+
+from solace.messaging.config import _sol_constants
+from solace.messaging.messaging_service import MessagingService
+from solace.messaging.receiver.inbound_message import InboundMessage
+from solace.messaging.resources.topic import Topic
+from solace.messaging.resources.topic_subscription import TopicSubscription
+from how_to_compile_payload_schema import SchemaField, Tick, make_record_class
+from how_to_use_payload_codec_registry import CodecRegistry, CodecMessageHandler, PayloadCodec, PickleCodec
+from sampler_boot import SamplerBoot, SolaceConstants, SamplerUtil
+
+X = TypeVar('X')
+constants = SolaceConstants
+boot = SamplerBoot()
+util = SamplerUtil()
+
+COLUMN_DTYPES = {'int8': '<i1', 'uint8': '<u1', 'int16': '<i2', 'uint16': '<u2', 'int32': '<i4', 'uint32': '<u4',
+                 'int64': '<i8', 'uint64': '<u8', 'float32': '<f4', 'float64': '<f8', 'bool': '?'}
+"""schema field type: NumPy dtype of its column, str and bytes columns are offsets and data buffers"""
+
+COLUMN_BATCH_MAGIC = b'COL1'
+COLUMN_BATCH_HEADER = struct.Struct('<4sII')
+"""magic, record count, column count, followed by one COLUMN_SIZE per column then the aligned column buffers"""
+COLUMN_SIZE = struct.Struct('<Q')
+OFFSET_DTYPE = numpy.dtype('<u4')
+COLUMN_ALIGNMENT = 16
+
+
+def _aligned(offset):
+    return -(-offset // COLUMN_ALIGNMENT) * COLUMN_ALIGNMENT
+
+
+class StringColumn:
+    """str or bytes column viewing the payload: offsets has one more entry than the column has values, value i is
+    data[offsets[i]:offsets[i + 1]]"""
+    __slots__ = ('offsets', 'data', '_is_str')
+
+    def __init__(self, offsets, data: memoryview, is_str: bool):
+        self.offsets = offsets
+        self.data = data
+        self._is_str = is_str
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index):
+        value = bytes(self.data[self.offsets[index]:self.offsets[index + 1]])
+        return value.decode(_sol_constants.ENCODING_TYPE) if self._is_str else value
+
+    def tolist(self):
+        offsets = self.offsets.tolist()
+        data = bytes(self.data)
+        values = [data[start:end] for start, end in zip(offsets, offsets[1:])]
+        return [value.decode(_sol_constants.ENCODING_TYPE) for value in values] if self._is_str else values
+
+    @property
+    def lengths(self):
+        return numpy.diff(self.offsets)
+
+
+class ColumnBatch:
+    """decoded column batch: columns maps each field name to a read-only NumPy array or a StringColumn viewing the
+    payload"""
+
+    def __init__(self, record_class, columns, record_count):
+        self._record_class = record_class
+        self.columns = columns
+        self.record_count = record_count
+
+    def __len__(self):
+        return self.record_count
+
+    def __getitem__(self, field_name):
+        return self.columns[field_name]
+
+    def records(self):
+        """the batch as record_class instances, for consumers that still want one object per record"""
+        columns = [column.tolist() for column in self.columns.values()]
+        return [self._record_class(*values) for values in zip(*columns)]
+
+
+class ColumnarBatchCodec(PayloadCodec):
+    """payload codec packing a list of records of a schema column by column
+
+    Numeric and bool fields become arrays of their dtype, str and bytes fields an offsets array and a data buffer.
+    Records are read by attribute, so any object with the schema fields can be encoded, decoding gives a ColumnBatch.
+    """
+
+    def __init__(self, name: str, fields):
+        self.codec_id = f'columnar:{name}'
+        self._fields = [field if isinstance(field, SchemaField) else SchemaField(*field) for field in fields]
+        for field in self._fields:
+            if field.length is not None:
+                raise ValueError(f'Column [{field.name}] of schema [{name}] cannot have a length, string columns are '
+                                 f'variable length')
+        self.record_class = make_record_class(name, [field.name for field in self._fields])
+
+    def _column_buffers(self, records):
+        buffers = []
+        for field in self._fields:
+            values = [getattr(record, field.name) for record in records]
+            if field.type in COLUMN_DTYPES:
+                buffers.append(numpy.array(values, dtype=COLUMN_DTYPES[field.type]))
+                continue
+            if field.type == 'str':
+                values = [value.encode(_sol_constants.ENCODING_TYPE) for value in values]
+            offsets = numpy.zeros(len(values) + 1, dtype=OFFSET_DTYPE)
+            numpy.cumsum([len(value) for value in values], out=offsets[1:])
+            buffers.append((offsets, b''.join(values)))
+        return buffers
+
+    def encode(self, obj) -> bytearray:
+        records = list(obj)
+        column_buffers = self._column_buffers(records)
+        parts = []
+        for column_buffer in column_buffers:
+            parts.extend(column_buffer if isinstance(column_buffer, tuple) else (column_buffer,))
+        offset = _aligned(COLUMN_BATCH_HEADER.size + COLUMN_SIZE.size * len(parts))
+        part_offsets = []
+        for part in parts:
+            part_offsets.append(offset)
+            offset = _aligned(offset + memoryview(part).nbytes)
+        payload = bytearray(offset)
+        COLUMN_BATCH_HEADER.pack_into(payload, 0, COLUMN_BATCH_MAGIC, len(records), len(parts))
+        for index, (part_offset, part) in enumerate(zip(part_offsets, parts)):
+            part_view = memoryview(part).cast('B')
+            COLUMN_SIZE.pack_into(payload, COLUMN_BATCH_HEADER.size + COLUMN_SIZE.size * index, part_view.nbytes)
+            payload[part_offset:part_offset + part_view.nbytes] = part_view
+        return payload
+
+    def decode(self, payload) -> ColumnBatch:
+        view = memoryview(payload).toreadonly()
+        magic, record_count, part_count = COLUMN_BATCH_HEADER.unpack_from(view)
+        if magic != COLUMN_BATCH_MAGIC:
+            raise ValueError(f'Not a column batch payload, magic: {bytes(magic)}')
+        part_sizes = struct.unpack_from(f'<{part_count}Q', view, COLUMN_BATCH_HEADER.size)
+        parts = []
+        offset = _aligned(COLUMN_BATCH_HEADER.size + COLUMN_SIZE.size * part_count)
+        for part_size in part_sizes:
+            parts.append(view[offset:offset + part_size])
+            offset = _aligned(offset + part_size)
+        if offset > _aligned(len(view)):
+            raise ValueError(f'Truncated column batch payload, {len(view)} byte(s), expected {offset}')
+        columns = {}
+        parts = iter(parts)
+        for field in self._fields:
+            if field.type in COLUMN_DTYPES:
+                columns[field.name] = numpy.frombuffer(next(parts), COLUMN_DTYPES[field.type])
+            else:
+                columns[field.name] = StringColumn(numpy.frombuffer(next(parts), OFFSET_DTYPE), next(parts),
+                                                   field.type == 'str')
+        return ColumnBatch(self.record_class, columns, record_count)
+
+
+class TickBatchHandler:
+    """sample object handler computing a volume weighted average price per batch without per tick objects"""
+
+    def on_object(self, message: 'InboundMessage', batch: ColumnBatch):
+        prices, sizes = batch['price'], batch['size']
+        print(f"CALLBACK: Message Received on Topic: {message.get_destination_name()}, {len(batch)} tick(s), "
+              f"vwap: {(prices * sizes).sum() / sizes.sum():.4f}, first symbol: {batch['symbol'][0]}")
+
+
+class HowToPublishColumnarBatches:
+    """class contains methods to publish and consume record streams as column batches"""
+
+    @staticmethod
+    def benchmark_columnar_batches(codec: ColumnarBatchCodec, records, rounds=10):
+        """encode and decode the records one pickle message per record and as one column batch, returning the
+        size and CPU time per record
+
+        No broker connection is needed.
+        """
+        pickle_codec = PickleCodec()
+        results = []
+        start = time.process_time()
+        for _ in range(rounds):
+            payloads = [pickle_codec.encode(record) for record in records]
+        encode_time = time.process_time() - start
+        start = time.process_time()
+        for _ in range(rounds):
+            for payload in payloads:
+                pickle_codec.decode(payload)
+        decode_time = time.process_time() - start
+        results.append({'path': 'pickle_per_record', 'bytes_per_record': sum(map(len, payloads)) / len(records),
+                        'encode_us_per_record': encode_time / rounds / len(records) * 1_000_000,
+                        'decode_us_per_record': decode_time / rounds / len(records) * 1_000_000})
+        start = time.process_time()
+        for _ in range(rounds):
+            payload = codec.encode(records)
+        encode_time = time.process_time() - start
+        start = time.process_time()
+        for _ in range(rounds):
+            codec.decode(payload)
+        decode_time = time.process_time() - start
+        results.append({'path': 'columnar_batch', 'bytes_per_record': len(payload) / len(records),
+                        'encode_us_per_record': encode_time / rounds / len(records) * 1_000_000,
+                        'decode_us_per_record': decode_time / rounds / len(records) * 1_000_000})
+        return results
+
+    @staticmethod
+    def publish_and_consume_tick_batches(messaging_service: MessagingService, destination: Topic,
+                                         codec: ColumnarBatchCodec, ticks, batch_size):
+        """ to publish ticks in column batches of batch_size and process each batch as arrays"""
+        registry = CodecRegistry()
+        registry.register(codec)
+        try:
+            receiver = messaging_service.create_direct_message_receiver_builder() \
+                .with_subscriptions([TopicSubscription.of(destination.get_name())]).build()
+            receiver.start()
+            receiver.receive_async(CodecMessageHandler(TickBatchHandler(), registry))
+
+            publisher = messaging_service.create_direct_message_publisher_builder().build()
+            publisher.start()
+            message_builder = messaging_service.message_builder() \
+                .with_application_message_id(constants.APPLICATION_MESSAGE_ID)
+            for start in range(0, len(ticks), batch_size):
+                publisher.publish(destination=destination, message=registry.build(
+                    message_builder, ticks[start:start + batch_size], codec.codec_id))
+            time.sleep(2)
+        finally:
+            util.publisher_terminate(publisher)
+            receiver.terminate(0)
+
+    @staticmethod
+    def run():
+        codec = ColumnarBatchCodec('TickColumns', [('symbol', 'str'), ('price', 'float64'), ('size', 'uint32'),
+                                                   ('time_stamp', 'int64')])
+        ticks = [Tick(f'SYM{e % 50}', 100.0 + e % 997 / 100, e % 1000 + 1, 1_600_000_000_000 + e)
+                 for e in range(10000)]
+        print("Execute columnar batch benchmark")
+        for result in HowToPublishColumnarBatches.benchmark_columnar_batches(codec, ticks):
+            print(f'[BENCHMARK] {json.dumps(result)}')
+
+        try:
+            service = MessagingService.builder().from_properties(boot.broker_properties()).build()
+            service.connect()
+            destination_name = Topic.of(constants.TOPIC_ENDPOINT_DEFAULT)
+
+            print("Execute Direct Publish and Consume - ticks in column batches")
+            HowToPublishColumnarBatches \
+                .publish_and_consume_tick_batches(service, destination_name, codec, ticks, batch_size=1000)
+        finally:
+            service.disconnect()
+
+
+if __name__ == '__main__':
+    HowToPublishColumnarBatches().run()
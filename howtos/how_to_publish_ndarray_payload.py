@@ -0,0 +1,292 @@
+""" Run this file to publish NumPy arrays as a compact dtype and shape header followed by the raw array bytes, one
+array or a batch of small arrays per message, and to receive them as zero-copy read-only views"""
+import functools
+import json
+import math
+import struct
+import time
+from typing import TypeVar
+
+import numpy
+
+from solace.messaging.messaging_service import MessagingService
+from solace.messaging.receiver.inbound_message import InboundMessage
+from solace.messaging.resources.topic import Topic
+from solace.messaging.resources.topic_subscription import TopicSubscription
+from solace.messaging.utils.converter import BytesToObject, ObjectToBytes
+from how_to_use_payload_codec_registry import CodecRegistry, CodecMessageHandler, PayloadCodec, PickleCodec, \
+    PAYLOAD_CODEC_ID_PROPERTY
+from sampler_boot import SamplerBoot, SolaceConstants, SamplerUtil
+
+X = TypeVar('X')
+constants = SolaceConstants
+boot = SamplerBoot()
+util = SamplerUtil()
+
+NDARRAY_MAGIC = b'NDA1'
+NDARRAY_HEADER = struct.Struct('<4sBcB')
+"""magic, ndim, order b'C' or b'F', dtype string length, followed by the dtype string, e.g. '<f8' which carries
+the byte order, and one NDARRAY_DIMENSION per dimension"""
+NDARRAY_DIMENSION = struct.Struct('<Q')
+NDARRAY_BATCH_MAGIC = b'NDB1'
+NDARRAY_BATCH_HEADER = struct.Struct('<4sI?')
+"""magic, number of arrays, stacked flag: True when the arrays share dtype and shape and follow as the single frame
+of their stack, False when one frame per array follows"""
+DATA_ALIGNMENT = 16
+"""array data starts on a 16 bytes boundary of the payload"""
+
+
+def _aligned(offset):
+    return -(-offset // DATA_ALIGNMENT) * DATA_ALIGNMENT
+
+
+@functools.lru_cache(maxsize=256)
+def _dtype_of(dtype_str: bytes):
+    return numpy.dtype(dtype_str.decode('ascii'))
+
+
+@functools.lru_cache(maxsize=32)
+def _shape_struct(ndim: int):
+    return struct.Struct(f'<{ndim}Q')
+
+
+def _contiguous(array):
+    """the array itself when C or F contiguous, else a C contiguous copy"""
+    array = numpy.asanyarray(array)
+    if array.dtype.hasobject or array.dtype.fields is not None:
+        raise ValueError(f'Array of dtype [{array.dtype}] has no raw byte representation the header can describe')
+    return array if array.flags.c_contiguous or array.flags.f_contiguous else numpy.ascontiguousarray(array)
+
+
+def ndarray_header_size(dtype, ndim) -> int:
+    """size of an ndarray frame header, padded so the data following it is aligned"""
+    return _aligned(NDARRAY_HEADER.size + len(dtype.str) + NDARRAY_DIMENSION.size * ndim)
+
+
+def write_ndarray_header(payload: bytearray, offset: int, dtype, shape, order=b'C') -> int:
+    """write an ndarray frame header into payload at offset and return the offset of the data"""
+    dtype_str = dtype.str.encode('ascii')
+    NDARRAY_HEADER.pack_into(payload, offset, NDARRAY_MAGIC, len(shape), order, len(dtype_str))
+    payload[offset + NDARRAY_HEADER.size:offset + NDARRAY_HEADER.size + len(dtype_str)] = dtype_str
+    _shape_struct(len(shape)).pack_into(payload, offset + NDARRAY_HEADER.size + len(dtype_str), *shape)
+    return offset + ndarray_header_size(dtype, len(shape))
+
+
+def write_ndarray_frame(payload: bytearray, offset: int, array) -> int:
+    """write the frame of a contiguous array into payload at offset, copying the array data once, and return the
+    offset following it"""
+    offset = write_ndarray_header(payload, offset, array.dtype, array.shape,
+                                  b'C' if array.flags.c_contiguous else b'F')
+    numpy.frombuffer(payload, array.dtype, count=array.size, offset=offset)[...] = array.ravel(order='K')
+    return offset + array.nbytes
+
+
+def read_ndarray_frame(view: memoryview, offset: int):
+    """return the array viewing the frame at offset of view, with no copy, and the offset following it"""
+    magic, ndim, order, dtype_length = NDARRAY_HEADER.unpack_from(view, offset)
+    if magic != NDARRAY_MAGIC:
+        raise ValueError(f'Not an ndarray payload at offset {offset}, magic: {bytes(magic)}')
+    dtype = _dtype_of(bytes(view[offset + NDARRAY_HEADER.size:offset + NDARRAY_HEADER.size + dtype_length]))
+    shape = _shape_struct(ndim).unpack_from(view, offset + NDARRAY_HEADER.size + dtype_length)
+    offset += ndarray_header_size(dtype, ndim)
+    count = math.prod(shape)
+    if offset + count * dtype.itemsize > len(view):
+        raise ValueError(f'Truncated ndarray payload, {len(view)} byte(s), expected {offset + count * dtype.itemsize}')
+    array = numpy.frombuffer(view, dtype, count=count, offset=offset)
+    return array.reshape(shape, order=order.decode('ascii')), offset + count * dtype.itemsize
+
+
+def encode_ndarray(array) -> bytearray:
+    array = _contiguous(array)
+    payload = bytearray(ndarray_header_size(array.dtype, array.ndim) + array.nbytes)
+    write_ndarray_frame(payload, 0, array)
+    return payload
+
+
+def decode_ndarray(payload):
+    """read-only array viewing the payload"""
+    array, _ = read_ndarray_frame(memoryview(payload).toreadonly(), 0)
+    return array
+
+
+def encode_ndarray_batch(arrays) -> bytearray:
+    """pack many arrays into one payload, each array data is copied once
+
+    Arrays sharing dtype and shape are stacked straight into the payload as a single frame, others get one frame
+    each.
+    """
+    arrays = [_contiguous(array) for array in arrays]
+    offset = _aligned(NDARRAY_BATCH_HEADER.size)
+    if arrays and all(array.dtype == arrays[0].dtype and array.shape == arrays[0].shape for array in arrays):
+        dtype, shape = arrays[0].dtype, (len(arrays),) + arrays[0].shape
+        payload = bytearray(offset + ndarray_header_size(dtype, len(shape)) + arrays[0].nbytes * len(arrays))
+        NDARRAY_BATCH_HEADER.pack_into(payload, 0, NDARRAY_BATCH_MAGIC, len(arrays), True)
+        offset = write_ndarray_header(payload, offset, dtype, shape)
+        numpy.stack(arrays, out=numpy.frombuffer(payload, dtype, offset=offset).reshape(shape))
+        return payload
+    offsets = [offset]
+    for array in arrays:
+        offsets.append(_aligned(offsets[-1] + ndarray_header_size(array.dtype, array.ndim) + array.nbytes))
+    payload = bytearray(offsets[-1])
+    NDARRAY_BATCH_HEADER.pack_into(payload, 0, NDARRAY_BATCH_MAGIC, len(arrays), False)
+    for offset, array in zip(offsets, arrays):
+        write_ndarray_frame(payload, offset, array)
+    return payload
+
+
+def decode_ndarray_batch(payload):
+    """read-only arrays viewing the payload: for a stacked batch a single array whose rows are the arrays, else a
+    list of arrays"""
+    view = memoryview(payload).toreadonly()
+    magic, array_count, is_stacked = NDARRAY_BATCH_HEADER.unpack_from(view)
+    if magic != NDARRAY_BATCH_MAGIC:
+        raise ValueError(f'Not an ndarray batch payload, magic: {bytes(magic)}')
+    offset = _aligned(NDARRAY_BATCH_HEADER.size)
+    if is_stacked:
+        return read_ndarray_frame(view, offset)[0]
+    arrays = []
+    for _ in range(array_count):
+        array, offset = read_ndarray_frame(view, offset)
+        arrays.append(array)
+        offset = _aligned(offset)
+    return arrays
+
+
+class NdarrayObjectToBytes(ObjectToBytes):
+    """converter writing an ndarray as header and raw bytes, for message_builder.build(array, converter=...)"""
+
+    def to_bytes(self, src) -> bytes:
+        return encode_ndarray(src)
+
+
+class NdarrayBytesToObject(BytesToObject):
+    """converter reading an ndarray as a read-only view of the payload, for
+    message.get_and_convert_payload(converter=...)"""
+
+    def convert(self, src: bytearray) -> X:
+        return decode_ndarray(src)
+
+
+class NdarrayBatchObjectToBytes(ObjectToBytes):
+    """converter writing a list of ndarrays as one batch payload"""
+
+    def to_bytes(self, src) -> bytes:
+        return encode_ndarray_batch(src)
+
+
+class NdarrayBatchBytesToObject(BytesToObject):
+    """converter reading a batch payload as read-only ndarray views"""
+
+    def convert(self, src: bytearray) -> X:
+        return decode_ndarray_batch(src)
+
+
+class NdarrayCodec(PayloadCodec):
+    """payload codec for the CodecRegistry, its bytearray payloads go to the message builder with no copy"""
+    codec_id = 'ndarray'
+
+    def encode(self, obj) -> bytearray:
+        return encode_ndarray(obj)
+
+    def decode(self, payload) -> X:
+        return decode_ndarray(payload)
+
+
+class NdarrayBatchCodec(PayloadCodec):
+    """batch payload codec for the CodecRegistry"""
+    codec_id = 'ndarray:batch'
+
+    def encode(self, obj) -> bytearray:
+        return encode_ndarray_batch(obj)
+
+    def decode(self, payload) -> X:
+        return decode_ndarray_batch(payload)
+
+
+class ArrayPrintingHandler:
+    """sample object handler printing the arrays received"""
+
+    def on_object(self, message: 'InboundMessage', obj):
+        arrays = obj if isinstance(obj, list) or obj.ndim > 1 and message.get_property(
+            PAYLOAD_CODEC_ID_PROPERTY) == NdarrayBatchCodec.codec_id else [obj]
+        print(f"CALLBACK: Message Received on Topic: {message.get_destination_name()}, {len(arrays)} array(s), "
+              f"first: dtype {arrays[0].dtype.str}, shape {arrays[0].shape}, writeable {arrays[0].flags.writeable}")
+
+
+class HowToPublishNdarrayPayload:
+    """class contains methods to publish and consume NumPy arrays with the ndarray codecs"""
+
+    @staticmethod
+    def benchmark_ndarray_codecs(array_sizes, batch_size=100, iterations=20):
+        """time encoding and decoding float64 arrays of each size, single and batched, with pickle and the ndarray
+        codecs
+
+        No broker connection is needed.
+        """
+        results = []
+        pickle_codec = PickleCodec()
+        for array_size in array_sizes:
+            arrays = [numpy.random.default_rng(e).random(array_size) for e in range(batch_size)]
+            paths = {'pickle_single': (pickle_codec, arrays[0]), 'ndarray_single': (NdarrayCodec(), arrays[0]),
+                     'pickle_batch': (pickle_codec, arrays), 'ndarray_batch': (NdarrayBatchCodec(), arrays)}
+            for path_name, (codec, obj) in paths.items():
+                start = time.perf_counter()
+                for _ in range(iterations):
+                    payload = codec.encode(obj)
+                encode_elapsed = time.perf_counter() - start
+                payload = bytearray(payload)
+                start = time.perf_counter()
+                for _ in range(iterations):
+                    codec.decode(payload)
+                decode_elapsed = time.perf_counter() - start
+                results.append({'array_bytes': arrays[0].nbytes, 'path': path_name, 'payload_bytes': len(payload),
+                                'encode_us': encode_elapsed / iterations * 1_000_000,
+                                'decode_us': decode_elapsed / iterations * 1_000_000})
+        return results
+
+    @staticmethod
+    def publish_and_consume_arrays(messaging_service: MessagingService, destination: Topic):
+        """ to publish an array and a batch of arrays and receive them as read-only views"""
+        registry = CodecRegistry()
+        registry.register(NdarrayCodec())
+        registry.register(NdarrayBatchCodec())
+        try:
+            receiver = messaging_service.create_direct_message_receiver_builder() \
+                .with_subscriptions([TopicSubscription.of(destination.get_name())]).build()
+            receiver.start()
+            receiver.receive_async(CodecMessageHandler(ArrayPrintingHandler(), registry))
+
+            publisher = messaging_service.create_direct_message_publisher_builder().build()
+            publisher.start()
+            message_builder = messaging_service.message_builder() \
+                .with_application_message_id(constants.APPLICATION_MESSAGE_ID)
+            array = numpy.asfortranarray(numpy.arange(1024 * 128, dtype='>i4').reshape(1024, 128))
+            publisher.publish(destination=destination,
+                              message=registry.build(message_builder, array, NdarrayCodec.codec_id))
+            batch = [numpy.full(16, e, dtype=numpy.float32) for e in range(100)] + [numpy.eye(4)]
+            publisher.publish(destination=destination,
+                              message=registry.build(message_builder, batch, NdarrayBatchCodec.codec_id))
+            time.sleep(2)
+        finally:
+            util.publisher_terminate(publisher)
+            receiver.terminate(0)
+
+    @staticmethod
+    def run():
+        print("Execute ndarray codec benchmark")
+        for result in HowToPublishNdarrayPayload.benchmark_ndarray_codecs([16, 1024, 64 * 1024]):
+            print(f'[BENCHMARK] {json.dumps(result)}')
+
+        try:
+            service = MessagingService.builder().from_properties(boot.broker_properties()).build()
+            service.connect()
+            destination_name = Topic.of(constants.TOPIC_ENDPOINT_DEFAULT)
+
+            print("Execute Direct Publish and Consume - ndarray and ndarray batch payloads")
+            HowToPublishNdarrayPayload.publish_and_consume_arrays(service, destination_name)
+        finally:
+            service.disconnect()
+
+
+if __name__ == '__main__':
+    HowToPublishNdarrayPayload().run()
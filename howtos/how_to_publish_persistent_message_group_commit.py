@@ -0,0 +1,155 @@
+"""sampler for publishing a group of persistent messages back to back and awaiting all their acknowledgements once"""
+import threading
+import time
+from typing import TypeVar, List
+
+from solace.messaging.config import _sol_constants
+from solace.messaging.errors.pubsubplus_client_error import PubSubTimeoutError
+from solace.messaging.messaging_service import MessagingService
+from solace.messaging.publisher.persistent_message_publisher import PersistentMessagePublisher, \
+    MessagePublishReceiptListener
+from solace.messaging.resources.topic import Topic
+from how_to_publish_persistent_message import HowToPublishPersistentMessage
+from sampler_boot import SolaceConstants, SamplerBoot
+
+X = TypeVar('X')
+constants = SolaceConstants
+boot = SamplerBoot()
+
+
+class PublishOutcome:
+    """outcome of one message of a group commit"""
+
+    def __init__(self, index: int, message):
+        self.index = index
+        self.message = message
+        self.is_persisted = False
+        self.exception = None
+        self.publish_receipt = None
+
+    @property
+    def is_completed(self):
+        return self.publish_receipt is not None or self.exception is not None
+
+    def __str__(self):
+        return f'index: {self.index}, is_persisted: {self.is_persisted}, exception: {self.exception}'
+
+
+class _GroupCommit:
+    """outcomes of one group commit and the count of receipts still pending"""
+
+    def __init__(self, messages):
+        self.outcomes = [PublishOutcome(index, message) for index, message in enumerate(messages)]
+        self.condition = threading.Condition()
+        self.pending_count = len(self.outcomes)
+
+    def complete(self, index: int, publish_receipt: 'PublishReceipt' = None, exception: Exception = None):
+        with self.condition:
+            outcome = self.outcomes[index]
+            if outcome.is_completed:
+                return
+            outcome.publish_receipt = publish_receipt
+            outcome.is_persisted = publish_receipt is not None and publish_receipt.is_persisted
+            outcome.exception = exception if publish_receipt is None else publish_receipt.exception
+            self.pending_count -= 1
+            if self.pending_count == 0:
+                self.condition.notify_all()
+
+
+class _GroupCommitEntry:
+    """user context correlating a receipt with its group commit and position in the group"""
+    __slots__ = ('group_commit', 'index')
+
+    def __init__(self, group_commit: _GroupCommit, index: int):
+        self.group_commit = group_commit
+        self.index = index
+
+
+class GroupCommitReceiptListener(MessagePublishReceiptListener):
+    """receipt listener completing the outcome of the receipted message in its group commit"""
+
+    def __init__(self, delegate: MessagePublishReceiptListener = None):
+        self._delegate = delegate
+
+    def on_publish_receipt(self, publish_receipt: 'PublishReceipt'):
+        entry = publish_receipt.user_context
+        if isinstance(entry, _GroupCommitEntry):
+            entry.group_commit.complete(entry.index, publish_receipt=publish_receipt)
+        if self._delegate:
+            self._delegate.on_publish_receipt(publish_receipt)
+
+
+class GroupCommitPersistentPublisher:
+    """persistent publisher that pipelines a group of messages and blocks once for all their receipts,
+    instead of one broker round trip per message as with publish_await_acknowledgement"""
+
+    def __init__(self, publisher: PersistentMessagePublisher, receipt_listener: MessagePublishReceiptListener = None):
+        self._publisher = publisher
+        self._publisher.set_message_publish_receipt_listener(GroupCommitReceiptListener(receipt_listener))
+
+    def publish_await_acknowledgement(self, messages, destination: Topic, time_out: int = None,
+                                      additional_message_properties=None) -> List[PublishOutcome]:
+        """publish the messages back to back then wait until every receipt has arrived or time_out, in
+        milliseconds, expires
+
+        Returns:
+            one PublishOutcome per message in publish order, a message not receipted in time has a
+            PubSubTimeoutError as exception
+        """
+        group_commit = _GroupCommit(messages)
+        for outcome in group_commit.outcomes:
+            try:
+                self._publisher.publish(outcome.message, destination,
+                                        user_context=_GroupCommitEntry(group_commit, outcome.index),
+                                        additional_message_properties=additional_message_properties)
+            except Exception as exception:
+                group_commit.complete(outcome.index, exception=exception)
+
+        with group_commit.condition:
+            group_commit.condition.wait_for(lambda: group_commit.pending_count == 0,
+                                            None if time_out is None else time_out / 1000)
+        for outcome in group_commit.outcomes:
+            group_commit.complete(outcome.index,
+                                  exception=PubSubTimeoutError(f'No publish receipt within {time_out}ms'))
+        return group_commit.outcomes
+
+
+class HowToPublishPersistentMessageGroupCommit:
+    """class contains methods to publish persistent messages with group commit"""
+
+    @staticmethod
+    def publish_byte_messages_group_commit(message_publisher: PersistentMessagePublisher, destination: Topic,
+                                           message, group_size, time_out):
+        """method to publish a group of byte messages and block once until the publisher confirmations"""
+        group_commit_publisher = GroupCommitPersistentPublisher(message_publisher)
+        messages = [bytearray(f'{message} {e}', _sol_constants.ENCODING_TYPE) for e in range(group_size)]
+        start = time.perf_counter()
+        outcomes = group_commit_publisher.publish_await_acknowledgement(messages, destination, time_out)
+        elapsed = time.perf_counter() - start
+        persisted_count = sum(1 for outcome in outcomes if outcome.is_persisted)
+        print(f'Group commit of {group_size} message(s): persisted {persisted_count} in {elapsed * 1000:.3f}ms')
+        for outcome in outcomes:
+            if not outcome.is_persisted:
+                print(f'\tNot persisted: {outcome}')
+
+    @staticmethod
+    def run():
+        try:
+            messaging_service = MessagingService.builder().from_properties(boot.broker_properties()).build()
+            messaging_service.connect()
+            print(f'Message service is connected? {messaging_service.is_connected}')
+            topic = Topic.of(constants.TOPIC_ENDPOINT_DEFAULT)
+
+            publisher = HowToPublishPersistentMessage.create_persistent_message_publisher(messaging_service)
+
+            HowToPublishPersistentMessageGroupCommit \
+                .publish_byte_messages_group_commit(message_publisher=publisher, destination=topic,
+                                                    message=constants.MESSAGE_TO_SEND, group_size=100,
+                                                    time_out=2000)
+        finally:
+            messaging_service.disconnect()
+            publisher.terminate(0)
+
+
+if __name__ == '__main__':
+    HowToPublishPersistentMessageGroupCommit().run()
@@ -0,0 +1,345 @@
+"""sampler for publishing persistent messages through a memory mapped durable outbox, replaying the messages
+that were not receipted after a restart or a reconnection"""
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+from typing import TypeVar
+
+from solace.messaging.config import _sol_constants
+from solace.messaging.errors.pubsubplus_client_error import PublisherOverflowError
+from solace.messaging.messaging_service import MessagingService, ReconnectionListener, ServiceEvent
+from solace.messaging.publisher.persistent_message_publisher import PersistentMessagePublisher, \
+    MessagePublishReceiptListener
+from solace.messaging.resources.topic import Topic
+from how_to_publish_persistent_message import HowToPublishPersistentMessage
+from sampler_boot import SolaceConstants, SamplerBoot
+
+X = TypeVar('X')
+constants = SolaceConstants
+boot = SamplerBoot()
+
+
+class MemoryMappedOutbox:
+    """ring file of outbound messages, memory mapped
+
+    File layout: a header (magic, version, file size, head offset, tail offset, next sequence number) followed
+    by the ring of entries. An entry is a fixed header (state, topic length, properties length, payload length,
+    crc32, sequence number) followed by the topic name, the properties as JSON and the payload, padded to 8 bytes.
+
+    Entries are appended at the tail as PENDING and marked COMPLETE once receipted, the head skips over
+    completed entries to reclaim their space. Nothing is fsynced per message: dirty pages are flushed as a group
+    every flush_interval_ms by a background thread, or on flush()/close(). An entry whose completion was not
+    flushed before a crash is replayed again, delivery is at-least-once and receivers should de-duplicate on the
+    application message id outbox-<sequence number>.
+    """
+    MAGIC = b'SOLOUTBX'
+    VERSION = 1
+    FILE_HEADER = struct.Struct('<8sIIQQQQ')
+    DATA_START = 64
+    ENTRY_HEADER = struct.Struct('<BxHIIIQ')
+    ALIGNMENT = 8
+    STATE_PENDING = 1
+    STATE_COMPLETE = 2
+    STATE_WRAP = 3
+
+    def __init__(self, file_path, file_size=16 * 1024 * 1024, flush_interval_ms=50):
+        self._file_path = file_path
+        self._lock = threading.Lock()
+        is_new_file = not os.path.exists(file_path) or os.path.getsize(file_path) == 0
+        if is_new_file:
+            with open(file_path, 'wb') as new_file:
+                new_file.truncate(file_size)
+        self._file = open(file_path, 'r+b')
+        self._mmap = mmap.mmap(self._file.fileno(), 0)
+        if is_new_file:
+            self._file_size, self._head, self._tail, self._next_sequence = len(self._mmap), self.DATA_START, \
+                                                                           self.DATA_START, 1
+            self._write_file_header()
+        else:
+            self._read_file_header()
+        self._pending_offsets = self._scan_pending_offsets()
+        self._is_dirty = True
+        self._closed = threading.Event()
+        self._flush_interval = flush_interval_ms / 1000
+        self._flusher = threading.Thread(target=self._flush_periodically, name='outbox-flusher', daemon=True)
+        self._flusher.start()
+
+    @property
+    def pending_count(self):
+        return len(self._pending_offsets)
+
+    def _write_file_header(self):
+        self.FILE_HEADER.pack_into(self._mmap, 0, self.MAGIC, self.VERSION, 0, self._file_size, self._head,
+                                   self._tail, self._next_sequence)
+
+    def _read_file_header(self):
+        magic, version, _, self._file_size, self._head, self._tail, self._next_sequence = \
+            self.FILE_HEADER.unpack_from(self._mmap, 0)
+        if magic != self.MAGIC or version != self.VERSION or self._file_size != len(self._mmap):
+            raise ValueError(f'[{self._file_path}] is not a version {self.VERSION} outbox file')
+
+    def _entry_size(self, body_size):
+        size = self.ENTRY_HEADER.size + body_size
+        return (size + self.ALIGNMENT - 1) // self.ALIGNMENT * self.ALIGNMENT
+
+    def _read_entry(self, offset):
+        state, topic_length, properties_length, payload_length, crc, sequence = \
+            self.ENTRY_HEADER.unpack_from(self._mmap, offset)
+        body_start = offset + self.ENTRY_HEADER.size
+        body_size = topic_length + properties_length + payload_length
+        return state, sequence, body_start, topic_length, properties_length, payload_length, crc, \
+            self._entry_size(body_size)
+
+    def _scan_pending_offsets(self):
+        """walk the ring from head to tail, a torn entry left by a crash ends the ring at its offset"""
+        pending_offsets = {}
+        offset = self._head
+        while offset != self._tail:
+            state, sequence, body_start, topic_length, properties_length, payload_length, crc, entry_size = \
+                self._read_entry(offset)
+            if state == self.STATE_WRAP:
+                offset = self.DATA_START
+                continue
+            body_end = body_start + topic_length + properties_length + payload_length
+            if state not in (self.STATE_PENDING, self.STATE_COMPLETE) or body_end > self._file_size or \
+                    zlib.crc32(self._mmap[body_start:body_end]) != crc:
+                print(f'Outbox [{self._file_path}]: torn entry at offset {offset}, truncating')
+                self._tail = offset
+                self._write_file_header()
+                break
+            if state == self.STATE_PENDING:
+                pending_offsets[offset] = sequence
+            offset += entry_size
+        return pending_offsets
+
+    def append(self, topic_name: str, payload: bytes, properties: dict = None):
+        """append a PENDING entry and return its (offset, sequence number)
+
+        Raises:
+            PublisherOverflowError: when the ring has no room left for the entry
+        """
+        topic_bytes = topic_name.encode(_sol_constants.ENCODING_TYPE)
+        properties_bytes = json.dumps(properties).encode(_sol_constants.ENCODING_TYPE) if properties else b''
+        payload = bytes(payload)
+        entry_size = self._entry_size(len(topic_bytes) + len(properties_bytes) + len(payload))
+        with self._lock:
+            if self._head == self._tail:
+                self._head = self._tail = self.DATA_START
+            offset = self._tail
+            # always keep room for a wrap marker at the tail
+            if offset >= self._head and offset + entry_size + self.ENTRY_HEADER.size > self._file_size:
+                if self.DATA_START + entry_size >= self._head:
+                    raise PublisherOverflowError(f'Outbox [{self._file_path}] full')
+                self.ENTRY_HEADER.pack_into(self._mmap, offset, self.STATE_WRAP, 0, 0, 0, 0, 0)
+                offset = self.DATA_START
+            elif offset < self._head and offset + entry_size >= self._head:
+                raise PublisherOverflowError(f'Outbox [{self._file_path}] full')
+            sequence = self._next_sequence
+            body_start = offset + self.ENTRY_HEADER.size
+            self._mmap[body_start:body_start + len(topic_bytes)] = topic_bytes
+            body_start += len(topic_bytes)
+            self._mmap[body_start:body_start + len(properties_bytes)] = properties_bytes
+            body_start += len(properties_bytes)
+            self._mmap[body_start:body_start + len(payload)] = payload
+            crc = zlib.crc32(payload, zlib.crc32(properties_bytes, zlib.crc32(topic_bytes)))
+            self.ENTRY_HEADER.pack_into(self._mmap, offset, self.STATE_PENDING, len(topic_bytes),
+                                        len(properties_bytes), len(payload), crc, sequence)
+            self._tail = offset + entry_size
+            self._next_sequence += 1
+            self._pending_offsets[offset] = sequence
+            self._write_file_header()
+            self._is_dirty = True
+        return offset, sequence
+
+    def complete(self, offset: int):
+        """mark the entry receipted and reclaim the space of the completed entries at the head"""
+        with self._lock:
+            if self._closed.is_set() or self._pending_offsets.pop(offset, None) is None:
+                return
+            self._mmap[offset] = self.STATE_COMPLETE
+            while self._head != self._tail:
+                state, _, _, _, _, _, _, entry_size = self._read_entry(self._head)
+                if state == self.STATE_WRAP:
+                    self._head = self.DATA_START
+                elif state == self.STATE_COMPLETE:
+                    self._head += entry_size
+                else:
+                    break
+            self._write_file_header()
+            self._is_dirty = True
+
+    def read(self, offset: int):
+        """return (sequence number, topic name, payload, properties) of the entry at the offset"""
+        with self._lock:
+            _, sequence, body_start, topic_length, properties_length, payload_length, _, _ = \
+                self._read_entry(offset)
+            topic_end = body_start + topic_length
+            properties_end = topic_end + properties_length
+            topic_name = self._mmap[body_start:topic_end].decode(_sol_constants.ENCODING_TYPE)
+            properties = json.loads(self._mmap[topic_end:properties_end]) if properties_length else None
+            payload = self._mmap[properties_end:properties_end + payload_length]
+        return sequence, topic_name, payload, properties
+
+    def pending_offsets(self):
+        """offsets of the entries not receipted yet, oldest first"""
+        with self._lock:
+            return sorted(self._pending_offsets, key=self._pending_offsets.get)
+
+    def flush(self):
+        with self._lock:
+            is_dirty, self._is_dirty = self._is_dirty, False
+        if is_dirty:
+            self._mmap.flush()
+
+    def _flush_periodically(self):
+        while not self._closed.wait(self._flush_interval):
+            self.flush()
+
+    def close(self):
+        with self._lock:
+            self._closed.set()
+        self._flusher.join()
+        self.flush()
+        self._mmap.close()
+        self._file.close()
+
+
+class OutboxEntry:
+    """user context of a message published through the outbox, carries the caller's own user context"""
+    __slots__ = ('offset', 'user_context')
+
+    def __init__(self, offset: int, user_context):
+        self.offset = offset
+        self.user_context = user_context
+
+
+class OutboxReceiptListener(MessagePublishReceiptListener):
+    """receipt listener completing persisted outbox entries and keeping the failed ones for replay"""
+
+    def __init__(self, outbox_publisher: 'OutboxPersistentPublisher', delegate: MessagePublishReceiptListener):
+        self._outbox_publisher = outbox_publisher
+        self._delegate = delegate
+
+    def on_publish_receipt(self, publish_receipt: 'PublishReceipt'):
+        entry = publish_receipt.user_context
+        if isinstance(entry, OutboxEntry):
+            self._outbox_publisher.on_entry_receipt(entry, publish_receipt.is_persisted)
+        if self._delegate:
+            self._delegate.on_publish_receipt(publish_receipt)
+
+
+class OutboxReconnectionListener(ReconnectionListener):
+    """reconnection listener replaying the outbox entries whose publish failed while disconnected"""
+
+    def __init__(self, outbox_publisher: 'OutboxPersistentPublisher'):
+        self._outbox_publisher = outbox_publisher
+
+    def on_reconnected(self, service_event: ServiceEvent):
+        replayed_count = self._outbox_publisher.replay_failed()
+        print(f'Outbox: reconnected, replayed {replayed_count} failed message(s)')
+
+
+class OutboxPersistentPublisher:
+    """persistent publisher writing every payload and its properties to a MemoryMappedOutbox before publishing"""
+
+    def __init__(self, messaging_service: MessagingService, publisher: PersistentMessagePublisher,
+                 outbox: MemoryMappedOutbox, receipt_listener: MessagePublishReceiptListener = None):
+        self._messaging_service = messaging_service
+        self._publisher = publisher
+        self._outbox = outbox
+        self._failed_offsets = set()
+        self._lock = threading.Lock()
+        self._publisher.set_message_publish_receipt_listener(OutboxReceiptListener(self, receipt_listener))
+        self._messaging_service.add_reconnection_listener(OutboxReconnectionListener(self))
+
+    def _publish_entry(self, offset, sequence, topic_name, payload, properties, user_context=None):
+        message = self._messaging_service.message_builder() \
+            .with_application_message_id(f'outbox-{sequence}') \
+            .build(bytearray(payload), additional_message_properties=properties)
+        self._publisher.publish(message, Topic.of(topic_name), user_context=OutboxEntry(offset, user_context))
+
+    def publish(self, payload, destination: Topic, properties: dict = None, user_context=None):
+        """append a str or bytes like payload to the outbox, then publish it"""
+        if isinstance(payload, str):
+            payload = payload.encode(_sol_constants.ENCODING_TYPE)
+        offset, sequence = self._outbox.append(destination.get_name(), payload, properties)
+        try:
+            self._publish_entry(offset, sequence, destination.get_name(), payload, properties, user_context)
+        except Exception:
+            with self._lock:
+                self._failed_offsets.add(offset)
+            raise
+
+    def on_entry_receipt(self, entry: OutboxEntry, is_persisted: bool):
+        if is_persisted:
+            self._outbox.complete(entry.offset)
+        else:
+            with self._lock:
+                self._failed_offsets.add(entry.offset)
+
+    def _replay(self, offsets) -> int:
+        replayed_count = 0
+        for offset in offsets:
+            sequence, topic_name, payload, properties = self._outbox.read(offset)
+            self._publish_entry(offset, sequence, topic_name, payload, properties)
+            replayed_count += 1
+        return replayed_count
+
+    def replay_pending(self) -> int:
+        """publish again every entry not receipted yet, to be called once at startup before new publishes"""
+        with self._lock:
+            self._failed_offsets.clear()
+        return self._replay(self._outbox.pending_offsets())
+
+    def replay_failed(self) -> int:
+        """publish again the entries whose publish raised or whose receipt reported a failure"""
+        with self._lock:
+            failed_offsets, self._failed_offsets = self._failed_offsets, set()
+        return self._replay(offset for offset in self._outbox.pending_offsets() if offset in failed_offsets)
+
+
+class HowToPublishPersistentMessageWithOutbox:
+    """class contains methods to publish persistent messages through a durable outbox"""
+
+    @staticmethod
+    def publish_string_messages_with_outbox(messaging_service: MessagingService,
+                                            message_publisher: PersistentMessagePublisher, destination: Topic,
+                                            message, message_count, outbox_file_path):
+        """method to replay the messages left over by a previous run, then publish new messages"""
+        outbox = MemoryMappedOutbox(outbox_file_path)
+        try:
+            outbox_publisher = OutboxPersistentPublisher(messaging_service, message_publisher, outbox)
+            print(f'Outbox: replayed {outbox_publisher.replay_pending()} message(s) left over by a previous run')
+            for e in range(message_count):
+                outbox_publisher.publish(f'{message} {e}', destination, properties=constants.CUSTOM_PROPS)
+            time.sleep(2)
+            print(f'Outbox: published {message_count} message(s), {outbox.pending_count} not receipted yet')
+        finally:
+            outbox.close()
+
+    @staticmethod
+    def run():
+        try:
+            messaging_service = MessagingService.builder().from_properties(boot.broker_properties()).build()
+            messaging_service.connect()
+            print(f'Message service is connected? {messaging_service.is_connected}')
+            topic = Topic.of(constants.TOPIC_ENDPOINT_DEFAULT)
+
+            publisher = HowToPublishPersistentMessage.create_persistent_message_publisher(messaging_service)
+
+            HowToPublishPersistentMessageWithOutbox \
+                .publish_string_messages_with_outbox(messaging_service=messaging_service,
+                                                     message_publisher=publisher, destination=topic,
+                                                     message=constants.MESSAGE_TO_SEND, message_count=1000,
+                                                     outbox_file_path='persistent_publisher.outbox')
+        finally:
+            messaging_service.disconnect()
+            publisher.terminate(0)
+
+
+if __name__ == '__main__':
+    HowToPublishPersistentMessageWithOutbox().run()
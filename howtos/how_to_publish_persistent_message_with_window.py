@@ -0,0 +1,175 @@
+"""sampler for publishing persistent messages with the number and size of unacknowledged messages capped"""
+import threading
+import time
+from typing import TypeVar
+
+from solace.messaging.config import _sol_constants
+from solace.messaging.errors.pubsubplus_client_error import PublisherOverflowError
+from solace.messaging.messaging_service import MessagingService
+from solace.messaging.publisher.outbound_message import OutboundMessage
+from solace.messaging.publisher.persistent_message_publisher import PersistentMessagePublisher, \
+    MessagePublishReceiptListener
+from solace.messaging.resources.topic import Topic
+from how_to_publish_persistent_message import HowToPublishPersistentMessage
+from sampler_boot import SolaceConstants, SamplerBoot
+
+X = TypeVar('X')
+constants = SolaceConstants
+boot = SamplerBoot()
+
+
+def payload_size(message) -> int:
+    """size in bytes of a str, bytes like or OutboundMessage payload"""
+    if isinstance(message, OutboundMessage):
+        message = message.get_payload_as_bytes()
+    if message is None:
+        return 0
+    if isinstance(message, str):
+        return len(message.encode(_sol_constants.ENCODING_TYPE))
+    return memoryview(message).nbytes
+
+
+class WindowEntry:
+    """user context of an in-flight message, carries the caller's own user context"""
+    __slots__ = ('size', 'user_context')
+
+    def __init__(self, size: int, user_context):
+        self.size = size
+        self.user_context = user_context
+
+
+class WindowedPublishReceiptListener(MessagePublishReceiptListener):
+    """receipt listener releasing the window slot of the acknowledged message before delegating the receipt"""
+
+    def __init__(self, windowed_publisher: 'WindowedPersistentPublisher', delegate: MessagePublishReceiptListener):
+        self._windowed_publisher = windowed_publisher
+        self._delegate = delegate
+
+    def on_publish_receipt(self, publish_receipt: 'PublishReceipt'):
+        if isinstance(publish_receipt.user_context, WindowEntry):
+            self._windowed_publisher.release(publish_receipt.user_context)
+        if self._delegate:
+            self._delegate.on_publish_receipt(publish_receipt)
+
+
+class WindowedPersistentPublisher:
+    """persistent publisher that caps in-flight, i.e. published but not yet receipted, messages
+    by count and by payload bytes
+
+    publish() blocks while the window is full and raises PublisherOverflowError once window_timeout_ms expires.
+    A single message larger than max_in_flight_bytes is let through when nothing else is in flight.
+    The caller's user context is available in the receipt as publish_receipt.user_context.user_context.
+    """
+
+    def __init__(self, publisher: PersistentMessagePublisher, max_in_flight_messages=100,
+                 max_in_flight_bytes=1024 * 1024, window_timeout_ms=10000,
+                 receipt_listener: MessagePublishReceiptListener = None):
+        self._publisher = publisher
+        self._max_in_flight_messages = max_in_flight_messages
+        self._max_in_flight_bytes = max_in_flight_bytes
+        self._window_timeout = window_timeout_ms / 1000
+        self._window_condition = threading.Condition()
+        self._in_flight_count = 0
+        self._in_flight_bytes = 0
+        self._stall_count = 0
+        self._stall_time = 0.0
+        self._publisher.set_message_publish_receipt_listener(WindowedPublishReceiptListener(self, receipt_listener))
+
+    @property
+    def in_flight_count(self):
+        return self._in_flight_count
+
+    @property
+    def in_flight_bytes(self):
+        return self._in_flight_bytes
+
+    @property
+    def stall_count(self):
+        """number of publishes that had to wait for a window slot"""
+        return self._stall_count
+
+    @property
+    def stall_time(self):
+        """total time in seconds publishes spent waiting for a window slot"""
+        return self._stall_time
+
+    def _window_has_room(self, size):
+        if self._in_flight_count >= self._max_in_flight_messages:
+            return False
+        return self._in_flight_count == 0 or self._in_flight_bytes + size <= self._max_in_flight_bytes
+
+    def _acquire(self, size):
+        with self._window_condition:
+            if not self._window_has_room(size):
+                self._stall_count += 1
+                stall_start = time.monotonic()
+                has_room = self._window_condition.wait_for(lambda: self._window_has_room(size), self._window_timeout)
+                self._stall_time += time.monotonic() - stall_start
+                if not has_room:
+                    raise PublisherOverflowError(f'Publish window full for {self._window_timeout * 1000:.0f}ms, '
+                                                 f'in flight: {self._in_flight_count} message(s), '
+                                                 f'{self._in_flight_bytes} byte(s)')
+            self._in_flight_count += 1
+            self._in_flight_bytes += size
+
+    def release(self, entry: WindowEntry):
+        with self._window_condition:
+            self._in_flight_count -= 1
+            self._in_flight_bytes -= entry.size
+            self._window_condition.notify_all()
+
+    def publish(self, message, destination: Topic, user_context=None, additional_message_properties=None):
+        entry = WindowEntry(payload_size(message), user_context)
+        self._acquire(entry.size)
+        try:
+            self._publisher.publish(message, destination, user_context=entry,
+                                    additional_message_properties=additional_message_properties)
+        except Exception:
+            self.release(entry)
+            raise
+
+    def wait_for_receipts(self, timeout_ms=None) -> bool:
+        """block until every in-flight message is receipted, returns False on timeout"""
+        with self._window_condition:
+            return self._window_condition.wait_for(lambda: self._in_flight_count == 0,
+                                                   None if timeout_ms is None else timeout_ms / 1000)
+
+
+class HowToPublishPersistentMessageWithWindow:
+    """class contains methods to publish persistent messages through an in-flight window"""
+
+    @staticmethod
+    def publish_string_messages_with_window(message_publisher: PersistentMessagePublisher, destination: Topic,
+                                            message, message_count, max_in_flight_messages, max_in_flight_bytes):
+        """method to publish string messages with the unacknowledged messages capped by count and bytes"""
+        windowed_publisher = WindowedPersistentPublisher(message_publisher,
+                                                         max_in_flight_messages=max_in_flight_messages,
+                                                         max_in_flight_bytes=max_in_flight_bytes)
+        for e in range(message_count):
+            windowed_publisher.publish(f'{message} {e}', destination, user_context=e)
+        windowed_publisher.wait_for_receipts(timeout_ms=constants.DEFAULT_TIMEOUT_MS)
+        print(f'Published: {message_count}, still in flight: {windowed_publisher.in_flight_count}, '
+              f'window stalls: {windowed_publisher.stall_count}, '
+              f'stall time: {windowed_publisher.stall_time * 1000:.3f}ms\n')
+
+    @staticmethod
+    def run():
+        try:
+            messaging_service = MessagingService.builder().from_properties(boot.broker_properties()).build()
+            messaging_service.connect()
+            print(f'Message service is connected? {messaging_service.is_connected}')
+            topic = Topic.of(constants.TOPIC_ENDPOINT_DEFAULT)
+
+            publisher = HowToPublishPersistentMessage.create_persistent_message_publisher(messaging_service)
+
+            HowToPublishPersistentMessageWithWindow \
+                .publish_string_messages_with_window(message_publisher=publisher, destination=topic,
+                                                     message=constants.MESSAGE_TO_SEND, message_count=1000,
+                                                     max_in_flight_messages=50, max_in_flight_bytes=64 * 1024)
+        finally:
+            messaging_service.disconnect()
+            publisher.terminate(0)
+
+
+if __name__ == '__main__':
+    HowToPublishPersistentMessageWithWindow().run()
@@ -0,0 +1,202 @@
+""" Run this file to publish direct and persistent messages from asyncio code with awaitable back pressure"""
+import asyncio
+from typing import TypeVar
+
+from solace.messaging.errors.pubsubplus_client_error import PublisherOverflowError
+from solace.messaging.messaging_service import MessagingService
+from solace.messaging.publisher.direct_message_publisher import DirectMessagePublisher
+from solace.messaging.publisher.persistent_message_publisher import PersistentMessagePublisher, \
+    MessagePublishReceiptListener, PublishReceipt
+from solace.messaging.publisher.publisher_health_check import PublisherReadinessListener
+from solace.messaging.resources.topic import Topic
+from sampler_boot import SamplerBoot, SolaceConstants, SamplerUtil
+
+X = TypeVar('X')
+constants = SolaceConstants
+boot = SamplerBoot()
+util = SamplerUtil()
+
+
+class AsyncioPublisherReadinessListener(PublisherReadinessListener):
+    """readiness listener that wakes up the event loop waiting on a full publisher buffer"""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self._loop = loop
+        self._ready_event = asyncio.Event()
+
+    @property
+    def ready_event(self) -> asyncio.Event:
+        return self._ready_event
+
+    def ready(self):
+        # ready() is called on an API thread, the event must only be touched from the loop thread
+        self._loop.call_soon_threadsafe(self._ready_event.set)
+
+
+class _ReceiptCorrelation:
+    """user context carrying the future of a persistent publish and the caller's own user context"""
+    __slots__ = ('future', 'user_context')
+
+    def __init__(self, future: asyncio.Future, user_context):
+        self.future = future
+        self.user_context = user_context
+
+
+class AsyncioPublishReceiptListener(MessagePublishReceiptListener):
+    """receipt listener that resolves the future handed out by AsyncPersistentPublisher.publish"""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self._loop = loop
+
+    @staticmethod
+    def _resolve(future: asyncio.Future, publish_receipt: PublishReceipt):
+        if not future.done():
+            future.set_result(publish_receipt)
+
+    def on_publish_receipt(self, publish_receipt: 'PublishReceipt'):
+        correlation = publish_receipt.user_context
+        if isinstance(correlation, _ReceiptCorrelation):
+            self._loop.call_soon_threadsafe(self._resolve, correlation.future, publish_receipt)
+
+
+class _AsyncPublisherFacade:
+    """common back pressure handling for the asyncio publisher facades
+
+    The wrapped publisher must be built with on_back_pressure_reject(), the facade turns every
+    PublisherOverflowError into a suspension of the calling coroutine until the readiness listener fires.
+    on_back_pressure_wait() must not be used here as it blocks the event loop thread.
+    """
+
+    def __init__(self, publisher, loop: asyncio.AbstractEventLoop = None):
+        self._publisher = publisher
+        self._loop = loop or asyncio.get_running_loop()
+        self._readiness_listener = AsyncioPublisherReadinessListener(self._loop)
+        self._publisher.set_publisher_readiness_listener(self._readiness_listener)
+        self._overflow_count = 0
+
+    @property
+    def overflow_count(self):
+        return self._overflow_count
+
+    async def _publish_with_back_pressure(self, publish_call, *args, **kwargs):
+        ready_event = self._readiness_listener.ready_event
+        while True:
+            try:
+                return publish_call(*args, **kwargs)
+            except PublisherOverflowError:
+                self._overflow_count += 1
+                # clear before asking for a notification, notify_when_ready guarantees a later ready() call
+                ready_event.clear()
+                self._publisher.notify_when_ready()
+                await ready_event.wait()
+
+
+class AsyncDirectPublisher(_AsyncPublisherFacade):
+    """asyncio facade over a DirectMessagePublisher"""
+
+    def __init__(self, publisher: DirectMessagePublisher, loop: asyncio.AbstractEventLoop = None):
+        super().__init__(publisher, loop)
+
+    async def publish(self, message, destination: Topic, additional_message_properties=None):
+        """publish a message, suspending the caller while the publisher buffer is full"""
+        await self._publish_with_back_pressure(self._publisher.publish, destination=destination, message=message,
+                                               additional_message_properties=additional_message_properties)
+
+
+class AsyncPersistentPublisher(_AsyncPublisherFacade):
+    """asyncio facade over a PersistentMessagePublisher returning publish receipts as futures"""
+
+    def __init__(self, publisher: PersistentMessagePublisher, loop: asyncio.AbstractEventLoop = None):
+        super().__init__(publisher, loop)
+        self._receipt_listener = AsyncioPublishReceiptListener(self._loop)
+        self._publisher.set_message_publish_receipt_listener(self._receipt_listener)
+
+    async def publish(self, message, destination: Topic, user_context=None,
+                      additional_message_properties=None) -> 'asyncio.Future':
+        """publish a message and return a future resolved with its PublishReceipt
+
+        The coroutine itself only suspends on back pressure, await the returned future for the broker
+        acknowledgement. The caller's user_context is available as receipt.user_context.user_context.
+        """
+        future = self._loop.create_future()
+        await self._publish_with_back_pressure(self._publisher.publish, message=message, destination=destination,
+                                               user_context=_ReceiptCorrelation(future, user_context),
+                                               additional_message_properties=additional_message_properties)
+        return future
+
+    async def publish_await_acknowledgement(self, message, destination: Topic, user_context=None,
+                                            additional_message_properties=None) -> 'PublishReceipt':
+        """publish a message and suspend the caller until the broker has acknowledged it"""
+        future = await self.publish(message, destination, user_context, additional_message_properties)
+        return await future
+
+
+class HowToPublishWithAsyncio:
+    """class contains methods to publish messages from asyncio coroutines"""
+
+    @staticmethod
+    async def direct_message_publish_async(messaging_service: MessagingService, destination, message,
+                                           buffer_capacity, message_count):
+        """ to publish str or byte array type messages from a coroutine using awaitable back pressure"""
+        try:
+            direct_publisher = messaging_service.create_direct_message_publisher_builder() \
+                .on_back_pressure_reject(buffer_capacity=buffer_capacity) \
+                .build()
+            direct_publisher.start()
+            async_publisher = AsyncDirectPublisher(direct_publisher)
+            for _ in range(message_count):
+                await async_publisher.publish(message, destination)
+            print(f'Direct messages published: {message_count}, overflow count: {async_publisher.overflow_count}')
+        finally:
+            util.publisher_terminate(direct_publisher)
+
+    @staticmethod
+    async def persistent_message_publish_async(messaging_service: MessagingService, destination, message,
+                                               buffer_capacity, message_count):
+        """ to publish persistent messages from a coroutine and await all the publish receipts"""
+        try:
+            persistent_publisher = messaging_service.create_persistent_message_publisher_builder() \
+                .on_back_pressure_reject(buffer_capacity=buffer_capacity) \
+                .build()
+            persistent_publisher.start()
+            async_publisher = AsyncPersistentPublisher(persistent_publisher)
+            receipt_futures = [await async_publisher.publish(message, destination, user_context=e)
+                               for e in range(message_count)]
+            receipts = await asyncio.gather(*receipt_futures)
+            persisted_count = sum(1 for receipt in receipts if receipt.is_persisted)
+            print(f'Persistent messages published: {message_count}, persisted: {persisted_count}, '
+                  f'overflow count: {async_publisher.overflow_count}')
+
+            receipt = await async_publisher.publish_await_acknowledgement(message, destination)
+            print(f'Awaited publish receipt: {receipt}')
+        finally:
+            util.publisher_terminate(persistent_publisher)
+
+    @staticmethod
+    async def run_async():
+        try:
+            service = MessagingService.builder().from_properties(boot.broker_properties()).build()
+            service.connect()
+            destination_name = Topic.of(constants.TOPIC_ENDPOINT_DEFAULT)
+            message_count = 1000
+            buffer_capacity = 100
+
+            print("Execute Direct Publish - asyncio with awaitable back pressure")
+            await HowToPublishWithAsyncio.direct_message_publish_async(service, destination_name,
+                                                                       constants.MESSAGE_TO_SEND,
+                                                                       buffer_capacity, message_count)
+
+            print("Execute Persistent Publish - asyncio with awaitable publish receipts")
+            await HowToPublishWithAsyncio.persistent_message_publish_async(service, destination_name,
+                                                                           constants.MESSAGE_TO_SEND,
+                                                                           buffer_capacity, message_count)
+        finally:
+            service.disconnect()
+
+    @staticmethod
+    def run():
+        asyncio.run(HowToPublishWithAsyncio.run_async())
+
+
+if __name__ == '__main__':
+    HowToPublishWithAsyncio().run()
@@ -0,0 +1,165 @@
+""" Run this file to publish persistent messages at a target rate paced by a token bucket instead of a fixed sleep
+per message"""
+import threading
+import time
+from typing import TypeVar
+
+from solace.messaging.messaging_service import MessagingService
+from solace.messaging.resources.topic import Topic
+from how_to_publish_persistent_message import HowToPublishPersistentMessage
+from sampler_boot import SamplerBoot, SolaceConstants
+
+X = TypeVar('X')
+constants = SolaceConstants
+boot = SamplerBoot()
+
+
+class TokenBucket:
+    """token bucket refilled at rate tokens per second on the monotonic high resolution clock, holding at most
+    burst tokens
+
+    acquire() waits with a spin-sleep hybrid: it sleeps for the bulk of the wait, then spins the last
+    spin_threshold_us so that sub-millisecond pacing is not at the mercy of the OS timer resolution.
+    The rate can be changed at runtime from any thread.
+    """
+
+    def __init__(self, rate: float, burst: float = 1, spin_threshold_us=200):
+        if rate <= 0 or burst < 1:
+            raise ValueError(f'Invalid token bucket, expected rate[{rate}] > 0 and burst[{burst}] >= 1')
+        self._rate = rate
+        self._burst = burst
+        self._spin_threshold = spin_threshold_us / 1_000_000
+        self._lock = threading.Lock()
+        self._tokens = burst
+        self._last_refill = time.perf_counter()
+
+    @property
+    def rate(self):
+        return self._rate
+
+    def set_rate(self, rate: float):
+        if rate <= 0:
+            raise ValueError(f'Invalid token bucket rate[{rate}], expected > 0')
+        with self._lock:
+            self._refill(time.perf_counter())
+            self._rate = rate
+
+    def _refill(self, now):
+        self._tokens = min(self._burst, self._tokens + (now - self._last_refill) * self._rate)
+        self._last_refill = now
+
+    def try_acquire(self, tokens=1) -> float:
+        """take the tokens if available and return 0, else return the seconds until they will be"""
+        if tokens > self._burst:
+            raise ValueError(f'Invalid token count[{tokens}], the bucket never holds more than burst[{self._burst}]')
+        with self._lock:
+            self._refill(time.perf_counter())
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return 0.0
+            return (tokens - self._tokens) / self._rate
+
+    def acquire(self, tokens=1):
+        """block until the tokens are available and take them"""
+        wait = self.try_acquire(tokens)
+        while wait > 0:
+            deadline = time.perf_counter() + wait
+            if wait > self._spin_threshold:
+                time.sleep(wait - self._spin_threshold)
+            while time.perf_counter() < deadline:
+                pass
+            wait = self.try_acquire(tokens)
+
+
+class PacedPublishLoop:
+    """publishing loop paced by a token bucket, reporting the achieved rate against the target every
+    report_interval_s
+
+    The target is time weighted, the integral of the bucket rate over the time it was in force divided by the
+    elapsed time, so that achieved and target rates stay comparable when the rate is changed during the run.
+    """
+
+    def __init__(self, publish, token_bucket: TokenBucket, report_interval_s=1.0):
+        self._publish = publish
+        self._token_bucket = token_bucket
+        self._report_interval = report_interval_s
+        self._published_count = 0
+        self._target_count = 0.0
+        self._elapsed = 0.0
+
+    @property
+    def achieved_rate(self):
+        return self._published_count / self._elapsed if self._elapsed else 0.0
+
+    @property
+    def target_rate(self):
+        """time weighted mean of the bucket rate over the run"""
+        return self._target_count / self._elapsed if self._elapsed else 0.0
+
+    def run(self, message_count=None, duration_s=None):
+        """call publish(sequence_number) until message_count messages are published or duration_s expires"""
+        start = report_start = last = time.perf_counter()
+        report_count = 0
+        report_target_count = target_count = 0.0
+        sequence_number = 0
+        while (message_count is None or sequence_number < message_count) and \
+                (duration_s is None or time.perf_counter() - start < duration_s):
+            self._token_bucket.acquire()
+            self._publish(sequence_number)
+            sequence_number += 1
+            now = time.perf_counter()
+            target_count += self._token_bucket.rate * (now - last)
+            last = now
+            if now - report_start >= self._report_interval:
+                print(f'Achieved rate: {(sequence_number - report_count) / (now - report_start):.1f} msg/s, '
+                      f'target: {(target_count - report_target_count) / (now - report_start):.1f} msg/s')
+                report_start, report_count, report_target_count = now, sequence_number, target_count
+        self._published_count = sequence_number
+        self._target_count = target_count
+        self._elapsed = last - start
+        print(f'Published {self._published_count} message(s) in {self._elapsed:.3f}s, '
+              f'achieved rate: {self.achieved_rate:.1f} msg/s, time weighted target: {self.target_rate:.1f} msg/s')
+        return self._published_count
+
+
+class HowToPublishWithTokenBucketPacing:
+    """class contains methods to publish at a controlled rate"""
+
+    @staticmethod
+    def publish_persistent_messages_at_rate(messaging_service: MessagingService, publisher, destination: Topic,
+                                            message, rate, burst, duration_s):
+        """method to publish persistent messages at the given rate, doubling the rate half way through"""
+        message_builder = messaging_service.message_builder() \
+            .with_application_message_id(constants.APPLICATION_MESSAGE_ID)
+        token_bucket = TokenBucket(rate, burst)
+
+        def publish(sequence_number):
+            publisher.publish(message_builder.build(f'{message} {sequence_number}'), destination)
+
+        rate_change = threading.Timer(duration_s / 2, token_bucket.set_rate, args=(rate * 2,))
+        rate_change.start()
+        try:
+            PacedPublishLoop(publish, token_bucket).run(duration_s=duration_s)
+        finally:
+            rate_change.cancel()
+
+    @staticmethod
+    def run():
+        try:
+            messaging_service = MessagingService.builder().from_properties(boot.broker_properties()).build()
+            messaging_service.connect()
+            print(f'Message service is connected? {messaging_service.is_connected}')
+            topic = Topic.of(constants.TOPIC_ENDPOINT_DEFAULT)
+
+            publisher = HowToPublishPersistentMessage.create_persistent_message_publisher(messaging_service)
+
+            HowToPublishWithTokenBucketPacing \
+                .publish_persistent_messages_at_rate(messaging_service, publisher, topic, constants.MESSAGE_TO_SEND,
+                                                     rate=1000, burst=10, duration_s=10)
+        finally:
+            messaging_service.disconnect()
+            publisher.terminate(0)
+
+
+if __name__ == '__main__':
+    HowToPublishWithTokenBucketPacing().run()
@@ -0,0 +1,144 @@
+""" Run this file to publish bytes like and buffer protocol payloads (memoryview, array, NumPy arrays, mmap slices)
+with no intermediate copy, and to benchmark the copies saved against the converter path"""
+import array
+import json
+import pickle
+import time
+from typing import TypeVar
+
+from solace.messaging.messaging_service import MessagingService
+from solace.messaging.publisher.direct_message_publisher import DirectMessagePublisher
+from solace.messaging.resources.topic import Topic
+from solace.messaging.utils.converter import ObjectToBytes
+from sampler_boot import SamplerBoot, SolaceConstants, SamplerUtil
+
+X = TypeVar('X')
+constants = SolaceConstants
+boot = SamplerBoot()
+util = SamplerUtil()
+
+
+class PopoConverter(ObjectToBytes):  # plain old python object - popo
+    """sample converter class"""
+
+    def to_bytes(self, src) -> bytes:
+        """This Method converts the given business object to bytes"""
+
+        object_to_byte = pickle.dumps(src)
+        return object_to_byte
+
+
+def to_publishable_payload(payload):
+    """return a payload the message builder accepts for a str or any buffer protocol object, and the number of
+    copies made on the Python side
+
+    The message builder hands the memory of a bytearray to the C API as is, any other binary payload has to
+    go through a converter which copies it twice: once in to_bytes() and once more in the builder. A bytearray,
+    or a memoryview spanning a whole bytearray, is therefore passed through with no copy, any other buffer,
+    e.g. bytes, a read-only mmap slice or a NumPy array, is copied exactly once into a bytearray.
+    """
+    if isinstance(payload, (str, bytearray)):
+        return payload, 0
+    view = memoryview(payload)
+    if isinstance(view.obj, bytearray) and view.contiguous and view.nbytes == len(view.obj):
+        return view.obj, 0
+    return bytearray(view), 1
+
+
+class PayloadBuffer:
+    """bytearray backed payload buffer, fill it through its memoryview, or through a NumPy view created with
+    numpy.frombuffer(payload_buffer.buffer, dtype), then publish it with no copy"""
+
+    def __init__(self, size: int):
+        self._buffer = bytearray(size)
+        self._view = memoryview(self._buffer)
+
+    @property
+    def buffer(self) -> bytearray:
+        return self._buffer
+
+    @property
+    def view(self) -> memoryview:
+        return self._view
+
+
+class HowToPublishZeroCopyPayload:
+    """class contains methods to publish buffer protocol payloads without intermediate copies"""
+
+    @staticmethod
+    def direct_message_publish_buffer(messaging_service: MessagingService, publisher: DirectMessagePublisher,
+                                      destination, payload):
+        """ to publish a bytes like or buffer protocol payload, returns the number of Python side copies made"""
+        publishable_payload, copy_count = to_publishable_payload(payload)
+        outbound_msg = messaging_service.message_builder() \
+            .with_application_message_id(constants.APPLICATION_MESSAGE_ID) \
+            .build(publishable_payload)
+        publisher.publish(destination=destination, message=outbound_msg)
+        return copy_count
+
+    @staticmethod
+    def benchmark_payload_copies(messaging_service: MessagingService, payload_sizes, iterations=100):
+        """time building a message from a payload of each size through the pickle converter, through a bytes
+        to bytearray conversion and through to_publishable_payload of a bytearray backed view and of an array
+
+        No broker connection is needed, only the message builder is exercised. The copy of the payload into the
+        C message, common to every path, is included in every timing.
+        """
+        results = []
+        message_builder = messaging_service.message_builder()
+        for payload_size in payload_sizes:
+            payload_buffer = PayloadBuffer(payload_size)
+            payload_bytes = bytes(payload_size)
+            payload_array = array.array('B', payload_bytes)
+            paths = {
+                'pickle_converter': (2, lambda: message_builder.build(payload_bytes, converter=PopoConverter())),
+                'bytes_to_bytearray': (1, lambda: message_builder.build(bytearray(payload_bytes))),
+                'buffer_protocol_array': (1, lambda: message_builder.build(to_publishable_payload(payload_array)[0])),
+                'zero_copy_bytearray_view': (0, lambda: message_builder.build(
+                    to_publishable_payload(payload_buffer.view)[0])),
+            }
+            for path_name, (copy_count, build) in paths.items():
+                start = time.perf_counter()
+                for _ in range(iterations):
+                    build()
+                elapsed = time.perf_counter() - start
+                results.append({'payload_size': payload_size, 'path': path_name, 'python_copies': copy_count,
+                                'python_bytes_copied': copy_count * payload_size,
+                                'build_us': elapsed / iterations * 1_000_000})
+        return results
+
+    @staticmethod
+    def run():
+        service = MessagingService.builder().from_properties(boot.broker_properties()).build()
+        print("Execute payload copy benchmark")
+        for result in HowToPublishZeroCopyPayload \
+                .benchmark_payload_copies(service, payload_sizes=[64, 1024, 64 * 1024, 1024 * 1024,
+                                                                  16 * 1024 * 1024]):
+            print(f'[BENCHMARK] {json.dumps(result)}')
+
+        try:
+            service.connect()
+            destination_name = Topic.of(constants.TOPIC_ENDPOINT_DEFAULT)
+            direct_publisher = service.create_direct_message_publisher_builder().build()
+            direct_publisher.start()
+
+            print("Execute Direct Publish - zero copy bytearray backed payload")
+            payload_buffer = PayloadBuffer(1024 * 1024)
+            payload_buffer.view[:len(constants.MESSAGE_TO_SEND)] = constants.MESSAGE_TO_SEND.encode(
+                constants.ENCODING_TYPE)
+            copy_count = HowToPublishZeroCopyPayload \
+                .direct_message_publish_buffer(service, direct_publisher, destination_name, payload_buffer.view)
+            print(f'Published {len(payload_buffer.buffer)} byte(s) with {copy_count} Python side copies')
+
+            print("Execute Direct Publish - buffer protocol array payload")
+            copy_count = HowToPublishZeroCopyPayload \
+                .direct_message_publish_buffer(service, direct_publisher, destination_name,
+                                               array.array('d', range(1024)))
+            print(f'Published array with {copy_count} Python side copies')
+        finally:
+            util.publisher_terminate(direct_publisher)
+            service.disconnect()
+
+
+if __name__ == '__main__':
+    HowToPublishZeroCopyPayload().run()
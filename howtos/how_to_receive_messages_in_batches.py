@@ -0,0 +1,159 @@
+""" Run this file to pull messages in batches from direct and persistent receivers with receive_messages(max_count,
+timeout), processing and acknowledging each batch at once instead of one receive_message() call per message"""
+import threading
+import time
+from typing import TypeVar, List
+
+from solace.messaging.messaging_service import MessagingService
+from solace.messaging.receiver.inbound_message import InboundMessage
+from solace.messaging.resources.queue import Queue
+from solace.messaging.resources.topic import Topic
+from solace.messaging.resources.topic_subscription import TopicSubscription
+from how_to_publish_persistent_message import HowToPublishPersistentMessage
+from sampler_boot import SamplerBoot, SolaceConstants, SamplerUtil
+
+X = TypeVar('X')
+constants = SolaceConstants
+boot = SamplerBoot()
+util = SamplerUtil()
+
+
+def receive_messages(receiver, max_count: int, timeout: int = None) -> List[InboundMessage]:
+    """receive up to max_count messages from a direct or persistent receiver in one call
+
+    Blocks up to timeout milliseconds, forever when None, for the first message, then only drains the messages
+    already buffered by the receiver without waiting again. Returns an empty list on timeout or when the receiver
+    is terminating.
+    """
+    if max_count < 1:
+        raise ValueError(f'Invalid max_count[{max_count}], expected >= 1')
+    message = receiver.receive_message(timeout) if timeout is not None else receiver.receive_message()
+    if message is None:
+        return []
+    messages = [message]
+    receive_message = receiver.receive_message
+    while len(messages) < max_count:
+        message = receive_message(0)
+        if message is None:
+            break
+        messages.append(message)
+    return messages
+
+
+class BatchMessageReceiver:
+    """wrapper of a direct or persistent receiver adding receive_messages() and, for a persistent receiver,
+    ack_all(), and counting the batches received"""
+
+    def __init__(self, receiver):
+        self._receiver = receiver
+        self._lock = threading.Lock()
+        self._batch_count = 0
+        self._message_count = 0
+
+    @property
+    def receiver(self):
+        return self._receiver
+
+    def receive_messages(self, max_count: int, timeout: int = None) -> List[InboundMessage]:
+        messages = receive_messages(self._receiver, max_count, timeout)
+        if messages:
+            with self._lock:
+                self._batch_count += 1
+                self._message_count += len(messages)
+        return messages
+
+    def ack_all(self, messages):
+        """acknowledge a batch of messages received from a persistent receiver once it has been processed"""
+        for message in messages:
+            self._receiver.ack(message)
+
+    def batch_stats(self):
+        with self._lock:
+            return {'batch_count': self._batch_count, 'message_count': self._message_count,
+                    'mean_batch_size': self._message_count / self._batch_count if self._batch_count else None}
+
+    def __getattr__(self, name):
+        return getattr(self._receiver, name)
+
+
+class HowToReceiveMessagesInBatches:
+    """class contains methods to receive messages in batches with blocking receive calls"""
+
+    @staticmethod
+    def blocking_consume_direct_messages_in_batches(service: MessagingService, consumer_subscription: str,
+                                                    message_count, max_batch_size, receive_timeout):
+        """ to receive published direct messages in batches of up to max_batch_size"""
+        try:
+            receiver = BatchMessageReceiver(service.create_direct_message_receiver_builder()
+                                            .with_subscriptions([TopicSubscription.of(consumer_subscription)])
+                                            .build())
+            receiver.start()
+            publisher = service.create_direct_message_publisher_builder().build()
+            publisher.start()
+            for e in range(message_count):
+                publisher.publish(destination=Topic.of(consumer_subscription),
+                                  message=f'{constants.MESSAGE_TO_SEND} {e}')
+
+            received_count = 0
+            while received_count < message_count:
+                messages = receiver.receive_messages(max_batch_size, receive_timeout)
+                if not messages:
+                    break
+                received_count += len(messages)
+                print(f"received batch of {len(messages)} message(s), first payload: "
+                      f"{messages[0].get_payload_as_string()}, msg_count: {received_count}")
+            print(f'Direct batch receive: {receiver.batch_stats()}')
+        finally:
+            util.publisher_terminate(publisher)
+            receiver.terminate(0)
+
+    @staticmethod
+    def blocking_consume_persistent_messages_in_batches(service: MessagingService, topic: Topic, message_count,
+                                                        max_batch_size, receive_timeout):
+        """ to receive persistent messages in batches and acknowledge each batch after processing it"""
+        try:
+            receiver = BatchMessageReceiver(service.create_persistent_message_receiver_builder()
+                                            .build(Queue.non_durable_exclusive_queue()))
+            receiver.start()
+            receiver.add_subscription(TopicSubscription.of(topic.get_name()))
+            publisher = HowToPublishPersistentMessage.create_persistent_message_publisher(service)
+            for e in range(message_count):
+                publisher.publish(f'{constants.MESSAGE_TO_SEND} {e}', topic)
+
+            received_count = 0
+            while received_count < message_count:
+                messages = receiver.receive_messages(max_batch_size, receive_timeout)
+                if not messages:
+                    break
+                received_count += len(messages)
+                print(f"received batch of {len(messages)} persistent message(s), msg_count: {received_count}")
+                receiver.ack_all(messages)
+            print(f'Persistent batch receive: {receiver.batch_stats()}')
+        finally:
+            publisher.terminate(0)
+            receiver.terminate(0)
+
+    @staticmethod
+    def run():
+        try:
+            service = MessagingService.builder().from_properties(boot.broker_properties()).build()
+            service.connect()
+
+            print("Execute Direct Consume - blocking receive in batches")
+            HowToReceiveMessagesInBatches \
+                .blocking_consume_direct_messages_in_batches(service, constants.TOPIC_ENDPOINT_DEFAULT,
+                                                             message_count=1000, max_batch_size=64,
+                                                             receive_timeout=constants.DEFAULT_TIMEOUT_MS)
+            time.sleep(1)
+
+            print("Execute Persistent Consume - blocking receive in batches with batch acknowledgement")
+            HowToReceiveMessagesInBatches \
+                .blocking_consume_persistent_messages_in_batches(service, Topic.of(constants.TOPIC_ENDPOINT_DEFAULT),
+                                                                 message_count=1000, max_batch_size=64,
+                                                                 receive_timeout=constants.DEFAULT_TIMEOUT_MS)
+        finally:
+            service.disconnect()
+
+
+if __name__ == '__main__':
+    HowToReceiveMessagesInBatches().run()
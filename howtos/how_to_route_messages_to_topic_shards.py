@@ -0,0 +1,157 @@
+""" Run this file to publish keyed messages to topic shards placed on a consistent hash ring"""
+import bisect
+import hashlib
+import threading
+from string import Template
+from typing import TypeVar
+
+from solace.messaging.config import _sol_constants
+from solace.messaging.messaging_service import MessagingService
+from solace.messaging.resources.topic import Topic
+from sampler_boot import SamplerBoot, SolaceConstants, SamplerUtil
+
+X = TypeVar('X')
+constants = SolaceConstants
+boot = SamplerBoot()
+util = SamplerUtil()
+
+SHARD_TOPIC_FORMAT = Template('$prefix/shard/$shard')
+
+
+def ring_hash(value) -> int:
+    """64 bit position on the ring of a str or bytes value"""
+    if isinstance(value, str):
+        value = value.encode(_sol_constants.ENCODING_TYPE)
+    return int.from_bytes(hashlib.blake2b(value, digest_size=8).digest(), 'big')
+
+
+class ConsistentHashRing:
+    """consistent hash ring placing virtual_nodes points per shard, a key belongs to the shard owning the first
+    point at or after the hash of the key
+
+    Adding or removing a shard only moves the keys of the arcs that shard gains or loses, about 1/N of them.
+    """
+
+    def __init__(self, shards=(), virtual_nodes=160):
+        self._virtual_nodes = virtual_nodes
+        self._shards = set()
+        self._ring = ([], [])
+        for shard in shards:
+            self.add_shard(shard)
+
+    @property
+    def shards(self):
+        return sorted(self._shards)
+
+    def _rebuild(self):
+        ring = sorted((ring_hash(f'{shard}#{virtual_node}'), shard)
+                      for shard in self._shards for virtual_node in range(self._virtual_nodes))
+        # points and owners are swapped in together so a concurrent shard_of() never sees them mismatched
+        self._ring = ([point for point, _ in ring], [shard for _, shard in ring])
+
+    def add_shard(self, shard: str):
+        self._shards.add(shard)
+        self._rebuild()
+
+    def remove_shard(self, shard: str):
+        self._shards.discard(shard)
+        self._rebuild()
+
+    def shard_of(self, key) -> str:
+        points, owners = self._ring
+        if not points:
+            raise ValueError('Consistent hash ring has no shard')
+        return owners[bisect.bisect_left(points, ring_hash(key)) % len(owners)]
+
+
+class TopicShardRouter:
+    """routes message keys to one of the shard topics $prefix/shard/<n> through a ConsistentHashRing
+
+    Topic objects are resolved once per shard and cached, the number of keys routed to each shard is counted
+    to report the skew.
+    """
+
+    def __init__(self, topic_prefix: str, shard_count: int, virtual_nodes=160):
+        self._topic_prefix = topic_prefix
+        self._lock = threading.Lock()
+        self._ring = ConsistentHashRing(virtual_nodes=virtual_nodes)
+        self._topics = {}
+        self._route_counts = {}
+        for _ in range(shard_count):
+            self.add_shard()
+
+    def add_shard(self) -> Topic:
+        """add the next shard topic to the ring and return it"""
+        with self._lock:
+            topic_name = SHARD_TOPIC_FORMAT.substitute(prefix=self._topic_prefix, shard=len(self._topics))
+            self._topics[topic_name] = Topic.of(topic_name)
+            self._route_counts[topic_name] = 0
+            self._ring.add_shard(topic_name)
+            return self._topics[topic_name]
+
+    def route(self, key) -> Topic:
+        topic_name = self._ring.shard_of(key)
+        with self._lock:
+            self._route_counts[topic_name] += 1
+        return self._topics[topic_name]
+
+    def reset_counts(self):
+        with self._lock:
+            self._route_counts = dict.fromkeys(self._route_counts, 0)
+
+    def skew_report(self):
+        """keys routed per shard and the max/mean ratio, 1.0 being a perfectly even spread"""
+        with self._lock:
+            route_counts = dict(self._route_counts)
+        total_count = sum(route_counts.values())
+        mean_count = total_count / len(route_counts) if route_counts else 0
+        return {'total_count': total_count, 'shard_count': len(route_counts),
+                'max_over_mean': max(route_counts.values()) / mean_count if mean_count else None,
+                'min_over_mean': min(route_counts.values()) / mean_count if mean_count else None,
+                'route_counts': route_counts}
+
+
+class HowToRouteMessagesToTopicShards:
+    """class contains methods to shard keyed messages over topics"""
+
+    @staticmethod
+    def keys_moved_on_reshard(router: TopicShardRouter, keys):
+        """add a shard and return the fraction of the keys that now route to a different topic"""
+        before = [router.route(key).get_name() for key in keys]
+        router.add_shard()
+        after = [router.route(key).get_name() for key in keys]
+        return sum(1 for old, new in zip(before, after) if old != new) / len(keys)
+
+    @staticmethod
+    def direct_message_publish_sharded(messaging_service: MessagingService, router: TopicShardRouter, keys,
+                                       message):
+        """ to publish one message per key on the shard topic of the key"""
+        try:
+            direct_publisher = messaging_service.create_direct_message_publisher_builder().build()
+            direct_publisher.start()
+            router.reset_counts()
+            for key in keys:
+                direct_publisher.publish(destination=router.route(key), message=f'{message} {key}')
+            print(f'Shard skew: {router.skew_report()}')
+        finally:
+            util.publisher_terminate(direct_publisher)
+
+    @staticmethod
+    def run():
+        keys = [f'order-{e}' for e in range(10000)]
+        router = TopicShardRouter(constants.TOPIC_ENDPOINT_DEFAULT, shard_count=8)
+        moved = HowToRouteMessagesToTopicShards.keys_moved_on_reshard(router, keys)
+        print(f'Resharding 8 -> 9 shards moved {moved:.1%} of the keys, ideal is {1 / 9:.1%}')
+
+        try:
+            service = MessagingService.builder().from_properties(boot.broker_properties()).build()
+            service.connect()
+            print("Execute Direct Publish - keyed messages on consistent hash topic shards")
+            HowToRouteMessagesToTopicShards \
+                .direct_message_publish_sharded(service, router, keys, constants.MESSAGE_TO_SEND)
+        finally:
+            service.disconnect()
+
+
+if __name__ == '__main__':
+    HowToRouteMessagesToTopicShards().run()
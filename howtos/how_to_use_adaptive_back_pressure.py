@@ -0,0 +1,255 @@
+""" Run this file to publish messages with a back pressure buffer that is resized at runtime from observed load"""
+import threading
+import time
+from enum import Enum
+from typing import TypeVar, Union
+
+from solace.messaging.errors.pubsubplus_client_error import PublisherOverflowError
+from solace.messaging.messaging_service import MessagingService
+from solace.messaging.publisher.direct_message_publisher import DirectMessagePublisher
+from solace.messaging.publisher.publisher_health_check import PublisherReadinessListener
+from solace.messaging.resources.topic import Topic
+from sampler_boot import SamplerBoot, SolaceConstants
+
+X = TypeVar('X')
+constants = SolaceConstants
+boot = SamplerBoot()
+
+
+class BackPressureStrategy(Enum):
+    """back pressure strategies the controller can switch between"""
+    REJECT = 'reject'
+    WAIT = 'wait'
+
+
+class PublisherReadinessListenerImpl(PublisherReadinessListener):
+    """readiness listener that releases publisher threads parked on a full buffer"""
+
+    def __init__(self):
+        self._ready_event = threading.Event()
+        self._ready_count = 0
+
+    @property
+    def ready_count(self):
+        return self._ready_count
+
+    def arm(self):
+        """clear the ready flag, must be called before PublisherHealthCheck.notify_when_ready()"""
+        self._ready_event.clear()
+
+    def wait_ready(self, timeout: float = None) -> bool:
+        return self._ready_event.wait(timeout)
+
+    def ready(self):
+        self._ready_count += 1
+        self._ready_event.set()
+
+
+class BackPressureDecision:
+    """a single resize or strategy switch made by the controller"""
+
+    def __init__(self, strategy: BackPressureStrategy, buffer_capacity: int, reason: str):
+        self.time_stamp = time.time()
+        self.strategy = strategy
+        self.buffer_capacity = buffer_capacity
+        self.reason = reason
+
+    def __str__(self):
+        return f'strategy: {self.strategy.value}, buffer_capacity: {self.buffer_capacity}, reason: {self.reason}'
+
+
+class AdaptiveBackPressureController:
+    """controller that watches overflows, readiness callbacks and publish latency and decides on
+    the buffer capacity and back pressure strategy within the configured bounds
+
+    The decision is taken once per evaluation window of publishes:
+        - any overflow or a p99 publish latency above the target grows the buffer by grow_factor,
+          an overflow at max_capacity in reject mode switches to wait mode
+        - quiet_windows windows in a row without overflow and a p99 latency below half the target shrink the
+          buffer by grow_factor, and switch wait mode back to reject mode once the buffer is below max_capacity
+    """
+
+    def __init__(self, min_capacity=50, max_capacity=5000, initial_capacity=100, latency_target_ms=5.0,
+                 evaluation_window=1000, grow_factor=2, quiet_windows=3,
+                 strategy: BackPressureStrategy = BackPressureStrategy.REJECT):
+        if not 0 < min_capacity <= initial_capacity <= max_capacity:
+            raise ValueError(f'Invalid buffer bounds, expected 0 < min_capacity[{min_capacity}] <= '
+                             f'initial_capacity[{initial_capacity}] <= max_capacity[{max_capacity}]')
+        self._min_capacity = min_capacity
+        self._max_capacity = max_capacity
+        self._latency_target = latency_target_ms / 1000
+        self._evaluation_window = evaluation_window
+        self._grow_factor = grow_factor
+        self._quiet_windows = quiet_windows
+        self._buffer_capacity = initial_capacity
+        self._strategy = strategy
+        self._lock = threading.Lock()
+        self._latencies = []
+        self._overflow_count = 0
+        self._ready_count = 0
+        self._quiet_window_count = 0
+        self._decisions = []
+
+    @property
+    def buffer_capacity(self):
+        return self._buffer_capacity
+
+    @property
+    def strategy(self):
+        return self._strategy
+
+    @property
+    def decisions(self):
+        return list(self._decisions)
+
+    def on_publish(self, latency: float):
+        """record the latency in seconds of one completed publish, retries included"""
+        with self._lock:
+            self._latencies.append(latency)
+
+    def on_overflow(self):
+        with self._lock:
+            self._overflow_count += 1
+
+    def on_ready(self):
+        with self._lock:
+            self._ready_count += 1
+
+    def evaluate(self) -> Union[BackPressureDecision, None]:
+        """close the current window once it is full and return a decision if the configuration changes"""
+        with self._lock:
+            if len(self._latencies) < self._evaluation_window:
+                return None
+            latencies = sorted(self._latencies)
+            p99_latency = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+            overflow_count, ready_count = self._overflow_count, self._ready_count
+            self._latencies, self._overflow_count, self._ready_count = [], 0, 0
+
+            window = f'overflows: {overflow_count}, ready callbacks: {ready_count}, ' \
+                     f'p99 latency: {p99_latency * 1000:.3f}ms'
+            strategy, capacity, reason = self._strategy, self._buffer_capacity, None
+            if overflow_count or p99_latency > self._latency_target:
+                self._quiet_window_count = 0
+                if capacity < self._max_capacity:
+                    capacity = min(self._max_capacity, capacity * self._grow_factor)
+                    reason = f'grow buffer, {window}'
+                elif strategy == BackPressureStrategy.REJECT and overflow_count:
+                    strategy = BackPressureStrategy.WAIT
+                    reason = f'switch to wait at max capacity, {window}'
+            elif p99_latency < self._latency_target / 2:
+                self._quiet_window_count += 1
+                if self._quiet_window_count >= self._quiet_windows:
+                    self._quiet_window_count = 0
+                    if capacity > self._min_capacity:
+                        capacity = max(self._min_capacity, capacity // self._grow_factor)
+                        reason = f'shrink buffer, {window}'
+                    if strategy == BackPressureStrategy.WAIT and capacity < self._max_capacity:
+                        strategy = BackPressureStrategy.REJECT
+                        reason = f'shrink buffer and switch to reject, {window}'
+
+            if reason is None:
+                return None
+            self._strategy, self._buffer_capacity = strategy, capacity
+            decision = BackPressureDecision(strategy, capacity, reason)
+            self._decisions.append(decision)
+        print(f'[ADAPTIVE BACK PRESSURE] {decision}')
+        return decision
+
+
+class AdaptiveDirectPublisher:
+    """direct publisher that rebuilds itself whenever the controller changes buffer capacity or strategy
+
+    Messages rejected on overflow are retried once the publisher is ready again, a caller parked for longer than
+    max_wait_ms gets a PublisherOverflowError for the message it was publishing. The replaced publisher is
+    terminated asynchronously with a grace period, so its buffered messages are flushed without stalling the caller.
+    """
+
+    def __init__(self, messaging_service: MessagingService, controller: AdaptiveBackPressureController,
+                 terminate_grace_period_ms=5000, max_wait_ms=5000):
+        self._messaging_service = messaging_service
+        self._controller = controller
+        self._terminate_grace_period_ms = terminate_grace_period_ms
+        self._max_wait = max_wait_ms / 1000
+        self._replaced_publisher_terminations = []
+        self._readiness_listener = PublisherReadinessListenerImpl()
+        self._publisher = self._build_publisher()
+
+    def _build_publisher(self) -> DirectMessagePublisher:
+        builder = self._messaging_service.create_direct_message_publisher_builder()
+        if self._controller.strategy == BackPressureStrategy.WAIT:
+            builder = builder.on_back_pressure_wait(buffer_capacity=self._controller.buffer_capacity)
+        else:
+            builder = builder.on_back_pressure_reject(buffer_capacity=self._controller.buffer_capacity)
+        publisher = builder.build()
+        publisher.set_publisher_readiness_listener(self._readiness_listener)
+        publisher.start()
+        return publisher
+
+    def publish(self, message, destination: Topic):
+        start = time.perf_counter()
+        deadline = start + self._max_wait
+        while True:
+            try:
+                self._publisher.publish(destination=destination, message=message)
+                break
+            except PublisherOverflowError:
+                self._controller.on_overflow()
+                self._readiness_listener.arm()
+                self._publisher.notify_when_ready()
+                if not self._readiness_listener.wait_ready(max(0.0, deadline - time.perf_counter())):
+                    raise PublisherOverflowError(f'Publisher not ready after {self._max_wait * 1000:.0f}ms')
+                self._controller.on_ready()
+        self._controller.on_publish(time.perf_counter() - start)
+
+        if self._controller.evaluate():
+            previous_publisher, self._publisher = self._publisher, self._build_publisher()
+            self._replaced_publisher_terminations = [
+                termination for termination in self._replaced_publisher_terminations if not termination.done()]
+            self._replaced_publisher_terminations.append(
+                previous_publisher.terminate_async(self._terminate_grace_period_ms))
+
+    def terminate(self):
+        """terminate the current publisher and wait for the replaced ones to finish flushing"""
+        self._publisher.terminate(self._terminate_grace_period_ms)
+        for termination in self._replaced_publisher_terminations:
+            termination.result()
+
+
+class HowToUseAdaptiveBackPressure:
+    """class contains methods to publish with an adaptive back pressure buffer"""
+
+    @staticmethod
+    def direct_message_publish_with_adaptive_back_pressure(messaging_service: MessagingService, destination,
+                                                           message, burst_count, burst_size):
+        """ to publish bursts of messages letting the controller size the buffer"""
+        controller = AdaptiveBackPressureController(min_capacity=50, max_capacity=5000, initial_capacity=100,
+                                                    latency_target_ms=1.0, evaluation_window=burst_size)
+        adaptive_publisher = AdaptiveDirectPublisher(messaging_service, controller)
+        try:
+            for _ in range(burst_count):
+                for _ in range(burst_size):
+                    adaptive_publisher.publish(message, destination)
+                time.sleep(0.5)
+        finally:
+            adaptive_publisher.terminate()
+        print(f'Final buffer capacity: {controller.buffer_capacity}, strategy: {controller.strategy.value}, '
+              f'decisions taken: {len(controller.decisions)}')
+
+    @staticmethod
+    def run():
+        try:
+            service = MessagingService.builder().from_properties(boot.broker_properties()).build()
+            service.connect()
+            destination_name = Topic.of(constants.TOPIC_ENDPOINT_DEFAULT)
+
+            print("Execute Direct Publish - String using adaptive back pressure")
+            HowToUseAdaptiveBackPressure \
+                .direct_message_publish_with_adaptive_back_pressure(service, destination_name,
+                                                                    constants.MESSAGE_TO_SEND,
+                                                                    burst_count=10, burst_size=10000)
+        finally:
+            service.disconnect()
+
+
+if __name__ == '__main__':
+    HowToUseAdaptiveBackPressure().run()
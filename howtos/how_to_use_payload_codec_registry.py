@@ -0,0 +1,291 @@
+""" Run this file to serialise business objects through a registry of struct, JSON and pickle codecs, with the codec
+id carried in a message property so that the receiver picks the matching decoder"""
+import json
+import pickle
+import struct
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import TypeVar
+
+from solace.messaging.config import _sol_constants
+from solace.messaging.messaging_service import MessagingService
+from solace.messaging.publisher.outbound_message import OutboundMessageBuilder
+from solace.messaging.receiver.inbound_message import InboundMessage
+from solace.messaging.receiver.message_receiver import MessageHandler
+from solace.messaging.resources.topic import Topic
+from solace.messaging.resources.topic_subscription import TopicSubscription
+from solace.messaging.utils.converter import BytesToObject, ObjectToBytes
+from sampler_boot import SamplerBoot, SolaceConstants, SamplerUtil, MyData
+
+X = TypeVar('X')
+constants = SolaceConstants
+boot = SamplerBoot()
+util = SamplerUtil()
+
+PAYLOAD_CODEC_ID_PROPERTY = 'sample_payload_codec_id'
+"""message property holding the id of the codec the payload is encoded with"""
+
+
+class PayloadCodec(ABC):
+    """encodes business objects to bytes and decodes them back, registered in a CodecRegistry under codec_id"""
+    codec_id = None
+
+    @abstractmethod
+    def encode(self, obj) -> bytes:
+        """encode obj to the payload bytes"""
+
+    @abstractmethod
+    def decode(self, payload) -> X:
+        """decode the payload bytes back to an object"""
+
+
+class PickleCodec(PayloadCodec):
+    """generic codec for any picklable object, the fallback when no faster codec is declared"""
+    codec_id = 'pickle'
+
+    def __init__(self, protocol=pickle.HIGHEST_PROTOCOL):
+        self._protocol = protocol
+
+    def encode(self, obj) -> bytes:
+        return pickle.dumps(obj, protocol=self._protocol)
+
+    def decode(self, payload) -> X:
+        return pickle.loads(payload)
+
+
+class JsonCodec(PayloadCodec):
+    """codec writing objects as compact JSON, to_dict and from_dict map business objects to and from JSON types"""
+
+    def __init__(self, codec_id='json', to_dict=None, from_dict=None):
+        self.codec_id = codec_id
+        self._to_dict = to_dict
+        self._from_dict = from_dict
+        self._encoder = json.JSONEncoder(separators=(',', ':'), default=to_dict)
+
+    def encode(self, obj) -> bytes:
+        return self._encoder.encode(obj).encode(_sol_constants.ENCODING_TYPE)
+
+    def decode(self, payload) -> X:
+        obj = json.loads(bytes(payload))
+        return self._from_dict(obj) if self._from_dict else obj
+
+
+class StructCodec(PayloadCodec):
+    """codec packing the fields of a business object with a precompiled struct.Struct
+
+    to_tuple and from_tuple map a business object to and from the tuple of its packed field values.
+    """
+
+    def __init__(self, codec_id, struct_format, to_tuple, from_tuple):
+        self.codec_id = codec_id
+        self._struct = struct.Struct(struct_format)
+        self._to_tuple = to_tuple
+        self._from_tuple = from_tuple
+
+    def encode(self, obj) -> bytes:
+        return self._struct.pack(*self._to_tuple(obj))
+
+    def decode(self, payload) -> X:
+        return self._from_tuple(self._struct.unpack(payload))
+
+
+class CodecObjectToBytes(ObjectToBytes):
+    """ObjectToBytes converter encoding through a codec, for message_builder.build(obj, converter=...)"""
+
+    def __init__(self, codec: PayloadCodec):
+        self._codec = codec
+
+    def to_bytes(self, src) -> bytes:
+        return self._codec.encode(src)
+
+
+class CodecBytesToObject(BytesToObject):
+    """BytesToObject converter decoding through a codec, for message.get_and_convert_payload(converter=...)"""
+
+    def __init__(self, codec: PayloadCodec):
+        self._codec = codec
+
+    def convert(self, src: bytearray) -> X:
+        return self._codec.decode(src)
+
+
+class CodecRegistry:
+    """codecs by codec id, building messages tagged with their codec id and decoding them with the codec their
+    property names
+
+    Messages without the property are rejected with a ValueError unless a default codec is given, e.g. pickle for
+    what the converters of the other samples publish. Only trusted publishers should be decoded with pickle.
+    """
+
+    def __init__(self, default_codec_id=None):
+        self._lock = threading.Lock()
+        self._codecs = {}
+        self._default_codec_id = default_codec_id
+        self.register(PickleCodec())
+        self.register(JsonCodec())
+
+    @property
+    def codec_ids(self):
+        return list(self._codecs)
+
+    def register(self, codec: PayloadCodec):
+        with self._lock:
+            if codec.codec_id in self._codecs:
+                raise ValueError(f'Payload codec [{codec.codec_id}] is already registered')
+            self._codecs = dict(self._codecs, **{codec.codec_id: codec})
+        return codec
+
+    def get(self, codec_id) -> PayloadCodec:
+        codec = self._codecs.get(codec_id)
+        if codec is None:
+            raise ValueError(f'Unknown payload codec id: [{codec_id}], expected one of {self.codec_ids}')
+        return codec
+
+    def object_to_bytes(self, codec_id) -> ObjectToBytes:
+        return CodecObjectToBytes(self.get(codec_id))
+
+    def bytes_to_object(self, codec_id) -> BytesToObject:
+        return CodecBytesToObject(self.get(codec_id))
+
+    def build(self, message_builder: OutboundMessageBuilder, obj, codec_id, additional_message_properties=None):
+        """build an outbound message with the encoded object and its codec id property, a codec returning a
+        bytearray has its payload taken by the builder with no copy"""
+        payload = self.get(codec_id).encode(obj)
+        properties = dict(additional_message_properties or {}, **{PAYLOAD_CODEC_ID_PROPERTY: codec_id})
+        return message_builder.build(payload if isinstance(payload, bytearray) else bytearray(payload),
+                                     additional_message_properties=properties)
+
+    def codec_of(self, message: InboundMessage) -> PayloadCodec:
+        """the codec named by the codec id property of the message, or the default codec"""
+        if message.has_property(PAYLOAD_CODEC_ID_PROPERTY):
+            return self.get(message.get_property(PAYLOAD_CODEC_ID_PROPERTY))
+        if self._default_codec_id is None:
+            raise ValueError(f'Message on [{message.get_destination_name()}] has no payload codec id property '
+                             f'[{PAYLOAD_CODEC_ID_PROPERTY}] and the registry has no default codec')
+        return self.get(self._default_codec_id)
+
+    def decode(self, message: InboundMessage) -> X:
+        """decode the payload with the codec named by its codec id property, or with the default codec"""
+        return self.codec_of(message).decode(message.get_payload_as_bytes())
+
+
+class CodecMessageHandler(MessageHandler):
+    """MessageHandler adapter decoding the payload through a CodecRegistry before calling on_object(message, obj)
+    of the wrapped handler"""
+
+    def __init__(self, object_handler, registry: CodecRegistry):
+        self._object_handler = object_handler
+        self._registry = registry
+
+    def on_message(self, message: 'InboundMessage'):
+        self._object_handler.on_object(message, self._registry.decode(message))
+
+
+class PrintingObjectHandler:
+    """sample object handler printing the decoded business object"""
+
+    def on_object(self, message: 'InboundMessage', obj):
+        codec_id = message.get_property(PAYLOAD_CODEC_ID_PROPERTY) \
+            if message.has_property(PAYLOAD_CODEC_ID_PROPERTY) else None
+        print(f"CALLBACK: Message Received on Topic: {message.get_destination_name()}, codec: {codec_id}, "
+              f"object name: {obj.get_name()}")
+
+
+MY_DATA_NAME_MAX_SIZE = 32
+
+
+def _my_data_name_fields(data: MyData):
+    name = data.name.encode(_sol_constants.ENCODING_TYPE)
+    if len(name) > MY_DATA_NAME_MAX_SIZE:
+        raise ValueError(f'MyData name of {len(name)} byte(s) does not fit the struct codec, expected at most '
+                         f'{MY_DATA_NAME_MAX_SIZE}')
+    return len(name), name
+
+
+def my_data_codecs():
+    """JSON and struct codecs for the sample MyData business object, the struct one holds names up to 32 bytes"""
+    json_codec = JsonCodec('json:my_data', to_dict=vars, from_dict=lambda fields: MyData(fields['name']))
+    struct_codec = StructCodec('struct:my_data', f'>B{MY_DATA_NAME_MAX_SIZE}s', _my_data_name_fields,
+                               lambda fields: MyData(fields[1][:fields[0]].decode(_sol_constants.ENCODING_TYPE)))
+    return json_codec, struct_codec
+
+
+class HowToUsePayloadCodecRegistry:
+    """class contains methods to encode and decode business objects through a codec registry"""
+
+    @staticmethod
+    def benchmark_codecs(registry: CodecRegistry, samples, codec_ids=None, rounds=1000):
+        """encode and decode the samples rounds times with every codec and return the mean encode and decode time
+        and encoded size per object
+
+        No broker connection is needed.
+        """
+        results = []
+        for codec_id in codec_ids or registry.codec_ids:
+            codec = registry.get(codec_id)
+            payloads = [codec.encode(sample) for sample in samples]
+            start = time.perf_counter_ns()
+            for _ in range(rounds):
+                for sample in samples:
+                    codec.encode(sample)
+            encode_ns = time.perf_counter_ns() - start
+            start = time.perf_counter_ns()
+            for _ in range(rounds):
+                for payload in payloads:
+                    codec.decode(payload)
+            decode_ns = time.perf_counter_ns() - start
+            object_count = rounds * len(samples)
+            results.append({'codec_id': codec_id, 'encode_ns': round(encode_ns / object_count),
+                            'decode_ns': round(decode_ns / object_count),
+                            'size_bytes': sum(map(len, payloads)) / len(payloads)})
+        return results
+
+    @staticmethod
+    def publish_and_consume_with_codecs(messaging_service: MessagingService, destination: Topic,
+                                        registry: CodecRegistry, codec_ids, obj):
+        """ to publish the same business object with each codec and decode each with the codec of its property"""
+        try:
+            receiver = messaging_service.create_direct_message_receiver_builder() \
+                .with_subscriptions([TopicSubscription.of(destination.get_name())]).build()
+            receiver.start()
+            receiver.receive_async(CodecMessageHandler(PrintingObjectHandler(), registry))
+
+            publisher = messaging_service.create_direct_message_publisher_builder().build()
+            publisher.start()
+            message_builder = messaging_service.message_builder() \
+                .with_application_message_id(constants.APPLICATION_MESSAGE_ID)
+            for codec_id in codec_ids:
+                publisher.publish(destination=destination, message=registry.build(message_builder, obj, codec_id))
+            time.sleep(2)
+        finally:
+            util.publisher_terminate(publisher)
+            receiver.terminate(0)
+
+    @staticmethod
+    def run():
+        # untagged payloads are the pickled objects of the trusted samples publishing through PopoConverter
+        registry = CodecRegistry(default_codec_id=PickleCodec.codec_id)
+        for codec in my_data_codecs():
+            registry.register(codec)
+        samples = [MyData(f'{constants.MESSAGE_TO_SEND} {e}') for e in range(100)]
+        my_data_codec_ids = [PickleCodec.codec_id, 'json:my_data', 'struct:my_data']
+        print("Execute payload codec benchmark")
+        for result in HowToUsePayloadCodecRegistry.benchmark_codecs(registry, samples, my_data_codec_ids):
+            print(f'[CODEC] {json.dumps(result)}')
+
+        try:
+            service = MessagingService.builder().from_properties(boot.broker_properties()).build()
+            service.connect()
+            destination_name = Topic.of(constants.TOPIC_ENDPOINT_DEFAULT)
+
+            print("Execute Direct Publish and Consume - business object through the codec registry")
+            HowToUsePayloadCodecRegistry \
+                .publish_and_consume_with_codecs(service, destination_name, registry, my_data_codec_ids,
+                                                 MyData(constants.MESSAGE_TO_SEND))
+        finally:
+            service.disconnect()
+
+
+if __name__ == '__main__':
+    HowToUsePayloadCodecRegistry().run()
@@ -1,8 +1,12 @@
 """ Run this file to publish messages using direct message publisher with back pressure scenarios"""
+import threading
+import time
 from typing import TypeVar
 
 from solace.messaging.errors.pubsubplus_client_error import PublisherOverflowError
 from solace.messaging.messaging_service import MessagingService
+from solace.messaging.publisher.direct_message_publisher import DirectMessagePublisher
+from solace.messaging.publisher.publisher_health_check import PublisherReadinessListener
 from solace.messaging.resources.topic import Topic
 from sampler_boot import SamplerBoot, SolaceConstants, SamplerUtil
 
@@ -12,24 +16,141 @@ boot = SamplerBoot()
 util = SamplerUtil()
 
 
+class PublisherReadinessCondition(PublisherReadinessListener):
+    """readiness listener signalling a condition that publisher threads park on after an overflow
+
+    Every ready() call bumps a generation counter, a thread waits for the generation to move past the one it
+    read before calling notify_when_ready(), so a ready() racing with the overflow handling is never lost.
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._generation = 0
+
+    def arm(self) -> int:
+        """return the generation to wait past, must be called before PublisherHealthCheck.notify_when_ready()"""
+        with self._condition:
+            return self._generation
+
+    def wait_ready(self, generation: int, timeout: float = None) -> bool:
+        with self._condition:
+            return self._condition.wait_for(lambda: self._generation != generation, timeout)
+
+    def ready(self):
+        with self._condition:
+            self._generation += 1
+            self._condition.notify_all()
+
+
+class RetryOnReadyPublisher:
+    """publishes through a reject mode publisher, parking the caller on overflow until the publisher is ready
+    and retrying the very message that overflowed
+
+    Memory stays bounded by the reject buffer capacity, unlike the elastic strategy. A caller parked for longer
+    than max_wait_ms gets a PublisherOverflowError for the message it was publishing.
+    """
+
+    def __init__(self, publisher: DirectMessagePublisher, max_wait_ms=5000):
+        self._publisher = publisher
+        self._max_wait = max_wait_ms / 1000
+        self._readiness_condition = PublisherReadinessCondition()
+        self._publisher.set_publisher_readiness_listener(self._readiness_condition)
+        self._lock = threading.Lock()
+        self._stall_count = 0
+        self._stall_time = 0.0
+
+    @property
+    def stall_count(self):
+        return self._stall_count
+
+    @property
+    def stall_time(self):
+        """total time in seconds callers spent parked on a full buffer"""
+        return self._stall_time
+
+    def publish(self, message, destination: Topic):
+        deadline = None
+        while True:
+            try:
+                self._publisher.publish(destination=destination, message=message)
+                return
+            except PublisherOverflowError:
+                generation = self._readiness_condition.arm()
+                self._publisher.notify_when_ready()
+                stall_start = time.monotonic()
+                if deadline is None:
+                    deadline = stall_start + self._max_wait
+                is_ready = self._readiness_condition.wait_ready(generation, max(0.0, deadline - stall_start))
+                with self._lock:
+                    self._stall_count += 1
+                    self._stall_time += time.monotonic() - stall_start
+                if not is_ready:
+                    raise PublisherOverflowError(f'Publisher not ready after {self._max_wait * 1000:.0f}ms')
+
+    def publish_all(self, messages, destination: Topic) -> int:
+        """publish the messages in order and return how many were published, stops at the first timeout"""
+        published_count = 0
+        try:
+            for message in messages:
+                self.publish(message, destination)
+                published_count += 1
+        except PublisherOverflowError as exception:
+            print(f'{exception}, {published_count} message(s) published')
+        return published_count
+
+
 class HowToDirectPublishWithBackPressureSampler:
     """
     class to show how to create a messaging service
     """
+    BACK_PRESSURE_REJECT = 'reject'
+    BACK_PRESSURE_ELASTIC = 'elastic'
+    BACK_PRESSURE_WAIT = 'wait'
+
+    @staticmethod
+    def create_direct_message_publisher_on_backpressure(messaging_service: MessagingService, strategy,
+                                                        buffer_capacity=None):
+        """ to build and start a direct publisher for one of the back pressure strategies"""
+        builder = messaging_service.create_direct_message_publisher_builder()
+        if strategy == HowToDirectPublishWithBackPressureSampler.BACK_PRESSURE_REJECT:
+            builder = builder.on_back_pressure_reject(buffer_capacity=buffer_capacity)
+        elif strategy == HowToDirectPublishWithBackPressureSampler.BACK_PRESSURE_WAIT:
+            builder = builder.on_back_pressure_wait(buffer_capacity=buffer_capacity)
+        elif strategy == HowToDirectPublishWithBackPressureSampler.BACK_PRESSURE_ELASTIC:
+            builder = builder.on_back_pressure_elastic()
+        else:
+            raise ValueError(f'Unknown back pressure strategy: [{strategy}]')
+        direct_publish_service = builder.build()
+        direct_publish_service.start()
+        return direct_publish_service
+
+    @staticmethod
+    def build_outbound_message_with_all_props(messaging_service: MessagingService, message):
+        """ to build the outbound message with all props published by the back pressure samples"""
+        return messaging_service.message_builder() \
+            .with_property("custom_key", "custom_value") \
+            .with_expiration(SolaceConstants.MESSAGE_EXPIRATION) \
+            .with_priority(SolaceConstants.MESSAGE_PRIORITY) \
+            .with_sequence_number(SolaceConstants.MESSAGE_SEQUENCE_NUMBER) \
+            .with_application_message_id(constants.APPLICATION_MESSAGE_ID) \
+            .with_application_message_type("app_msg_type") \
+            .with_http_content_header("text/html", "utf-8") \
+            .build(message)
 
     @staticmethod
     def direct_message_publish_on_backpressure_reject(messaging_service: MessagingService, destination, message,
                                                       buffer_capacity, message_count):
         """ to publish str or byte array type message using back pressure"""
         try:
-            direct_publish_service = messaging_service.create_direct_message_publisher_builder() \
-                .on_back_pressure_reject(buffer_capacity=buffer_capacity) \
-                .build()
-            direct_publish_service.start()
+            direct_publish_service = HowToDirectPublishWithBackPressureSampler \
+                .create_direct_message_publisher_on_backpressure(messaging_service,
+                                                                 HowToDirectPublishWithBackPressureSampler
+                                                                 .BACK_PRESSURE_REJECT,
+                                                                 buffer_capacity=buffer_capacity)
             for e in range(message_count):
                 direct_publish_service.publish(destination=destination, message=message)
         except PublisherOverflowError:
-            PublisherOverflowError("Queue maximum limit is reached")
+            print(f"Queue maximum limit is reached, {message_count - e} message(s) not published")
         finally:
             util.publisher_terminate(direct_publish_service)
 
@@ -39,23 +160,38 @@ class HowToDirectPublishWithBackPressureSampler:
                                                                                  message_count):
         """ to publish outbound message using back pressure"""
         try:
-            direct_publish_service = messaging_service.create_direct_message_publisher_builder() \
-                .on_back_pressure_reject(buffer_capacity=buffer_capacity) \
-                .build()
-            direct_publish_service.start()
-            outbound_msg = messaging_service.message_builder() \
-                .with_property("custom_key", "custom_value") \
-                .with_expiration(SolaceConstants.MESSAGE_EXPIRATION) \
-                .with_priority(SolaceConstants.MESSAGE_PRIORITY) \
-                .with_sequence_number(SolaceConstants.MESSAGE_SEQUENCE_NUMBER) \
-                .with_application_message_id(constants.APPLICATION_MESSAGE_ID) \
-                .with_application_message_type("app_msg_type") \
-                .with_http_content_header("text/html", "utf-8") \
-                .build(message)
+            direct_publish_service = HowToDirectPublishWithBackPressureSampler \
+                .create_direct_message_publisher_on_backpressure(messaging_service,
+                                                                 HowToDirectPublishWithBackPressureSampler
+                                                                 .BACK_PRESSURE_REJECT,
+                                                                 buffer_capacity=buffer_capacity)
+            outbound_msg = HowToDirectPublishWithBackPressureSampler \
+                .build_outbound_message_with_all_props(messaging_service, message)
             for e in range(message_count):
                 direct_publish_service.publish(destination=destination, message=outbound_msg)
         except PublisherOverflowError:
-            PublisherOverflowError("Queue maximum limit is reached")
+            print(f"Queue maximum limit is reached, {message_count - e} message(s) not published")
+        finally:
+            util.publisher_terminate(direct_publish_service)
+
+    @staticmethod
+    def direct_message_publish_outbound_with_all_props_on_backpressure_retry_on_ready(
+            messaging_service: MessagingService, destination, message, buffer_capacity, message_count,
+            max_wait_ms=5000):
+        """ to publish outbound message using back pressure reject, retrying overflowed messages once the
+        publisher is ready instead of dropping them"""
+        try:
+            direct_publish_service = HowToDirectPublishWithBackPressureSampler \
+                .create_direct_message_publisher_on_backpressure(messaging_service,
+                                                                 HowToDirectPublishWithBackPressureSampler
+                                                                 .BACK_PRESSURE_REJECT,
+                                                                 buffer_capacity=buffer_capacity)
+            outbound_msg = HowToDirectPublishWithBackPressureSampler \
+                .build_outbound_message_with_all_props(messaging_service, message)
+            retry_publisher = RetryOnReadyPublisher(direct_publish_service, max_wait_ms=max_wait_ms)
+            published_count = retry_publisher.publish_all((outbound_msg for _ in range(message_count)), destination)
+            print(f"Published: {published_count}/{message_count}, stalls: {retry_publisher.stall_count}, "
+                  f"stall time: {retry_publisher.stall_time * 1000:.3f}ms")
         finally:
             util.publisher_terminate(direct_publish_service)
 
@@ -64,19 +200,12 @@ class HowToDirectPublishWithBackPressureSampler:
                                                                                destination, message, message_count):
         """ to publish outbound message using back pressure"""
         try:
-            direct_publish_service = messaging_service.create_direct_message_publisher_builder() \
-                .on_back_pressure_elastic() \
-                .build()
-            direct_publish_service.start()
-            outbound_msg = messaging_service.message_builder() \
-                .with_property("custom_key", "custom_value") \
-                .with_expiration(SolaceConstants.MESSAGE_EXPIRATION) \
-                .with_priority(SolaceConstants.MESSAGE_PRIORITY) \
-                .with_sequence_number(SolaceConstants.MESSAGE_SEQUENCE_NUMBER) \
-                .with_application_message_id(constants.APPLICATION_MESSAGE_ID) \
-                .with_application_message_type("app_msg_type") \
-                .with_http_content_header("text/html", "utf-8") \
-                .build(message)
+            direct_publish_service = HowToDirectPublishWithBackPressureSampler \
+                .create_direct_message_publisher_on_backpressure(messaging_service,
+                                                                 HowToDirectPublishWithBackPressureSampler
+                                                                 .BACK_PRESSURE_ELASTIC)
+            outbound_msg = HowToDirectPublishWithBackPressureSampler \
+                .build_outbound_message_with_all_props(messaging_service, message)
             for e in range(message_count):
                 direct_publish_service.publish(destination=destination, message=outbound_msg)
         finally:
@@ -88,23 +217,17 @@ class HowToDirectPublishWithBackPressureSampler:
                                                                             message_count):
         """ to publish outbound message using back pressure"""
         try:
-            direct_publish_service = messaging_service.create_direct_message_publisher_builder() \
-                .on_back_pressure_wait(buffer_capacity=buffer_capacity) \
-                .build()
-            direct_publish_service.start()
-            outbound_msg = messaging_service.message_builder() \
-                .with_property("custom_key", "custom_value") \
-                .with_expiration(SolaceConstants.MESSAGE_EXPIRATION) \
-                .with_priority(SolaceConstants.MESSAGE_PRIORITY) \
-                .with_sequence_number(SolaceConstants.MESSAGE_SEQUENCE_NUMBER) \
-                .with_application_message_id(constants.APPLICATION_MESSAGE_ID) \
-                .with_application_message_type("app_msg_type") \
-                .with_http_content_header("text/html", "utf-8") \
-                .build(message)
+            direct_publish_service = HowToDirectPublishWithBackPressureSampler \
+                .create_direct_message_publisher_on_backpressure(messaging_service,
+                                                                 HowToDirectPublishWithBackPressureSampler
+                                                                 .BACK_PRESSURE_WAIT,
+                                                                 buffer_capacity=buffer_capacity)
+            outbound_msg = HowToDirectPublishWithBackPressureSampler \
+                .build_outbound_message_with_all_props(messaging_service, message)
             for e in range(message_count):
                 direct_publish_service.publish(destination=destination, message=outbound_msg)
         except PublisherOverflowError:
-            PublisherOverflowError("Queue maximum limit is reached")
+            print(f"Queue maximum limit is reached, {message_count - e} message(s) not published")
         finally:
             util.publisher_terminate(direct_publish_service)
 
@@ -134,6 +257,13 @@ class HowToDirectPublishWithBackPressureSampler:
                                                                                              buffer_capacity,
                                                                                              message_count)
 
+                print("Execute Direct Publish - String Outbound Message with all props using back pressure reject "
+                      "and retry on ready")
+                HowToDirectPublishWithBackPressureSampler() \
+                    .direct_message_publish_outbound_with_all_props_on_backpressure_retry_on_ready(
+                        service, destination_name, constants.MESSAGE_TO_SEND + "_outbound based", buffer_capacity,
+                        message_count)
+
                 print("Execute Direct Publish - String Outbound Message with all props using back pressure elastic")
                 HowToDirectPublishWithBackPressureSampler() \
                     .direct_message_publish_outbound_with_all_props_on_backpressure_elastic(service, destination_name,
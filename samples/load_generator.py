@@ -0,0 +1,294 @@
+## Goal: Load generator publishing direct or persistent messages at a target rate, reporting throughput and latency in JSON
+# Example: python load_generator.py --mode persistent --rate 5000 --payload-size uniform:100:2000 --topic-fanout 16 \
+#          --workers 4 --duration 60 --warmup 10
+import argparse
+import json
+import math
+import multiprocessing
+import os
+import platform
+import queue
+import random
+import threading
+import time
+
+from solace.messaging.messaging_service import MessagingService, RetryStrategy
+from solace.messaging.publisher.persistent_message_publisher import MessagePublishReceiptListener
+from solace.messaging.resources.topic import Topic
+
+if platform.uname().system == 'Windows': os.environ["PYTHONUNBUFFERED"] = "1" # Disable stdout buffer
+
+TOPIC_PREFIX = "samples/load"
+PAYLOAD_POOL_SIZE = 1024 # number of pre-generated payloads cycled through by each worker
+RECEIPT_GRACE_S = 5 # how long a persistent worker waits for its outstanding receipts at the end of the run
+
+# Broker Config. Note: Could pass other properties Look into
+broker_props = {
+    "solace.messaging.transport.host": os.environ.get('SOLACE_HOST') or "localhost",
+    "solace.messaging.service.vpn-name": os.environ.get('SOLACE_VPN') or "default",
+    "solace.messaging.authentication.scheme.basic.username": os.environ.get('SOLACE_USERNAME') or "default",
+    "solace.messaging.authentication.scheme.basic.password": os.environ.get('SOLACE_PASSWORD') or "default"
+    }
+
+
+# Log-linear latency histogram in microseconds, buckets are 1% wide so percentiles are within 1% of the exact value.
+# Bucket counts are plain dicts so worker histograms can be shipped across processes and merged.
+class LatencyHistogram:
+    PRECISION = math.log(1.01)
+
+    def __init__(self, counts=None):
+        self.counts = dict(counts or {})
+
+    def record(self, latency_us):
+        bucket = math.ceil(math.log(latency_us) / self.PRECISION) if latency_us > 1 else 0
+        self.counts[bucket] = self.counts.get(bucket, 0) + 1
+
+    def merge(self, counts):
+        for bucket, count in counts.items():
+            self.counts[bucket] = self.counts.get(bucket, 0) + count
+
+    def to_dict(self):
+        total = sum(self.counts.values())
+        report = {'count': total}
+        buckets = sorted(self.counts)
+        for name, fraction in (('p50', 0.5), ('p90', 0.9), ('p99', 0.99), ('p99.9', 0.999), ('max', 1.0)):
+            rank, seen, value = math.ceil(fraction * total), 0, None
+            for bucket in buckets:
+                seen += self.counts[bucket]
+                if seen >= rank:
+                    value = round(math.exp(bucket * self.PRECISION), 1)
+                    break
+            report[f'{name}_us'] = value
+        return report
+
+
+# Payload size distributions: fixed:<size>, uniform:<min>:<max> or lognormal:<median>:<sigma>
+def payload_sizes(spec, count, rng):
+    kind, *args = spec.split(':')
+    if kind == 'fixed' and len(args) == 1:
+        return [int(args[0])] * count
+    if kind == 'uniform' and len(args) == 2:
+        return [rng.randint(int(args[0]), int(args[1])) for _ in range(count)]
+    if kind == 'lognormal' and len(args) == 2:
+        return [max(1, round(rng.lognormvariate(math.log(float(args[0])), float(args[1])))) for _ in range(count)]
+    raise argparse.ArgumentTypeError(f'Invalid payload size distribution: [{spec}], expected fixed:<size>, '
+                                     f'uniform:<min>:<max> or lognormal:<median>:<sigma>')
+
+
+# Topic fan-out: each message goes to one of <fanout> topics <prefix>/<n>, in round robin or random order
+def topic_sequence(prefix, fanout, pattern, count, rng):
+    topics = [Topic.of(f'{prefix}/{n}') for n in range(fanout)]
+    if pattern == 'random':
+        return [rng.choice(topics) for _ in range(count)]
+    return [topics[n % fanout] for n in range(count)]
+
+
+# Persistent mode: the publish time travels as user context and the receipt records the publish-to-ack latency
+class LatencyReceiptListener(MessagePublishReceiptListener):
+    def __init__(self, stats):
+        self._stats = stats
+
+    def on_publish_receipt(self, publish_receipt: 'PublishReceipt'):
+        latency_us = (time.perf_counter_ns() - publish_receipt.user_context) / 1000
+        self._stats.on_receipt(latency_us, publish_receipt.exception is None)
+
+
+# Counters and latency histogram of one worker, drained into a report every interval
+class WorkerStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.measuring = False # false during the warm-up
+        self.outstanding = 0
+        self._reset()
+
+    def _reset(self):
+        self.published = 0
+        self.acknowledged = 0
+        self.errors = 0
+        self.histogram = LatencyHistogram()
+
+    def on_publish(self, latency_us=None):
+        with self._lock:
+            if latency_us is None:
+                self.outstanding += 1 # until its receipt
+            if self.measuring:
+                self.published += 1
+                if latency_us is not None:
+                    self.histogram.record(latency_us)
+
+    def on_receipt(self, latency_us, is_persisted):
+        with self._lock:
+            self.outstanding -= 1
+            if self.measuring:
+                self.acknowledged += int(is_persisted)
+                self.errors += int(not is_persisted)
+                self.histogram.record(latency_us)
+
+    def on_error(self):
+        with self._lock:
+            if self.measuring:
+                self.errors += 1
+
+    def drain(self, worker_id):
+        with self._lock:
+            report = {'worker': worker_id, 'published': self.published, 'acknowledged': self.acknowledged,
+                      'errors': self.errors, 'latency': self.histogram.counts}
+            self._reset()
+            return report
+
+
+# One publishing worker: its own messaging service and publisher, paced on an absolute schedule so that a slow
+# publish is caught up instead of lowering the rate
+def run_worker(worker_id, args, report_queue):
+    rng = random.Random(args.seed + worker_id)
+    sizes = payload_sizes(args.payload_size, PAYLOAD_POOL_SIZE, rng)
+    payloads = [bytearray(os.urandom(size)) for size in sizes] # only the sizes need to be reproducible
+    topics = topic_sequence(args.topic_prefix, args.topic_fanout, args.fanout_pattern, PAYLOAD_POOL_SIZE, rng)
+    stats = WorkerStats()
+
+    worker_rate = args.rate / args.workers if args.rate else 0
+    count = 0
+    messaging_service = publisher = None
+    try:
+        messaging_service = MessagingService.builder().from_properties(broker_props)\
+                            .with_reconnection_retry_strategy(RetryStrategy.parametrized_retry(20, 3))\
+                            .build()
+        messaging_service.connect()
+        if args.mode == 'persistent':
+            publisher = messaging_service.create_persistent_message_publisher_builder().build()
+            publisher.set_message_publish_receipt_listener(LatencyReceiptListener(stats))
+        else:
+            publisher = messaging_service.create_direct_message_publisher_builder().build()
+        publisher.start()
+        outbound_msg_builder = messaging_service.message_builder() \
+                        .with_property("application", "samples") \
+                        .with_property("language", "Python")
+
+        start = time.perf_counter()
+        measure_start = start + args.warmup
+        end = measure_start + args.duration
+        next_report = measure_start + args.report_interval
+        while True:
+            now = time.perf_counter()
+            if now >= end:
+                break
+            if not stats.measuring and now >= measure_start:
+                stats.drain(worker_id)
+                stats.measuring = True
+            if stats.measuring and now >= next_report:
+                report_queue.put(stats.drain(worker_id))
+                next_report += args.report_interval
+            if worker_rate:
+                delay = start + count / worker_rate - now
+                if delay > 0:
+                    time.sleep(delay)
+            outbound_msg = outbound_msg_builder.build(payloads[count % PAYLOAD_POOL_SIZE])
+            topic = topics[count % PAYLOAD_POOL_SIZE]
+            try:
+                if args.mode == 'persistent':
+                    publisher.publish(outbound_msg, topic, user_context=time.perf_counter_ns())
+                    stats.on_publish()
+                else:
+                    publish_start = time.perf_counter_ns()
+                    publisher.publish(destination=topic, message=outbound_msg)
+                    stats.on_publish((time.perf_counter_ns() - publish_start) / 1000)
+            except Exception as exception: # back pressure or a connection issue, counted and the run goes on
+                stats.on_error()
+                if args.verbose:
+                    print(f'Worker {worker_id} publish failed: {exception}')
+            count += 1
+
+        grace_end = time.perf_counter() + RECEIPT_GRACE_S
+        while args.mode == 'persistent' and stats.outstanding > 0 and time.perf_counter() < grace_end:
+            time.sleep(0.01)
+        report_queue.put(stats.drain(worker_id))
+    finally:
+        if publisher is not None:
+            publisher.terminate(0)
+        if messaging_service is not None:
+            messaging_service.disconnect()
+        report_queue.put({'worker': worker_id, 'done': True})
+
+
+# Aggregates the worker reports, printing one JSON line per interval and a final JSON summary
+def collect_reports(args, report_queue):
+    run_start = time.perf_counter()
+    total, interval = LatencyHistogram(), LatencyHistogram()
+    totals = {'published': 0, 'acknowledged': 0, 'errors': 0}
+    interval_totals = dict.fromkeys(totals, 0)
+    interval_start = time.perf_counter()
+    done_workers = 0
+    while done_workers < args.workers:
+        try:
+            report = report_queue.get(timeout=args.report_interval)
+        except queue.Empty:
+            report = None
+        if report is not None and report.get('done'):
+            done_workers += 1
+        elif report is not None:
+            for key in totals:
+                totals[key] += report[key]
+                interval_totals[key] += report[key]
+            total.merge(report['latency'])
+            interval.merge(report['latency'])
+        now = time.perf_counter()
+        if now - interval_start >= args.report_interval and any(interval_totals.values()):
+            print(json.dumps({'report': 'periodic', 'elapsed_s': round(now - run_start, 3),
+                              'rate_msg_s': round(interval_totals['published'] / (now - interval_start), 1),
+                              **interval_totals, 'latency': interval.to_dict()}))
+            interval, interval_totals, interval_start = LatencyHistogram(), dict.fromkeys(totals, 0), now
+    print(json.dumps({'report': 'final', 'mode': args.mode, 'target_rate_msg_s': args.rate,
+                      'achieved_rate_msg_s': round(totals['published'] / args.duration, 1), **totals,
+                      'latency_kind': 'publish_to_ack' if args.mode == 'persistent' else 'publish_call',
+                      'latency': total.to_dict(), 'config': vars(args)}))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Publish load on a Solace broker and report throughput and '
+                                                 'latency in JSON')
+    parser.add_argument('--mode', choices=['direct', 'persistent'], default='direct')
+    parser.add_argument('--rate', type=float, default=1000, help='total target rate in msg/s, 0 for unthrottled')
+    parser.add_argument('--payload-size', default='fixed:100',
+                        help='fixed:<size>, uniform:<min>:<max> or lognormal:<median>:<sigma>, in bytes')
+    parser.add_argument('--topic-prefix', default=TOPIC_PREFIX)
+    parser.add_argument('--topic-fanout', type=int, default=1, help='number of topics <prefix>/<n> published to')
+    parser.add_argument('--fanout-pattern', choices=['round-robin', 'random'], default='round-robin')
+    parser.add_argument('--workers', type=int, default=1, help='number of publishing workers')
+    parser.add_argument('--processes', action='store_true', help='run the workers as processes instead of threads')
+    parser.add_argument('--duration', type=float, default=30, help='measured duration in seconds')
+    parser.add_argument('--warmup', type=float, default=5, help='unmeasured warm-up in seconds')
+    parser.add_argument('--report-interval', type=float, default=5, help='periodic report interval in seconds')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the payload sizes and topic choices')
+    parser.add_argument('--verbose', action='store_true', help='print every publish failure')
+    args = parser.parse_args()
+    try:
+        payload_sizes(args.payload_size, 1, random.Random()) # fail fast on an invalid distribution
+    except (argparse.ArgumentTypeError, ValueError) as error:
+        parser.error(str(error))
+    if args.workers < 1 or args.topic_fanout < 1 or args.duration <= 0 or args.rate < 0:
+        parser.error('--workers and --topic-fanout must be >= 1, --duration > 0 and --rate >= 0')
+    return args
+
+
+def main():
+    args = parse_args()
+    if args.processes:
+        report_queue = multiprocessing.Queue()
+        workers = [multiprocessing.Process(target=run_worker, args=(n, args, report_queue), daemon=True)
+                   for n in range(args.workers)]
+    else:
+        report_queue = queue.Queue()
+        workers = [threading.Thread(target=run_worker, args=(n, args, report_queue), daemon=True)
+                   for n in range(args.workers)]
+    for worker in workers:
+        worker.start()
+    try:
+        collect_reports(args, report_queue)
+    except KeyboardInterrupt:
+        print('\nLoad generation interrupted')
+    for worker in workers:
+        worker.join(timeout=RECEIPT_GRACE_S)
+
+
+if __name__ == '__main__':
+    main()